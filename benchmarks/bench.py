@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Benchmarks - End-to-end performance of MediaDownloader against a local media server
+Every run of a scenario happens in a fresh process and a fresh output
+directory, so CPU time and peak RSS belong to that run alone. Results are
+saved as JSON and can be compared with a baseline from another commit.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCH_DIR.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from media_server import MediaServer, generate_media
+
+
+SCENARIOS = {}
+
+# metric -> True if higher is better
+METRICS = {
+    'seconds': False,
+    'cpu_seconds': False,
+    'child_cpu_seconds': False,
+    'peak_rss_mb': False,
+    'throughput_mbps': True,
+    'import_seconds': False,
+}
+
+
+def scenario(name: str):
+    """
+    Register a scenario
+    
+    The decorated function gets (MediaDownloader class, server base URL,
+    output directory) and does any setup, then returns (downloader, run):
+    only run() is measured and it returns the number of items processed.
+    """
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def downloaded(results) -> int:
+    """Count the items a scenario downloaded, raising if any of them failed"""
+    results = list(results)
+    failed = [result for result in results if not result['success']]
+    if failed:
+        raise RuntimeError(f"{len(failed)}/{len(results)} item(s) failed, first: "
+                           f"{failed[0]['url']}: {failed[0]['error']}")
+    return sum(1 for result in results if not result['skipped'])
+
+
+@scenario("get_info_cold")
+def get_info_cold(MediaDownloader, base, workdir):
+    downloader = MediaDownloader(output_dir=workdir)
+    return downloader, lambda: int(bool(downloader.get_info(f"{base}/tone.wav")))
+
+
+@scenario("get_info_warm")
+def get_info_warm(MediaDownloader, base, workdir):
+    downloader = MediaDownloader(output_dir=workdir)
+    downloader.get_info(f"{base}/tone.wav")
+    return downloader, lambda: int(bool(downloader.get_info(f"{base}/tone.wav")))
+
+
+@scenario("audio_keep")
+def audio_keep(MediaDownloader, base, workdir):
+    downloader = MediaDownloader(output_dir=workdir)
+    return downloader, lambda: int(downloader.download_audio(f"{base}/tone.opus", format="opus"))
+
+
+@scenario("audio_mp3")
+def audio_mp3(MediaDownloader, base, workdir):
+    downloader = MediaDownloader(output_dir=workdir)
+    return downloader, lambda: int(downloader.download_audio(f"{base}/tone.wav", format="mp3"))
+
+
+@scenario("audio_fanout")
+def audio_fanout(MediaDownloader, base, workdir):
+    downloader = MediaDownloader(output_dir=workdir)
+    return downloader, lambda: int(downloader.download_audio(f"{base}/tone.wav", format="mp3,flac,m4a"))
+
+
+@scenario("audio_stream")
+def audio_stream(MediaDownloader, base, workdir):
+    downloader = MediaDownloader(output_dir=workdir)
+    return downloader, lambda: int(sum(map(len, downloader.stream_audio(f"{base}/tone.wav", format="mp3"))) > 0)
+
+
+@scenario("video")
+def video(MediaDownloader, base, workdir):
+    downloader = MediaDownloader(output_dir=workdir)
+    return downloader, lambda: int(downloader.download_video(f"{base}/clip.mp4"))
+
+
+@scenario("large_single")
+def large_single(MediaDownloader, base, workdir):
+    downloader = MediaDownloader(output_dir=workdir)
+    return downloader, lambda: int(downloader.download_audio(f"{base}/large.wav", format="wav"))
+
+
+@scenario("large_segmented")
+def large_segmented(MediaDownloader, base, workdir):
+    downloader = MediaDownloader(output_dir=workdir, connections=4, chunk_size=4 * 1024 * 1024)
+    return downloader, lambda: int(downloader.download_audio(f"{base}/large.wav", format="wav"))
+
+
+@scenario("playlist")
+def playlist(MediaDownloader, base, workdir):
+    downloader = MediaDownloader(output_dir=workdir)
+    run = lambda: downloaded(downloader.download_playlist(f"{base}/feed.xml?n=16", format="mp3", max_workers=4))
+    return downloader, run
+
+
+@scenario("batch")
+def batch(MediaDownloader, base, workdir):
+    downloader = MediaDownloader(output_dir=workdir)
+    urls = [f"{base}/track{i}.wav" for i in range(16)]
+    return downloader, lambda: downloaded(downloader.download_many(urls, format="mp3", max_workers=4))
+
+
+def usage():
+    """Return (cpu seconds, child cpu seconds, peak RSS MB, peak child RSS MB) so far"""
+    if resource is None:
+        return time.process_time(), 0.0, None, None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return (own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime,
+            own.ru_maxrss / scale, children.ru_maxrss / scale)
+
+
+def run_child(name: str, base: str, workdir: str) -> dict:
+    """Run one scenario in this (fresh) process and return its measurements"""
+    started = time.perf_counter()
+    from downloader import MediaDownloader
+    import_seconds = time.perf_counter() - started
+    
+    downloader, run = SCENARIOS[name](MediaDownloader, base, workdir)
+    cpu, child_cpu, _, _ = usage()
+    received = downloader.metrics.bytes_downloaded
+    started = time.perf_counter()
+    items = run()
+    seconds = time.perf_counter() - started
+    received = downloader.metrics.bytes_downloaded - received
+    downloader.close()
+    cpu_after, child_cpu_after, peak_rss, child_rss = usage()
+    
+    return {
+        'seconds': seconds,
+        'items': items,
+        'bytes': received,
+        'throughput_mbps': received / seconds / 1e6 if seconds else 0.0,
+        'cpu_seconds': cpu_after - cpu,
+        'child_cpu_seconds': child_cpu_after - child_cpu,
+        'peak_rss_mb': peak_rss,
+        'peak_child_rss_mb': child_rss,
+        'import_seconds': import_seconds,
+        'stages': downloader.metrics.snapshot()['stages'],
+    }
+
+
+def run_scenario(name: str, base: str, repeat: int) -> dict:
+    """Run a scenario `repeat` times in separate processes and summarise it"""
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+                result_path = f.name
+            try:
+                process = subprocess.run(
+                    [sys.executable, __file__, "--child", name, "--base", base,
+                     "--workdir", workdir, "--result", result_path],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                if process.returncode != 0:
+                    error = process.stderr.decode("utf-8", "replace").strip().splitlines()
+                    raise RuntimeError(f"{name} failed: {error[-1] if error else process.returncode}")
+                with open(result_path, encoding="utf-8") as f:
+                    runs.append(json.load(f))
+            finally:
+                os.unlink(result_path)
+    
+    median = {metric: statistics.median(run[metric] for run in runs)
+              for metric in METRICS if all(run.get(metric) is not None for run in runs)}
+    return {'median': median, 'runs': runs}
+
+
+def environment() -> dict:
+    """Describe what the results were measured on"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    import yt_dlp.version
+    return {
+        'commit': commit,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'python': platform.python_version(),
+        'yt_dlp': yt_dlp.version.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    Print current medians against a baseline
+    
+    Returns:
+        list: (scenario, metric, change) for every regression beyond `threshold`
+    """
+    regressions = []
+    print(f"\n{'scenario':<18}{'metric':<20}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in current['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if not old:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before = old['median'].get(metric)
+            after = result['median'].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            flag = " ⚠️" if worse > threshold else ""
+            if flag:
+                regressions.append((name, metric, change))
+            print(f"{name:<18}{metric:<20}{before:>12.4g}{after:>12.4g}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark MediaDownloader against a local media server",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Run everything and save the results
+  python benchmarks/bench.py -o results.json
+  
+  # Compare a branch against a saved baseline, emulating a slower link
+  python benchmarks/bench.py --compare baseline.json --rate 20000000 --latency 0.02
+        """
+    )
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run - default: all ({', '.join(SCENARIOS)})")
+    parser.add_argument("-n", "--repeat", type=int, default=3, help="Runs per scenario - default: 3")
+    parser.add_argument("-o", "--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="FILE", help="Baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative change counted as a regression - default: 0.10")
+    parser.add_argument("--media-dir", help="Where to keep the generated media - default: a temporary directory")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the server adds to every request")
+    parser.add_argument("--rate", type=int, help="Server bandwidth limit per response in bytes/s")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--base", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        result = run_child(args.child, args.base, args.workdir)
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return 0
+    
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"❌ Error: Unknown scenario(s): {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    
+    with tempfile.TemporaryDirectory(prefix="bench-media-") as temp_media:
+        media_dir = generate_media(args.media_dir or temp_media)
+        results = {'environment': environment(), 'scenarios': {},
+                   'server': {'latency': args.latency, 'rate': args.rate}}
+        with MediaServer(media_dir, latency=args.latency, rate=args.rate) as server:
+            for name in args.scenarios or SCENARIOS:
+                print(f"⏱️  {name} ...", end=" ", flush=True)
+                result = run_scenario(name, server.base_url, max(1, args.repeat))
+                results['scenarios'][name] = result
+                median = result['median']
+                print(f"{median['seconds']:.3f}s, {median['throughput_mbps']:.1f} MB/s, "
+                      f"cpu {median['cpu_seconds']:.2f}s + ffmpeg {median['child_cpu_seconds']:.2f}s"
+                      + (f", rss {median['peak_rss_mb']:.0f} MB" if 'peak_rss_mb' in median else ""))
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to: {args.output}")
+    
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get('server') != results['server']:
+            print(f"⚠️  Baseline was measured with different server settings: {baseline.get('server')}")
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"\n⚠️  {len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Local media server - Stand-in for a media site in offline benchmarks
+Serves synthetic audio/video files with HTTP range support and an RSS
+playlist feed, all consumable through yt-dlp's generic extractor
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+
+# name -> ffmpeg arguments producing it
+MEDIA = {
+    'tone.wav': ['-f', 'lavfi', '-i', 'sine=frequency=440:duration=30', '-ac', '2', '-ar', '44100'],
+    'tone.opus': ['-f', 'lavfi', '-i', 'sine=frequency=440:duration=30', '-c:a', 'libopus', '-b:a', '96k'],
+    'track.wav': ['-f', 'lavfi', '-i', 'sine=frequency=660:duration=5', '-ac', '2', '-ar', '44100'],
+    'clip.mp4': ['-f', 'lavfi', '-i', 'testsrc=duration=10:size=640x360:rate=25',
+                 '-f', 'lavfi', '-i', 'sine=frequency=440:duration=10',
+                 '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-shortest'],
+    'large.wav': ['-f', 'lavfi', '-i', 'anoisesrc=duration=240:color=pink', '-ac', '2', '-ar', '44100'],
+}
+
+
+def generate_media(directory, ffmpeg: str = None) -> Path:
+    """
+    Create the synthetic media files (skipping ones that already exist)
+    
+    Args:
+        directory: Directory to write the files to
+        ffmpeg: FFmpeg executable (default: ffmpeg on PATH)
+    
+    Returns:
+        Path: The media directory
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    ffmpeg = ffmpeg or shutil.which('ffmpeg') or 'ffmpeg'
+    for name, args in MEDIA.items():
+        target = directory / name
+        if target.exists():
+            continue
+        temp = target.with_name('tmp-' + name)
+        subprocess.run([ffmpeg, '-y', '-nostdin', '-loglevel', 'error', *args, str(temp)], check=True)
+        os.replace(temp, target)
+    return directory
+
+
+class MediaRequestHandler(SimpleHTTPRequestHandler):
+    """Static file handler with byte ranges, throttling and a generated RSS feed"""
+    
+    latency = 0.0  # seconds added to every request
+    rate = None  # bytes per second per response, None for unlimited
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def translate_path(self, path):
+        # track<N>.wav is track.wav under a title and id of its own
+        return super().translate_path(re.sub(r'^/track\d+\.wav', '/track.wav', path))
+    
+    def send_head(self):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(self.path)
+        if url.path == '/feed.xml':
+            return self._send_feed(parse_qs(url.query))
+        
+        path = self.translate_path(self.path)
+        match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range') or '')
+        if not match or not os.path.isfile(path):
+            self._remaining = None
+            return super().send_head()
+        
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+        if start >= size:
+            self.send_error(416, "Requested Range Not Satisfiable")
+            return None
+        f = open(path, 'rb')
+        f.seek(start)
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        self._remaining = end - start + 1
+        return f
+    
+    def _send_feed(self, query):
+        """RSS feed of `n` items, each pointing at track.wav under its own name"""
+        count = int(query.get('n', ['8'])[0])
+        base = f"http://{self.headers.get('Host')}"
+        items = ''.join(
+            f'<item><title>Track {i:03d}</title><guid>track-{i}</guid>'
+            f'<enclosure url="{escape(base)}/track{i}.wav" type="audio/wav"/></item>'
+            for i in range(count))
+        body = (f'<?xml version="1.0"?><rss version="2.0"><channel><title>Benchmark feed</title>'
+                f'{items}</channel></rss>').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/rss+xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return None
+    
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, '_remaining', None)
+        started = time.monotonic()
+        sent = 0
+        while remaining is None or remaining > 0:
+            block = source.read(64 * 1024 if remaining is None else min(64 * 1024, remaining))
+            if not block:
+                break
+            outputfile.write(block)
+            sent += len(block)
+            if remaining is not None:
+                remaining -= len(block)
+            if self.rate:
+                ahead = sent / self.rate - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Threaded server that ignores clients hanging up mid-response"""
+    
+    daemon_threads = True
+    
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MediaServer:
+    """Threaded HTTP server for a media directory, usable as a context manager"""
+    
+    def __init__(self, directory, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, rate: int = None):
+        """
+        Args:
+            directory: Directory to serve
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+            latency: Seconds added to every request
+            rate: Per-response bandwidth limit in bytes per second
+        """
+        handler = type('Handler', (MediaRequestHandler,), {'latency': latency, 'rate': rate})
+        directory = str(directory)
+        
+        def factory(*args, **kwargs):
+            return handler(*args, directory=directory, **kwargs)
+        
+        self.httpd = QuietHTTPServer((host, port), factory)
+        self._thread = None
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def url(self, name: str) -> str:
+        """Return the URL of a served file"""
+        return f"{self.base_url}/{name}"
+    
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Serve synthetic media for benchmarks")
+    parser.add_argument("directory", nargs="?", default="bench-media", help="Media directory")
+    parser.add_argument("--port", type=int, default=8799, help="Port - default: 8799")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--rate", type=int, help="Bandwidth limit per response in bytes/s")
+    args = parser.parse_args()
+    
+    generate_media(args.directory)
+    with MediaServer(args.directory, port=args.port, latency=args.latency, rate=args.rate) as server:
+        print(f"Serving {args.directory} at {server.base_url} (feed: {server.url('feed.xml?n=8')})")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark - Time from launch to useful work for the CLI, GUI and frozen build
+Every sample is a fresh process, timed from spawn to exit. The GUI and the
+frozen executable are started with MEDIA_DOWNLOADER_EXIT_WHEN_DRAWN set, so
+they close as soon as the first window is on screen.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench import SRC_DIR, compare, environment
+from media_server import MediaServer, generate_media
+
+
+def timed(command: list, cwd=None, env=None) -> float:
+    """Run a command to completion and return its wall-clock time"""
+    started = time.perf_counter()
+    process = subprocess.run(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    seconds = time.perf_counter() - started
+    if process.returncode != 0:
+        error = process.stderr.decode("utf-8", "replace").strip().splitlines()
+        raise RuntimeError(error[-1] if error else f"exit code {process.returncode}")
+    return seconds
+
+
+def has_display() -> bool:
+    """Whether a Tk window can be opened here"""
+    return sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def scenarios(base: str, workdir: str, exe: str = None) -> dict:
+    """
+    Return the startup scenarios as name -> (setup, command, environment)
+    
+    setup is run once before the samples (e.g. to fill a cache) and may be None.
+    """
+    python = sys.executable
+    cli = [python, str(SRC_DIR / "downloader.py")]
+    info = cli + ["-i", f"{base}/tone.wav", "-o", workdir]
+    probe = dict(os.environ, MEDIA_DOWNLOADER_EXIT_WHEN_DRAWN="1")
+    found = {
+        'import_downloader': (None, [python, "-c", "import downloader"], dict(os.environ, PYTHONPATH=str(SRC_DIR))),
+        'import_yt_dlp': (None, [python, "-c", "import yt_dlp"], None),
+        'cli_help': (None, cli + ["--help"], None),
+        'cli_info_cold': (None, cli + ["-i", f"{base}/tone.wav", "--no-cache", "-o", workdir], None),
+        'cli_info_cached': (info, info, None),
+    }
+    if has_display():
+        found['gui_first_paint'] = (None, [python, str(SRC_DIR / "gui.py")], probe)
+    if exe:
+        found['frozen_first_paint'] = (None, [exe], probe)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure startup time of the CLI, the GUI and the frozen executable",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Measure the CLI and GUI from source
+  python benchmarks/startup.py -o startup.json
+  
+  # Include a PyInstaller build and compare with a baseline
+  python benchmarks/startup.py --exe dist/MediaDownloader.exe --compare startup-baseline.json
+        """
+    )
+    parser.add_argument("scenarios", nargs="*", help="Scenarios to run - default: all available")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="Samples per scenario - default: 5")
+    parser.add_argument("-o", "--output", help="Write the results as JSON to this file")
+    parser.add_argument("--exe", help="Frozen executable to measure (built with build_exe.py)")
+    parser.add_argument("--compare", metavar="FILE", help="Baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative change counted as a regression - default: 0.10")
+    parser.add_argument("--media-dir", help="Where to keep the generated media - default: a temporary directory")
+    args = parser.parse_args()
+    
+    results = {'environment': environment(), 'scenarios': {}}
+    with tempfile.TemporaryDirectory(prefix="startup-") as workdir:
+        media_dir = generate_media(args.media_dir or Path(workdir) / "media")
+        with MediaServer(media_dir) as server:
+            available = scenarios(server.base_url, str(Path(workdir) / "out"), args.exe)
+            unknown = [name for name in args.scenarios if name not in available]
+            if unknown:
+                print(f"❌ Error: Unknown or unavailable scenario(s): {', '.join(unknown)}", file=sys.stderr)
+                return 1
+            if not has_display():
+                print("⚠️  No display found, skipping the GUI")
+            
+            for name in args.scenarios or available:
+                setup, command, env = available[name]
+                print(f"⏱️  {name} ...", end=" ", flush=True)
+                if setup:
+                    timed(setup, env=env)
+                samples = [timed(command, env=env) for _ in range(max(1, args.repeat))]
+                median = statistics.median(samples)
+                results['scenarios'][name] = {'median': {'seconds': median}, 'runs': samples}
+                print(f"{median * 1000:.0f} ms (min {min(samples) * 1000:.0f} ms)")
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to: {args.output}")
+    
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"\n⚠️  {len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
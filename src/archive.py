@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Download archive - Indexed record of media already saved to disk
+Consulted before any network fetch so re-syncing a playlist only costs
+the playlist listing
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class DownloadArchive:
+    """SQLite-backed archive of finished downloads"""
+    
+    def __init__(self, path):
+        """
+        Open (or create) a download archive
+        
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False,
+                                     isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                extractor TEXT NOT NULL,
+                id TEXT NOT NULL,
+                format TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                recorded REAL NOT NULL,
+                PRIMARY KEY (extractor, id, format)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS aliases (
+                url TEXT PRIMARY KEY,
+                extractor TEXT NOT NULL,
+                id TEXT NOT NULL
+            ) WITHOUT ROWID;
+        """)
+    
+    def lookup_url(self, url: str):
+        """Return the (extractor, id) recorded for a URL, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT extractor, id FROM aliases WHERE url = ?", (url,)).fetchone()
+        return tuple(row) if row else None
+    
+    def get(self, extractor: str, id: str, format: str):
+        """
+        Look up an archived item
+        
+        Returns:
+            dict: The archived record (path, size, mtime, recorded), or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, size, mtime, recorded FROM items "
+                "WHERE extractor = ? AND id = ? AND format = ?",
+                (extractor.lower(), str(id), format)).fetchone()
+        if row is None:
+            return None
+        return {'path': row[0], 'size': row[1], 'mtime': row[2], 'recorded': row[3]}
+    
+    def contains(self, extractor: str, id: str, format: str) -> bool:
+        """
+        Check whether an item was downloaded and its file is still intact
+        
+        An entry whose file has been deleted or changed size no longer counts,
+        so the item gets downloaded again.
+        """
+        record = self.get(extractor, id, format)
+        if record is None:
+            return False
+        try:
+            return os.stat(record['path']).st_size == record['size']
+        except OSError:
+            return False
+    
+    def record(self, extractor: str, id: str, format: str, path, urls=()):
+        """
+        Record a finished download
+        
+        Args:
+            extractor: Extractor key (e.g. Youtube, Soundcloud)
+            id: Media id within the extractor
+            format: Output profile (e.g. mp3, video:best)
+            path: Final output file
+            urls: URLs that resolve to this item
+        """
+        stat = os.stat(path)
+        extractor = extractor.lower()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO items "
+                    "(extractor, id, format, path, size, mtime, recorded) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (extractor, str(id), format, str(Path(path).resolve()),
+                     stat.st_size, stat.st_mtime, time.time()))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO aliases (url, extractor, id) VALUES (?, ?, ?)",
+                    [(url, extractor, str(id)) for url in urls if url])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Async downloader - asyncio front end for MediaDownloader
+Downloads run on a private thread pool behind semaphores; cancelling the
+awaiting task stops the transfer at its next progress update and removes the
+partial files, and progress can be consumed with `async for`
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from downloader import MediaDownloader
+
+
+PROGRESS_INTERVAL = 0.25
+
+
+class DownloadTask:
+    """
+    A download started by AsyncMediaDownloader
+    
+    Await it for the result dict ('url', 'success', 'skipped', 'error',
+    'elapsed'), cancel it with cancel(), or iterate over it with `async for`
+    to receive its yt-dlp progress dicts until it finishes.
+    """
+    
+    def __init__(self, url: str, loop):
+        self.url = url
+        self._loop = loop
+        self._progress = asyncio.Queue()
+        self._last = 0.0
+        self.task = None
+    
+    def __await__(self):
+        return self.task.__await__()
+    
+    def cancel(self) -> bool:
+        """Cancel the download; awaiting the task then raises CancelledError"""
+        return self.task.cancel()
+    
+    def done(self) -> bool:
+        return self.task.done()
+    
+    def __aiter__(self):
+        return self._iterate()
+    
+    async def _iterate(self):
+        while True:
+            progress = await self._progress.get()
+            if progress is None:
+                return
+            yield progress
+    
+    def _push(self, d: dict):
+        """Forward a progress dict from a worker thread, at most every PROGRESS_INTERVAL per task"""
+        now = time.monotonic()
+        if d.get('status') == 'downloading' and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        progress = {key: value for key, value in d.items() if key != 'info_dict'}
+        self._loop.call_soon_threadsafe(self._progress.put_nowait, progress)
+    
+    def _close(self):
+        self._progress.put_nowait(None)
+
+
+class AsyncMediaDownloader:
+    """
+    Awaitable download_audio/download_video/get_info/download_many
+    
+    Downloads and info lookups have their own semaphores, so callers can
+    submit any number of coroutines and only `max_concurrent` transfers (and
+    `max_info` lookups) run at a time; the rest wait without holding a
+    thread. Work runs on a private thread pool, never the loop's default
+    executor.
+    """
+    
+    def __init__(self, downloader: MediaDownloader = None, max_concurrent: int = 4, max_info: int = 8,
+                 **kwargs):
+        """
+        Args:
+            downloader: MediaDownloader to run on (default: a new one made from kwargs,
+                        closed together with this object)
+            max_concurrent: Downloads running at the same time
+            max_info: Info lookups running at the same time
+            **kwargs: MediaDownloader arguments when no downloader is given
+        """
+        self._owned = downloader is None
+        self.downloader = downloader or MediaDownloader(**kwargs)
+        self._downloads = asyncio.Semaphore(max_concurrent)
+        self._lookups = asyncio.Semaphore(max_info)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent + max_info,
+                                            thread_name_prefix="async-download")
+        self._subscribers = []
+        self._subscribers_lock = threading.Lock()
+        
+        # Fan the downloader's metrics events out to events() iterators
+        previous = self.downloader.metrics.listener
+        
+        def listener(event):
+            if previous is not None:
+                previous(event)
+            with self._subscribers_lock:
+                subscribers = list(self._subscribers)
+            for loop, queue in subscribers:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+        
+        self.downloader.metrics.listener = listener
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *args):
+        await self.close()
+    
+    async def close(self):
+        """Wait for running work, then release the thread pool (and the downloader if owned)"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        if self._owned:
+            await loop.run_in_executor(None, self.downloader.close)
+    
+    async def get_info(self, url: str, refresh: bool = False) -> dict:
+        """
+        Get information about media without downloading
+        
+        Cancelling only stops the wait; a lookup already running finishes in
+        the background and still fills the metadata cache.
+        """
+        async with self._lookups:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self.downloader.get_info, url, refresh)
+    
+    def start_audio(self, url: str, format="mp3", allow_playlist: bool = False) -> DownloadTask:
+        """Start an audio download and return its DownloadTask"""
+        return self._start(url, "audio", format, "best", allow_playlist)
+    
+    def start_video(self, url: str, quality: str = "best", allow_playlist: bool = False) -> DownloadTask:
+        """Start a video download and return its DownloadTask"""
+        return self._start(url, "video", "mp3", quality, allow_playlist)
+    
+    async def download_audio(self, url: str, format="mp3", allow_playlist: bool = False) -> bool:
+        """
+        Download audio from URL and convert to specified format
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return (await self.start_audio(url, format, allow_playlist))['success']
+    
+    async def download_video(self, url: str, quality: str = "best", allow_playlist: bool = False) -> bool:
+        """
+        Download video from URL
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return (await self.start_video(url, quality, allow_playlist))['success']
+    
+    async def download_many(self, urls, mode: str = "audio", format="mp3", quality: str = "best",
+                            allow_playlist: bool = False) -> list:
+        """
+        Download several URLs, at most `max_concurrent` at a time
+        
+        Returns:
+            list: One result dict per URL, in input order (see DownloadTask);
+                  cancelling stops every download still running
+        """
+        tasks = [self._start(url, mode, format, quality, allow_playlist) for url in urls]
+        try:
+            return list(await asyncio.gather(*(task.task for task in tasks)))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+    
+    async def events(self, maxsize: int = 1000):
+        """
+        Iterate over the downloader's events (job_start, progress, stage, failure, job_end)
+        
+        A consumer that falls more than `maxsize` events behind loses the
+        oldest ones instead of growing the queue.
+        """
+        queue = asyncio.Queue(maxsize)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._subscribers_lock:
+            self._subscribers.append(subscriber)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            with self._subscribers_lock:
+                self._subscribers.remove(subscriber)
+    
+    @staticmethod
+    def _deliver(queue, event: dict):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+    
+    def _start(self, url: str, mode: str, format, quality: str, allow_playlist: bool) -> DownloadTask:
+        loop = asyncio.get_running_loop()
+        download = DownloadTask(url, loop)
+        download.task = loop.create_task(self._run(download, mode, format, quality, allow_playlist))
+        return download
+    
+    async def _run(self, download: DownloadTask, mode: str, format, quality: str, allow_playlist: bool) -> dict:
+        """Run one download on the pool, turning task cancellation into a stopped transfer"""
+        from yt_dlp.utils import DownloadCancelled
+        
+        cancelled = threading.Event()
+        
+        def progress(d):
+            if cancelled.is_set():
+                raise DownloadCancelled('Cancelled by request')
+            download._push(d)
+        
+        try:
+            async with self._downloads:
+                result = {'url': download.url, 'success': False}
+                future = asyncio.get_running_loop().run_in_executor(
+                    self._executor,
+                    lambda: self.downloader._run_job(result, mode, format, quality, allow_playlist,
+                                                     progress=progress))
+                try:
+                    return await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    # The transfer stops at its next progress update and removes its partial files
+                    await asyncio.wait([future])
+                    raise
+        finally:
+            download._close()
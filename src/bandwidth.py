@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Bandwidth scheduler - Share a global download rate between concurrent jobs
+Every running download is paced to its own rate, recomputed as jobs start,
+finish and report their speed; jobs share by priority, and processes using
+the same output directory can split the rate through heartbeat files
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+
+PRIORITIES = {'low': 1, 'normal': 4, 'high': 16}
+
+
+def parse_priority(value) -> int:
+    """
+    Turn a priority name (low, normal, high) or a positive number into a weight
+    
+    Raises:
+        ValueError: If the value is neither
+    """
+    if isinstance(value, str) and value.lower() in PRIORITIES:
+        return PRIORITIES[value.lower()]
+    try:
+        weight = int(value)
+    except (TypeError, ValueError):
+        weight = 0
+    if weight < 1:
+        raise ValueError(f"Invalid priority: {value!r} (use {', '.join(PRIORITIES)} or a positive number)")
+    return weight
+
+
+def fair_shares(total: float, streams: list) -> list:
+    """
+    Weighted max-min fair split of a rate
+    
+    Streams that need less than their weighted share (their demand) get
+    what they need; what they leave is split between the others by weight.
+    
+    Args:
+        total: Rate to split
+        streams: (weight, demand) pairs; demand is None for a stream that takes all it gets
+    
+    Returns:
+        list: The rate of each stream, in input order
+    """
+    rates = [0.0] * len(streams)
+    open_streams = [i for i, (weight, _) in enumerate(streams) if weight > 0]
+    remaining = total
+    while open_streams:
+        weights = sum(streams[i][0] for i in open_streams)
+        satisfied = [i for i in open_streams
+                     if streams[i][1] is not None and streams[i][1] <= remaining * streams[i][0] / weights]
+        if not satisfied:
+            for i in open_streams:
+                rates[i] = remaining * streams[i][0] / weights
+            break
+        for i in satisfied:
+            rates[i] = streams[i][1]
+            remaining -= streams[i][1]
+            open_streams.remove(i)
+    return rates
+
+
+class BandwidthGroup:
+    """A job, or a batch/playlist of downloads, that shares one priority weight (and optionally a limit)"""
+    
+    def __init__(self, weight: int, limit: int = None):
+        self.weight = weight
+        self.limit = limit
+
+
+class BandwidthScheduler:
+    """
+    Global download rate cap split between running downloads
+    
+    Each group (one job, or a whole batch or playlist) gets a share of the
+    cap proportional to its priority weight, split evenly between its
+    running downloads, so a small interactive job is not starved by a large
+    playlist. Downloads that cannot use their share (a slow source) keep
+    only what they use and the rest goes to the others.
+    
+    A group may also carry its own limit, which its downloads together
+    never exceed. Without a scheduler-wide limit, the largest limit of the
+    running groups is the cap that is split (none, if a running group has
+    no limit), so jobs started with one limit share it as before.
+    
+    With a directory, every scheduler (several processes, or several
+    downloaders in one) writes a heartbeat file there with the weight of
+    its running groups and takes its weighted part of the cap.
+    """
+    
+    REBALANCE_INTERVAL = 1.0  # seconds between rate updates while downloading
+    HEARTBEAT_TIMEOUT = 5.0  # heartbeats older than this belong to idle or dead processes
+    SLACK = 0.8  # a download below this fraction of its rate is limited by its source
+    SETTLE = 3.0  # seconds a download runs before its speed is trusted
+    BURST = 0.5  # seconds of its rate a download may get ahead by
+    BLOCK_SIZE = 64 * 1024  # yt-dlp read size, small enough for smooth pacing
+    
+    def __init__(self, limit: int = None, directory=None):
+        """
+        Args:
+            limit: Total bytes per second for all downloads, or None to go by the groups' limits
+            directory: Optional directory for cross-process heartbeat files
+        """
+        self.limit = limit
+        self.directory = Path(directory) if directory else None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # One file per scheduler: a process may run several (e.g. one per GUI profile)
+            name = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self._heartbeat = self.directory / f"{name}.json"
+        self._streams = []
+        self._lock = threading.Lock()
+        self._rebalanced = 0.0
+    
+    def group(self, priority=PRIORITIES['normal'], limit: int = None) -> BandwidthGroup:
+        """Create a group for one job or batch, optionally capped at `limit` bytes per second"""
+        return BandwidthGroup(parse_priority(priority), limit)
+    
+    @contextmanager
+    def stream(self, ydl, group: BandwidthGroup):
+        """
+        Pace the downloads a checked-out YoutubeDL makes for one job
+        
+        Pacing happens in a progress hook: after each block the download
+        sleeps until it is back within its current rate. yt-dlp's own
+        'ratelimit' is not used, because it limits the average since the
+        download started and so cannot follow a rate that changes.
+        """
+        now = time.monotonic()
+        state = {'group': group, 'rate': None, 'speed': None, 'started': now, 'files': {},
+                 'received': 0, 'measured': (now, 0), 'budget': 0.0, 'refilled': now,
+                 'lock': threading.Lock()}
+        
+        def pace(d):
+            file = d.get('tmpfilename') or d.get('filename')
+            downloaded = d.get('downloaded_bytes') or 0
+            with state['lock']:
+                received = max(0, downloaded - state['files'].get(file, 0))
+                state['files'][file] = downloaded
+                state['received'] += received
+                state['budget'] -= received
+            if time.monotonic() - self._rebalanced >= self.REBALANCE_INTERVAL:
+                self.rebalance()
+            if d.get('status') == 'downloading':
+                self._wait(state)
+        
+        with self._lock:
+            self._streams.append(state)
+        self.rebalance()
+        ydl.add_progress_hook(pace)
+        try:
+            yield
+        finally:
+            ydl._progress_hooks.remove(pace)
+            with self._lock:
+                self._streams.remove(state)
+            self.rebalance()
+    
+    def _wait(self, state: dict):
+        """Sleep until a download's byte budget is no longer negative"""
+        while True:
+            with state['lock']:
+                now = time.monotonic()
+                rate = state['rate']
+                if rate is None:
+                    return
+                state['budget'] = min(rate * self.BURST, state['budget'] + (now - state['refilled']) * rate)
+                state['refilled'] = now
+                if state['budget'] >= 0:
+                    return
+                delay = -state['budget'] / rate
+            # Short naps, so a raised rate takes effect at once
+            time.sleep(min(delay, 0.2))
+    
+    def rebalance(self):
+        """Recompute the rate of every running download"""
+        with self._lock:
+            now = time.monotonic()
+            self._rebalanced = now
+            streams = list(self._streams)
+            running = {}
+            for state in streams:
+                running[state['group']] = running.get(state['group'], 0) + 1
+            local = sum(group.weight for group in running)
+            total = self.limit
+            if total is None and running and all(group.limit for group in running):
+                total = max(group.limit for group in running)
+            if self.directory:
+                # An unlimited scheduler takes no part in the split
+                others = self._exchange_heartbeats(local if total else 0)
+                if local and total:
+                    total = total * local / (local + others)
+            
+            demands = []
+            for state in streams:
+                since, received = state['measured']
+                if now - since >= self.REBALANCE_INTERVAL / 2:
+                    state['speed'] = (state['received'] - received) / (now - since)
+                    state['measured'] = (now, state['received'])
+                group = state['group']
+                cap = group.limit / running[group] if group.limit else None
+                demand = cap
+                if (state['rate'] and state['speed'] is not None and now - state['started'] >= self.SETTLE
+                        and state['speed'] < self.SLACK * state['rate']):
+                    # Headroom lets it speed up again if the source does
+                    demand = max(state['speed'] / self.SLACK, self.BLOCK_SIZE)
+                    demand = min(demand, cap) if cap else demand
+                demands.append((group.weight / running[group], demand, cap))
+            if total:
+                rates = fair_shares(total, [(weight, demand) for weight, demand, _ in demands])
+            else:
+                # Unlimited: only the groups' own limits apply
+                rates = [cap for _, _, cap in demands]
+            for state, rate in zip(streams, rates):
+                state['rate'] = None if rate is None else max(1.0, rate)
+    
+    def _exchange_heartbeats(self, weight: int) -> int:
+        """Publish this scheduler's weight and return the total weight of the other live schedulers"""
+        try:
+            if weight:
+                temp = self._heartbeat.with_suffix('.tmp')
+                temp.write_text(json.dumps({'weight': weight, 'time': time.time()}), encoding="utf-8")
+                os.replace(temp, self._heartbeat)
+            elif self._heartbeat.exists():
+                self._heartbeat.unlink()
+        except OSError:
+            pass
+        
+        others = 0
+        deadline = time.time() - self.HEARTBEAT_TIMEOUT
+        for path in self.directory.glob("*.json"):
+            if path == self._heartbeat:
+                continue
+            try:
+                beat = json.loads(path.read_text(encoding="utf-8"))
+                if beat['time'] >= deadline:
+                    others += beat['weight']
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+        return others
+    
+    def close(self):
+        """Remove this scheduler's heartbeat"""
+        if self.directory:
+            try:
+                self._heartbeat.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Metadata cache - Persistent SQLite cache for extracted media information
+Entries are keyed by extractor and media id, expire after a TTL and are
+evicted least-recently-used first once the cache grows past its size limit
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+
+class MetadataCache:
+    """On-disk cache of yt-dlp info dicts"""
+    
+    def __init__(self, path, ttl: float = 24 * 3600, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Open (or create) a metadata cache
+        
+        Args:
+            path: SQLite database file
+            ttl: Seconds an entry stays valid
+            max_bytes: Total size of stored (compressed) entries before eviction
+        """
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False,
+                                     isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched REAL NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+            CREATE TABLE IF NOT EXISTS aliases (
+                url TEXT PRIMARY KEY,
+                key TEXT NOT NULL
+            );
+        """)
+    
+    @staticmethod
+    def key_for(info: dict):
+        """Return the cache key (extractor:id) for an info dict, or None"""
+        extractor = info.get('extractor_key') or info.get('ie_key')
+        if not extractor or not info.get('id'):
+            return None
+        return f"{extractor}:{info['id']}"
+    
+    def lookup_url(self, url: str):
+        """Return the cache key previously stored for a URL, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key FROM aliases WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+    
+    def get(self, key: str):
+        """
+        Get a cached info dict
+        
+        Args:
+            key: Cache key (extractor:id), or None for an unknown URL
+        
+        Returns:
+            dict: The cached info, or None if missing or expired
+        """
+        now = time.time()
+        with self._lock:
+            row = None
+            if key is not None:
+                row = self._conn.execute(
+                    "SELECT data, fetched FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+    
+    def put(self, key: str, info: dict, urls=()):
+        """
+        Store an info dict
+        
+        Args:
+            key: Cache key (extractor:id)
+            info: JSON-serialisable info dict
+            urls: URLs that resolve to this entry
+        """
+        data = zlib.compress(json.dumps(info).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, data, size, fetched, accessed) "
+                    "VALUES (?, ?, ?, ?, ?)", (key, data, len(data), now, now))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO aliases (url, key) VALUES (?, ?)",
+                    [(url, key) for url in urls if url])
+                self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def _evict(self):
+        """Drop expired entries, then least recently used ones over the size limit"""
+        removed = self._conn.execute(
+            "DELETE FROM entries WHERE fetched < ?", (time.time() - self.ttl,)).rowcount
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            freed = 0
+            victims = []
+            for key, size in self._conn.execute(
+                    "SELECT key, size FROM entries ORDER BY accessed"):
+                if total - freed <= self.max_bytes:
+                    break
+                victims.append((key,))
+                freed += size
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+            removed += len(victims)
+        if removed:
+            self._conn.execute(
+                "DELETE FROM aliases WHERE key NOT IN (SELECT key FROM entries)")
+    
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current cache size"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+    
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM aliases")
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
@@ -2,44 +2,426 @@
 """
 Media Downloader - Download audio and video from various platforms
 Supports SoundCloud, YouTube, and hundreds of other sites via yt-dlp
+
+yt-dlp takes a few hundred milliseconds to import, so it is only imported
+when a session is first needed; --help, cached -i lookups and the GUI's
+first window never pay for it.
 """
 
 import argparse
+import itertools
+import json
+import os
 import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import ExitStack, closing, contextmanager
+from functools import lru_cache
 from pathlib import Path
-import yt_dlp
+from urllib.parse import urlparse
+
+from archive import DownloadArchive
+from bandwidth import BandwidthScheduler, parse_priority
+from cache import MetadataCache
+from jobqueue import JobQueue, QueueWorker
+from journal import DOWNLOAD, TRANSCODE, DownloadJournal, stream_expired
+from media_info import MediaInfo
+from metrics import JsonLinesWriter, Metrics
+from retry import Retrier
+from store import ContentStore
+from sync import SyncState, entry_date, entry_key
+from transcode import (KEEP, SOURCE_PREFERENCE, TranscodeError, Transcoder, gather, parse_formats, pipe_through,
+                       plan_audio, stream_command, transcode_audio)
+
+
+def host_of(url: str) -> str:
+    """Return the host part of a URL (with its port, if given) used for per-host limits and retries"""
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    host = host[4:] if host.startswith("www.") else host
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    return f"{host}:{port}" if port else host
+
+
+def canonical_key(url: str):
+    """
+    Resolve a URL to its extractor:id key without any network access
+    
+    Different URL shapes of the same item (e.g. youtube.com/watch?v=ID and
+    youtu.be/ID) map to the same key.
+    
+    Returns:
+        str: The key, or None if the extractor cannot tell the id from the URL
+    """
+    from yt_dlp.extractor import gen_extractor_classes
+    
+    for ie in gen_extractor_classes():
+        if ie.ie_key() == 'Generic':
+            continue
+        if ie.suitable(url):
+            temp_id = ie.get_temp_id(url)
+            return f"{ie.ie_key()}:{temp_id}" if temp_id else None
+    return None
+
+
+class SessionPool:
+    """
+    Pool of long-lived YoutubeDL instances keyed by option profile
+    
+    A YoutubeDL instance keeps its extractors, cookie jar and HTTP handlers
+    alive between calls, so reusing one saves the setup cost and keeps
+    connections warm. Each instance is checked out by one thread at a time,
+    which makes the pool safe to share between worker threads.
+    """
+    
+    def __init__(self, max_idle: int = 4, factory=None):
+        """
+        Args:
+            max_idle: Idle instances kept per profile
+            factory: Callable creating an instance from options (default: yt_dlp.YoutubeDL)
+        """
+        self.max_idle = max_idle
+        self.factory = factory or youtube_dl
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._closed = False
+    
+    @contextmanager
+    def session(self, profile, ydl_opts: dict, setup=None):
+        """
+        Check out a YoutubeDL instance for the given profile
+        
+        Args:
+            profile: Hashable key identifying the option profile
+            ydl_opts: Options used if a new instance has to be created
+            setup: Optional callable run once on a newly created instance
+        
+        Yields:
+            yt_dlp.YoutubeDL: An instance for exclusive use by the caller
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Session pool is closed")
+            idle = self._idle.get(profile)
+            ydl = idle.pop() if idle else None
+        
+        if ydl is None:
+            ydl = self.factory(ydl_opts)
+            if setup:
+                setup(ydl)
+        
+        try:
+            yield ydl
+        finally:
+            with self._lock:
+                idle = self._idle.setdefault(profile, [])
+                if not self._closed and len(idle) < self.max_idle:
+                    idle.append(ydl)
+                    ydl = None
+            if ydl is not None:
+                ydl.close()
+    
+    def close(self):
+        """Close all idle instances and refuse further checkouts"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, {}
+        for instances in idle.values():
+            for ydl in instances:
+                ydl.close()
+
+
+class OutputClaims:
+    """
+    Output paths being written by running jobs
+    
+    Two jobs resolving to the same file name would share its .part file
+    and its conversion, so the second one waits until the first has
+    released the path; by then it is usually in the download archive and
+    is skipped.
+    """
+    
+    def __init__(self):
+        self._paths = set()
+        self._changed = threading.Condition()
+    
+    def claim(self, path, on_wait=None):
+        """
+        Take a path, waiting while another job holds it
+        
+        Args:
+            on_wait: Optional callable run once before waiting
+        """
+        path = os.path.abspath(path)
+        with self._changed:
+            if path in self._paths and on_wait:
+                on_wait()
+            while path in self._paths:
+                self._changed.wait()
+            self._paths.add(path)
+    
+    def release(self, paths):
+        """Give up paths taken with claim()"""
+        with self._changed:
+            self._paths.difference_update(os.path.abspath(path) for path in paths)
+            self._changed.notify_all()
+
+
+# Shared by every downloader in the process, so they also wait for each other
+OUTPUT_CLAIMS = OutputClaims()
+
+
+def youtube_dl(ydl_opts: dict):
+    """Create a plain yt_dlp.YoutubeDL"""
+    import yt_dlp
+    
+    return yt_dlp.YoutubeDL(ydl_opts)
+
+
+def segmented_youtube_dl(ydl_opts: dict):
+    """Create a YoutubeDL that fetches direct files over several connections when allowed"""
+    from segmented import SegmentedYoutubeDL
+    
+    return SegmentedYoutubeDL(ydl_opts)
+
+
+def warm_up():
+    """Import yt-dlp and its extractors ahead of the first download (e.g. while a GUI is idle)"""
+    import segmented  # noqa: F401 - imports yt_dlp
+    from yt_dlp.extractor import gen_extractor_classes
+    
+    gen_extractor_classes()
+
+
+@lru_cache(maxsize=None)
+def archive_recorder():
+    """
+    Return the ArchiveRecorder post-processor class
+    
+    The class derives from yt-dlp's PostProcessor, so it is defined on
+    first use to keep yt-dlp out of the module import.
+    """
+    from yt_dlp.postprocessor import PostProcessor
+    
+    class ArchiveRecorder(PostProcessor):
+        """Post-processor that records finished files in a DownloadArchive and ContentStore"""
+        
+        def __init__(self, archive: DownloadArchive, format: str, store: ContentStore = None):
+            super().__init__()
+            self.archive = archive
+            self.format = format
+            self.store = store
+        
+        def run(self, info):
+            path = info.get('filepath')
+            if info.get('extractor_key') and info.get('id') and path and os.path.exists(path):
+                urls = (info.get('original_url'), info.get('webpage_url'))
+                if self.store is not None:
+                    self.store.add(path, info['extractor_key'], info['id'], self.format, urls=urls)
+                if self.archive is not None:
+                    self.archive.record(info['extractor_key'], info['id'], self.format, path, urls=urls)
+            return [], info
+    
+    return ArchiveRecorder
 
 
 class MediaDownloader:
     """Handler for downloading media from URLs"""
     
-    def __init__(self, output_dir: str = "downloads"):
-        self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(exist_ok=True)
+    TRANSCODE_LABELS = {
+        'keep': '♻️  Already in target format',
+        'remux': '📦 Remuxed without re-encoding',
+        'encode': '🔄 Encoded',
+    }
+    
+    USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
     
-    def download_audio(self, url: str, format: str = "mp3", allow_playlist: bool = False) -> bool:
+    def __init__(self, output_dir: str = "downloads", cache_path: str = None, use_cache: bool = True,
+                 archive_path: str = None, use_archive: bool = True, transcode_workers: int = None,
+                 connections: int = 1, chunk_size: int = None, use_journal: bool = True,
+                 events=None, metrics_path: str = None, rate_limit: int = None, priority="normal",
+                 share_bandwidth: bool = False, retries: int = 3, store_path: str = None):
         """
-        Download audio from URL and convert to specified format
+        Set up a downloader
         
         Args:
-            url: The URL to download from
-            format: Audio format (mp3, m4a, wav, etc.)
-            allow_playlist: If True, download entire playlist; if False, only single video
+            output_dir: Directory downloads are saved to
+            cache_path: Metadata cache file (default: output_dir/.media-cache.sqlite3)
+            use_cache: If False, do not read or write the metadata cache
+            archive_path: Download archive file (default: output_dir/.media-archive.sqlite3)
+            use_archive: If False, never skip items that are already downloaded
+            transcode_workers: Parallel FFmpeg conversions (default: CPU cores)
+            connections: Connections per download; above 1, direct files are fetched
+                         as parallel byte ranges and DASH/HLS fragments concurrently
+            chunk_size: Bytes per range request (default: 10 MiB when segmenting)
+            use_journal: If False, do not checkpoint jobs for resuming after a crash
+            events: Optional callable receiving every metrics event (progress,
+                    stage timings, job start/end, failures) as a dict
+            metrics_path: Optional file kept up to date with a Prometheus text snapshot
+            rate_limit: Total bytes per second for all downloads, shared by priority
+            priority: Default job priority (low, normal, high or a weight) under rate_limit
+            share_bandwidth: If True, split rate_limit with other processes using
+                             the same output directory (heartbeats in output_dir/.bandwidth);
+                             jobs may then also carry their own limit (see _share)
+            retries: Extra attempts after transient and throttled failures (0 disables);
+                     a host that keeps failing is paused by a circuit breaker
+            store_path: Optional content store directory shared between output directories;
+                        finished files are kept there once and linked into output_dir
+        """
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(exist_ok=True)
+        self.connections = max(1, connections)
+        self.chunk_size = chunk_size
+        self.sessions = SessionPool(factory=segmented_youtube_dl)
+        self.cache = None
+        if use_cache:
+            self.cache = MetadataCache(cache_path or self.output_dir / ".media-cache.sqlite3")
+        self.archive = None
+        if use_archive:
+            self.archive = DownloadArchive(archive_path or self.output_dir / ".media-archive.sqlite3")
+        self.store = ContentStore(store_path) if store_path else None
+        self.journal = DownloadJournal(self.output_dir / ".journal") if use_journal else None
+        self.metrics = Metrics(listener=events, path=metrics_path)
+        self.priority = parse_priority(priority)
+        self.bandwidth = None
+        if rate_limit or share_bandwidth:
+            self.bandwidth = BandwidthScheduler(
+                rate_limit, self.output_dir / ".bandwidth" if share_bandwidth else None)
+        self.retry = Retrier(retries, on_retry=self._on_retry)
+        self.transcode_workers = transcode_workers
+        self._transcoder = None
+        self._transcoder_lock = threading.Lock()
+        self._sync_state = None
+        self._sync_lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def close(self):
+        """Release pooled yt-dlp sessions, their connections and the on-disk indexes"""
+        if self._transcoder is not None:
+            self._transcoder.close()
+        self.sessions.close()
+        if self.cache:
+            self.cache.close()
+        if self.archive is not None:
+            self.archive.close()
+        if self.store is not None:
+            self.store.close()
+        if self._sync_state is not None:
+            self._sync_state.close()
+        if self.bandwidth is not None:
+            self.bandwidth.close()
+        self.metrics.close()
+    
+    @property
+    def transcoder(self) -> Transcoder:
+        """FFmpeg stage used by bulk audio downloads, created on first use"""
+        with self._transcoder_lock:
+            if self._transcoder is None:
+                self._transcoder = Transcoder(workers=self.transcode_workers)
+            return self._transcoder
+    
+    @property
+    def sync_state(self) -> SyncState:
+        """Cursors of synced sources (output_dir/.sync.sqlite3), opened on first use"""
+        with self._sync_lock:
+            if self._sync_state is None:
+                self._sync_state = SyncState(self.output_dir / ".sync.sqlite3")
+            return self._sync_state
+    
+    def _resolve_key(self, url: str):
+        """Return the extractor:id key for a URL from the cache or the URL itself"""
+        return (self.cache and self.cache.lookup_url(url)) or canonical_key(url)
+    
+    def _in_archive(self, url: str, formats, info: dict = None) -> bool:
+        """Check the download archive for a single URL before any network access"""
+        if self.archive is None:
+            return False
+        extractor = info and (info.get('extractor_key') or info.get('ie_key'))
+        if extractor and info.get('id') and all(
+                self.archive.contains(extractor, info['id'], format) for format in formats):
+            return True
+        known = self.archive.lookup_url(url)
+        if not known:
+            key = self._resolve_key(url)
+            if not key:
+                return False
+            known = key.split(':', 1)
+        return all(self.archive.contains(*known, format) for format in formats)
+    
+    def _link_from_store(self, url: str, formats, info: dict = None) -> bool:
+        """Link a single URL's outputs from the content store, before any network access"""
+        if self.store is None:
+            return False
+        extractor = info and (info.get('extractor_key') or info.get('ie_key'))
+        if extractor and info.get('id'):
+            known = (extractor, info['id'])
+        else:
+            known = self.store.lookup_url(url) or (self.archive and self.archive.lookup_url(url))
+            if not known:
+                key = self._resolve_key(url)
+                known = key.split(':', 1) if key else None
+        return bool(known) and self._link_stored(*known, formats, urls=(url,))
+    
+    def _link_stored(self, extractor: str, id: str, formats, urls=()) -> bool:
+        """
+        Link an item into the output directory if the content store has it in every format
         
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if it was linked (and recorded in the download archive)
         """
-        output_template = str(self.output_dir / "%(title)s.%(ext)s")
+        records = [self.store.get(extractor, id, format) for format in formats]
+        if not all(records):
+            return False
+        for record in records:
+            path, how = self.store.link(record, self.output_dir)
+            print(f"🔗 From the content store ({how}): {path.name}")
+            if self.archive is not None:
+                self.archive.record(extractor, id, record['format'], path, urls=urls)
+        return True
+    
+    def _archive_filter(self, formats):
+        """
+        Build a yt-dlp match_filter that skips entries archived in every requested format
         
+        Entries the content store has are linked into the output directory
+        and skipped as well.
+        """
+        def match_filter(info, incomplete=False):
+            extractor = info.get('extractor_key') or info.get('ie_key')
+            if not extractor or not info.get('id'):
+                return None
+            if self.archive is not None and all(
+                    self.archive.contains(extractor, info['id'], format) for format in formats):
+                return f"{info.get('title') or info['id']} is already in the download archive"
+            if self.store is not None and self._link_stored(
+                    extractor, info['id'], formats, urls=(info.get('url'), info.get('webpage_url'))):
+                return f"{info.get('title') or info['id']} was linked from the content store"
+            return None
+        return match_filter
+    
+    def _archive_setup(self, format: str):
+        """Return a session setup callable that records finished files"""
+        if self.archive is None and self.store is None:
+            return None
+        return lambda ydl: ydl.add_post_processor(archive_recorder()(self.archive, format, self.store),
+                                                  when='after_move')
+    
+    def _base_opts(self, archive_formats=None) -> dict:
+        """Options shared by every download profile"""
         ydl_opts = {
-            'format': 'bestaudio/best',
-            'noplaylist': not allow_playlist,
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': format,
-                'preferredquality': '192',
-            }],
-            'outtmpl': output_template,
+            # The id keeps items with equal titles (e.g. "Intro") in separate files
+            'outtmpl': str(self.output_dir / "%(title)s [%(id)s].%(ext)s"),
             'quiet': False,
             'no_warnings': False,
             'extractor_args': {
@@ -49,21 +431,412 @@ class MediaDownloader:
                 }
             },
             'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            }
+                'User-Agent': self.USER_AGENT
+            },
+            'progress_hooks': [self.metrics.progress_hook],
+            'postprocessor_hooks': [self.metrics.postprocessor_hook],
         }
+        if self.connections > 1:
+            # Fragmented formats only pay off once fragments are fetched in parallel
+            del ydl_opts['extractor_args']['youtube']['skip']
+            ydl_opts['concurrent_fragment_downloads'] = self.connections
+        if self.chunk_size:
+            ydl_opts['http_chunk_size'] = self.chunk_size
+        if self.bandwidth is not None:
+            # Fixed, small reads let the scheduler pace downloads smoothly
+            ydl_opts['buffersize'] = BandwidthScheduler.BLOCK_SIZE
+            ydl_opts['noresizebuffer'] = True
+        if (self.archive is not None or self.store is not None) and archive_formats:
+            ydl_opts['match_filter'] = self._archive_filter(archive_formats)
+        return ydl_opts
+    
+    def _audio_opts(self, formats: list, allow_playlist: bool) -> dict:
+        """
+        yt-dlp options for the audio profile
         
+        Conversion is done afterwards by the transcode module, so the source
+        is selected to already match the target codec where possible.
+        """
+        ydl_opts = self._base_opts(archive_formats=formats)
+        ydl_opts.update({
+            'format': SOURCE_PREFERENCE.get(formats[0], 'bestaudio/best'),
+            'noplaylist': not allow_playlist,
+        })
+        return ydl_opts
+    
+    def _video_opts(self, quality: str, allow_playlist: bool) -> dict:
+        """yt-dlp options for the video profile"""
+        ydl_opts = self._base_opts(archive_formats=(f"video:{quality}",))
+        ydl_opts.update({
+            'format': f'{quality}video+bestaudio/best' if quality == 'best' else quality,
+            'noplaylist': not allow_playlist,
+            'merge_output_format': 'mp4',
+        })
+        return ydl_opts
+    
+    def download_audio(self, url: str, format: str = "mp3", allow_playlist: bool = False,
+                       priority=None) -> bool:
+        """
+        Download audio from URL and convert to specified format
+        
+        Args:
+            url: The URL to download from
+            format: Audio format (mp3, m4a, wav, etc.); several formats, given as a
+                    list or comma separated ("mp3,flac"), are made from one download
+            allow_playlist: If True, download entire playlist; if False, only single video
+            priority: Bandwidth priority of this job (default: the downloader's)
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                print(f"\n🎵 Downloading audio from: {url}")
-                ydl.download([url])
-                print(f"✅ Successfully downloaded audio to: {self.output_dir}")
-                return True
+            self._download_audio(url, format, allow_playlist, share=self._share(priority))
+            return True
         except Exception as e:
             print(f"❌ Error downloading audio: {e}", file=sys.stderr)
             return False
     
-    def download_video(self, url: str, quality: str = "best", allow_playlist: bool = False) -> bool:
+    def _download_audio(self, url: str, format, allow_playlist: bool, info: dict = None,
+                        pending: list = None, progress=None, share=None):
+        """
+        Download audio from URL, raising on failure; returns False if it was skipped
+        
+        When a `pending` list is given, the conversion is not done inline:
+        downloaded files are queued on the Transcoder and their futures are
+        appended to the list, so the caller can start the next download.
+        `progress` is an optional per-job progress hook (see _progress_scope)
+        and `share` the bandwidth group the download counts against.
+        """
+        with self.metrics.job(url, 'audio') as tracked:
+            formats = parse_formats(format)
+            job = self._job_id('audio', ','.join(formats), url, allow_playlist)
+            if not allow_playlist and self._in_archive(url, formats, info):
+                if job:
+                    self.journal.finish(job)
+                print(f"⏭️  Already downloaded, skipping: {url}")
+                tracked['skipped'] = True
+                return False
+            if not allow_playlist and self._link_from_store(url, formats, info):
+                if job:
+                    self.journal.finish(job)
+                tracked['skipped'] = True
+                return False
+            
+            claimed = []  # output paths held until this job's files are converted
+            try:
+                files = self._resumable_files(job)
+                if files:
+                    print(f"\n⏯️  Resuming conversion of: {url}")
+                else:
+                    profile = ('audio', tuple(formats), allow_playlist)
+                    
+                    def fetch():
+                        with self.sessions.session(profile, self._audio_opts(formats, allow_playlist)) as ydl, \
+                                self._progress_scope(ydl, progress, job), self._throttle(ydl, share):
+                            print(f"\n🎵 Downloading audio from: {url}")
+                            return self._process_job(ydl, url, info, job, {'mode': 'audio', 'format': formats},
+                                                     allow_playlist, claimed)
+                    
+                    # A retry resumes from the journal and continues the partial file
+                    result = self._retrying(url, fetch)
+                    files = list(self._downloaded_files(result))
+                    if not files and not allow_playlist:
+                        # Another job finished the item first, so the archive filter passed on it
+                        OUTPUT_CLAIMS.release(claimed)
+                        if job:
+                            self.journal.finish(job)
+                        tracked['skipped'] = True
+                        return False
+                    if job:
+                        self.journal.update(job, stage=TRANSCODE,
+                                            files=[{'path': path, 'acodec': acodec} for _, path, acodec in files])
+                
+                futures = []
+                for entry, path, acodec in files:
+                    if pending is None:
+                        with self.metrics.stage('transcode', timed=False, url=url):
+                            outputs = transcode_audio(path, formats, source_codec=acodec)
+                        self._record_outputs(entry, outputs)
+                    else:
+                        future = self.transcoder.submit(path, formats, source_codec=acodec)
+                        future.add_done_callback(lambda f, entry=entry: self._record_transcoded(entry, f))
+                        futures.append(future)
+            except BaseException:
+                OUTPUT_CLAIMS.release(claimed)
+                raise
+            
+            if pending is None:
+                OUTPUT_CLAIMS.release(claimed)
+                if job:
+                    self.journal.finish(job)
+                print(f"✅ Successfully downloaded audio to: {self.output_dir}")
+            else:
+                converted = gather(futures)
+                converted.add_done_callback(lambda f: OUTPUT_CLAIMS.release(claimed))
+                if job:
+                    converted.add_done_callback(lambda f: self._finish_job(job, f))
+                pending.extend(futures)
+            return True
+    
+    def _job_id(self, mode: str, profile: str, url: str, allow_playlist: bool):
+        """Return the journal id of a single-item job, or None if it is not journaled"""
+        if self.journal is None or allow_playlist:
+            return None
+        return DownloadJournal.job_id(mode, profile, url)
+    
+    @contextmanager
+    def _progress_scope(self, ydl, progress, job=None):
+        """
+        Attach a per-job progress hook to a checked-out session
+        
+        The hook gets yt-dlp's progress dicts and may raise DownloadCancelled
+        to stop the download; the partial files and the journal entry of a
+        cancelled job are removed, so it is not resumed later. Any other
+        exception from the hook stops the download but keeps them (e.g. a
+        queue worker's LeaseLost, whose job another worker continues).
+        """
+        if progress is None:
+            yield
+            return
+        from yt_dlp.utils import DownloadCancelled
+        
+        partial = set()
+        
+        def hook(d):
+            if d.get('tmpfilename'):
+                partial.add(d['tmpfilename'])
+            progress(d)
+        
+        ydl.add_progress_hook(hook)
+        try:
+            yield
+        except DownloadCancelled:
+            for path in partial:
+                for leftover in (path, path + '.segments'):
+                    try:
+                        os.remove(leftover)
+                    except OSError:
+                        pass
+            if job:
+                self.journal.finish(job)
+            raise
+        finally:
+            ydl._progress_hooks.remove(hook)
+    
+    def _retrying(self, url: str, func, *args, **kwargs):
+        """Call func with the retries and circuit breaker of the URL's host"""
+        return self.retry.call(host_of(url), func, *args, **kwargs)
+    
+    def _on_retry(self, host: str, attempt: int, delay: float, error, kind: str):
+        print(f"🔁 {kind.capitalize()} failure on {host}, retry {attempt}/{self.retry.retries} "
+              f"in {delay:.1f}s: {error}", file=sys.stderr)
+        self.metrics.emit('retry', host=host, attempt=attempt, delay=round(delay, 3), kind=kind,
+                          error=str(error))
+    
+    def _share(self, priority=None, limit: int = None):
+        """
+        Return a new bandwidth group for a job or batch, or None without a bandwidth scheduler
+        
+        `limit` caps the group's downloads in bytes per second; with no
+        rate_limit for the whole downloader, the largest limit of the running
+        groups is what they share.
+        """
+        if self.bandwidth is None:
+            return None
+        return self.bandwidth.group(self.priority if priority is None else priority, limit)
+    
+    @contextmanager
+    def _throttle(self, ydl, share=None):
+        """Put a checked-out session's downloads under the bandwidth scheduler"""
+        if self.bandwidth is None:
+            yield
+            return
+        with self.bandwidth.stream(ydl, share or self._share()):
+            yield
+    
+    def _finish_job(self, job: str, future):
+        """Drop a job's checkpoint once its queued conversions all succeeded"""
+        if not future.cancelled() and future.exception() is None:
+            self.journal.finish(job)
+    
+    def _resumable_files(self, job):
+        """
+        Return the (entry, path, acodec) files of a job that crashed after downloading
+        
+        Such a job only needs its conversion redone. Returns None if the job
+        has no checkpoint in the conversion stage or its files are gone.
+        """
+        record = self.journal.get(job) if job else None
+        if not record or record.get('stage') != TRANSCODE:
+            return None
+        files = record.get('files') or []
+        if not files or not all(os.path.exists(file['path']) for file in files):
+            return None
+        return [(record['info'], file['path'], file.get('acodec')) for file in files]
+    
+    def _process_job(self, ydl, url: str, info: dict, job, record: dict, allow_playlist: bool = False,
+                     claimed: list = None):
+        """
+        Resolve and download a URL, checkpointing the resolved info in the journal
+        
+        A job interrupted in the download stage is resumed from the stored
+        info, so yt-dlp continues its partial file without extracting again.
+        The URL is only resolved again if the stored stream URLs have expired
+        or no longer work. Playlists are extracted and downloaded in one pass,
+        so their downloads start before the whole listing is resolved.
+        
+        The output path of a single item is claimed in OUTPUT_CLAIMS before
+        it is downloaded and appended to `claimed`; the caller releases it
+        once the file is converted.
+        """
+        from yt_dlp.utils import DownloadError
+        
+        if allow_playlist:
+            with self.metrics.stage('download', timed=False, url=url):
+                return self._process(ydl, url, info)
+        
+        saved = self.journal.get(job) if job else None
+        if saved and saved.get('stage') == DOWNLOAD and saved.get('info'):
+            if not stream_expired(saved['info']):
+                print("⏯️  Resuming interrupted download")
+                self._claim_output(ydl, saved['info'], claimed)
+                try:
+                    with self.metrics.stage('download', timed=False, url=url):
+                        return ydl.process_ie_result(saved['info'], download=True)
+                except DownloadError as e:
+                    print(f"⚠️  Stored stream failed, resolving again: {e}", file=sys.stderr)
+            else:
+                print("⏯️  Resuming interrupted download (stream URL expired, resolving again)")
+        
+        with self.metrics.stage('extract', url=url):
+            resolved = ydl.sanitize_info(self._process(ydl, url, info, download=False))
+        if job:
+            self.journal.save(job, dict(record, url=url, stage=DOWNLOAD, info=resolved,
+                                        started=(saved or {}).get('started', time.time())))
+        self._claim_output(ydl, resolved, claimed)
+        with self.metrics.stage('download', timed=False, url=url):
+            return ydl.process_ie_result(resolved, download=True)
+    
+    @staticmethod
+    def _claim_output(ydl, info: dict, claimed: list = None):
+        """Claim the file a resolved item is written to, unless this job already holds it"""
+        if claimed is None or info.get('_type', 'video') != 'video' or not info.get('ext'):
+            # Nothing to write: a playlist, or an item the archive filter passed on
+            return
+        path = ydl.prepare_filename(info)
+        if path in claimed:
+            return
+        OUTPUT_CLAIMS.claim(path, on_wait=lambda: print(
+            f"⏳ Waiting for another job writing {os.path.basename(path)}"))
+        claimed.append(path)
+    
+    def _record_transcoded(self, info: dict, future):
+        """Report and archive a conversion finished on the Transcoder"""
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.metrics.record_failure('transcode', future.exception(), url=info.get('original_url'))
+        else:
+            self._record_outputs(info, future.result())
+    
+    def _record_outputs(self, info: dict, outputs: list):
+        """Report which path each conversion took and record the files in the content store and archive"""
+        if any(output['action'] != 'keep' for output in outputs):
+            self.metrics.record_stage('transcode', max(output['elapsed'] for output in outputs),
+                                      url=info.get('original_url'),
+                                      formats=[output['format'] for output in outputs])
+        for output in outputs:
+            print(f"{self.TRANSCODE_LABELS[output['action']]}: {Path(output['path']).name}")
+            if not info.get('extractor_key') or not info.get('id'):
+                continue
+            urls = (info.get('original_url'), info.get('webpage_url'))
+            if self.store is not None:
+                self.store.add(output['path'], info['extractor_key'], info['id'], output['format'], urls=urls)
+            if self.archive is not None:
+                self.archive.record(info['extractor_key'], info['id'], output['format'], output['path'],
+                                    urls=urls)
+    
+    @staticmethod
+    def _downloaded_files(info: dict):
+        """Yield (entry info, file path, audio codec) for every file a download produced"""
+        if not info:
+            return
+        for entry in info.get('entries') or ():
+            yield from MediaDownloader._downloaded_files(entry)
+        for download in info.get('requested_downloads') or ():
+            if download.get('filepath') and os.path.exists(download['filepath']):
+                yield info, download['filepath'], download.get('acodec')
+    
+    def stream_audio(self, url: str, format: str = "mp3", chunk_size: int = 64 * 1024):
+        """
+        Download audio and yield it converted to one format, without saving it
+        
+        Direct HTTP(S) sources are read through yt-dlp's networking and piped
+        through FFmpeg, and HLS is read by FFmpeg itself, so nothing touches
+        the disk; a source already in the target format is passed through
+        unchanged. Other protocols (e.g. DASH fragments) are downloaded to a
+        temporary directory first, removed when the stream ends.
+        
+        Args:
+            url: The URL to stream (a single item, not a playlist)
+            format: One audio format (mp3, m4a, wav, etc.)
+            chunk_size: Largest chunk yielded
+        
+        Yields:
+            bytes: The converted audio; closing the generator stops the download
+        
+        Raises:
+            TranscodeError: If the format is not supported or FFmpeg fails
+            ValueError: If the URL is a playlist
+        """
+        formats = parse_formats(format)
+        if len(formats) > 1:
+            raise TranscodeError("Streaming produces a single audio format")
+        format = formats[0]
+        ydl_opts = self._base_opts()
+        ydl_opts.update({
+            'format': SOURCE_PREFERENCE.get(format, 'bestaudio/best'),
+            'noplaylist': True,
+            'quiet': True,
+            'logtostderr': True,
+        })
+        
+        with self.metrics.job(url, 'stream'), ExitStack() as cleanup:
+            chunks = None
+            with self.sessions.session(('stream', format), ydl_opts) as ydl:
+                with self.metrics.stage('extract', url=url):
+                    info = self._retrying(url, ydl.extract_info, url, download=False)
+                if info.get('_type', 'video') != 'video':
+                    raise ValueError("Cannot stream a playlist, stream its items one by one")
+                action = plan_audio(f"source.{info.get('ext')}", format, info.get('acodec'))
+                protocol = info.get('protocol') or ''
+                
+                if protocol in ('http', 'https'):
+                    from yt_dlp.networking import Request
+                    
+                    response = ydl.urlopen(Request(info['url'], headers=info.get('http_headers')))
+                    chunks = read_chunks(response, chunk_size, self.metrics.progress_hook, info)
+                    command = stream_command('pipe:0', format, action)
+                elif protocol.startswith('m3u8'):
+                    command = stream_command(info['url'], format, action, headers=info.get('http_headers'))
+                else:
+                    print(f"⚠️  {protocol} cannot be piped, buffering to a temporary file", file=sys.stderr)
+                    temp = cleanup.enter_context(tempfile.TemporaryDirectory(prefix="stream-"))
+                    with youtube_dl(dict(ydl_opts, outtmpl=os.path.join(temp, "source.%(ext)s"))) as fetch, \
+                            self.metrics.stage('download', timed=False, url=url):
+                        result = fetch.process_ie_result(info, download=True)
+                    path = next((path for _, path, _ in self._downloaded_files(result)), None)
+                    if path is None:
+                        raise TranscodeError(f"Nothing was downloaded from {url}")
+                    command = stream_command(path, format, action)
+            
+            if action == KEEP and chunks is not None:
+                yield from chunks
+            else:
+                yield from pipe_through(command, chunks, chunk_size)
+    
+    def download_video(self, url: str, quality: str = "best", allow_playlist: bool = False,
+                       priority=None) -> bool:
         """
         Download video from URL
         
@@ -71,58 +844,601 @@ class MediaDownloader:
             url: The URL to download from
             quality: Video quality (best, worst, or specific format)
             allow_playlist: If True, download entire playlist; if False, only single video
+            priority: Bandwidth priority of this job (default: the downloader's)
         
         Returns:
             bool: True if successful, False otherwise
         """
-        output_template = str(self.output_dir / "%(title)s.%(ext)s")
-        
-        ydl_opts = {
-            'format': f'{quality}video+bestaudio/best' if quality == 'best' else quality,
-            'noplaylist': not allow_playlist,
-            'outtmpl': output_template,
-            'quiet': False,
-            'no_warnings': False,
-            'merge_output_format': 'mp4',
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android', 'web'],
-                    'skip': ['dash', 'hls']
-                }
-            },
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            }
-        }
-        
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                print(f"\n🎬 Downloading video from: {url}")
-                ydl.download([url])
-                print(f"✅ Successfully downloaded video to: {self.output_dir}")
-                return True
+            self._download_video(url, quality, allow_playlist, share=self._share(priority))
+            return True
         except Exception as e:
             print(f"❌ Error downloading video: {e}", file=sys.stderr)
             return False
     
-    def get_info(self, url: str) -> dict:
+    def _download_video(self, url: str, quality: str, allow_playlist: bool, info: dict = None,
+                        progress=None, share=None):
+        """Download video from URL, raising on failure; returns False if it was skipped"""
+        with self.metrics.job(url, 'video') as tracked:
+            job = self._job_id('video', quality, url, allow_playlist)
+            if not allow_playlist and self._in_archive(url, (f"video:{quality}",), info):
+                if job:
+                    self.journal.finish(job)
+                print(f"⏭️  Already downloaded, skipping: {url}")
+                tracked['skipped'] = True
+                return False
+            if not allow_playlist and self._link_from_store(url, (f"video:{quality}",), info):
+                if job:
+                    self.journal.finish(job)
+                tracked['skipped'] = True
+                return False
+            
+            profile = ('video', quality, allow_playlist)
+            claimed = []
+            
+            def fetch():
+                with self.sessions.session(profile, self._video_opts(quality, allow_playlist),
+                                           setup=self._archive_setup(f"video:{quality}")) as ydl, \
+                        self._progress_scope(ydl, progress, job), self._throttle(ydl, share):
+                    print(f"\n🎬 Downloading video from: {url}")
+                    return self._process_job(ydl, url, info, job, {'mode': 'video', 'quality': quality},
+                                             allow_playlist, claimed)
+            
+            try:
+                result = self._retrying(url, fetch)
+            finally:
+                OUTPUT_CLAIMS.release(claimed)
+            if job:
+                self.journal.finish(job)
+            if not allow_playlist and not any(self._downloaded_files(result)):
+                # Another job finished the item first, so the archive filter passed on it
+                tracked['skipped'] = True
+                return False
+            print(f"✅ Successfully downloaded video to: {self.output_dir}")
+            return True
+    
+    @staticmethod
+    def _process(ydl, url: str, info: dict = None, download: bool = True):
+        """Download a URL, reusing already extracted (possibly flat) info when given"""
+        if info is None:
+            return ydl.extract_info(url, download=download)
+        return ydl.process_ie_result(dict(info), download=download)
+    
+    def _run_job(self, result: dict, mode: str, format: str, quality: str, allow_playlist: bool = False,
+                 info: dict = None, pipelined: bool = False, progress=None, share=None):
+        """
+        Run one download and fill in its result dict instead of raising
+        
+        With pipelined=True, audio conversions are left running on the
+        Transcoder and a combined future is stored under result['transcoding'];
+        the caller finishes the result with _finish_transcode().
+        """
+        started = time.monotonic()
+        try:
+            if mode == "audio":
+                pending = [] if pipelined else None
+                downloaded = self._download_audio(result['url'], format, allow_playlist, info, pending,
+                                                  progress, share)
+                if pending:
+                    result['transcoding'] = gather(pending)
+            else:
+                downloaded = self._download_video(result['url'], quality, allow_playlist, info, progress, share)
+            result['success'] = True
+            result['skipped'] = not downloaded
+        except Exception as e:
+            result['error'] = str(e)
+            print(f"❌ Error downloading {result['url']}: {e}", file=sys.stderr)
+        result['elapsed'] = time.monotonic() - started
+        return result
+    
+    @staticmethod
+    def _finish_transcode(result: dict, started: float, future):
+        """Complete a pipelined result once its conversions are done"""
+        try:
+            result['outputs'] = [output for outputs in future.result() for output in outputs]
+        except Exception as e:
+            result['success'] = False
+            result['error'] = str(e)
+            print(f"❌ Error converting {result['url']}: {e}", file=sys.stderr)
+        result['elapsed'] = time.monotonic() - started
+    
+    def download_many(self, urls, mode: str = "audio", format="mp3", quality: str = "best",
+                      allow_playlist: bool = False, max_workers: int = 4, per_host: int = 2,
+                      priority=None) -> list:
+        """
+        Download several URLs concurrently on a bounded worker pool
+        
+        Jobs are dispatched round-robin across hosts so that a long run of
+        URLs from one site never starves the others. Audio is converted on
+        the Transcoder stage, so a download slot is freed as soon as the
+        source file is on disk.
+        
+        Args:
+            urls: Iterable of URLs to download
+            mode: "audio" or "video"
+            format: Audio format(s) used when mode is "audio"
+            quality: Video quality used when mode is "video"
+            allow_playlist: If True, download entire playlists
+            max_workers: Maximum number of downloads running at once
+            per_host: Maximum number of downloads running at once against one host
+            priority: Bandwidth priority of the whole batch (default: the downloader's)
+        
+        Returns:
+            list: One result dict per URL (url, success, skipped, error, elapsed and,
+                  for converted audio, outputs), in input order
+        """
+        if mode not in ("audio", "video"):
+            raise ValueError(f"Unknown download mode: {mode}")
+        if mode == "audio":
+            parse_formats(format)
+        
+        max_workers = max(1, max_workers)
+        per_host = max(1, min(per_host, max_workers))
+        self.sessions.max_idle = max(self.sessions.max_idle, max_workers)
+        
+        results = []
+        pending = OrderedDict()  # host -> deque of result indexes
+        for url in urls:
+            results.append({'url': url, 'success': False, 'skipped': False, 'error': None, 'elapsed': 0.0})
+            pending.setdefault(host_of(url), deque()).append(len(results) - 1)
+        
+        # The batch is one bandwidth group, however many of its downloads run
+        share = self._share(priority)
+        
+        def run(index):
+            self._run_job(results[index], mode, format, quality, allow_playlist, pipelined=mode == "audio",
+                          share=share)
+        
+        active = {}  # future -> (host, index)
+        transcoding = {}  # future -> (result, started)
+        per_host_active = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while pending or active or transcoding:
+                # Fill free worker slots, taking one job per host in turn
+                dispatched = True
+                while dispatched and len(active) < max_workers:
+                    dispatched = False
+                    for host in list(pending):
+                        if len(active) >= max_workers:
+                            break
+                        if per_host_active.get(host, 0) >= per_host:
+                            continue
+                        index = pending[host].popleft()
+                        if not pending[host]:
+                            del pending[host]
+                        else:
+                            pending.move_to_end(host)
+                        active[pool.submit(run, index)] = (host, index)
+                        per_host_active[host] = per_host_active.get(host, 0) + 1
+                        dispatched = True
+                
+                # A finished download frees its slot even while its conversion runs
+                done, _ = wait(list(active) + list(transcoding), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in transcoding:
+                        self._finish_transcode(*transcoding.pop(future), future=future)
+                        continue
+                    host, index = active.pop(future)
+                    per_host_active[host] -= 1
+                    follow_up = results[index].pop('transcoding', None)
+                    if follow_up is not None:
+                        started = time.monotonic() - results[index]['elapsed']
+                        transcoding[follow_up] = (results[index], started)
+        
+        return results
+    
+    def iter_playlist(self, url: str, max_depth: int = 3):
+        """
+        Lazily enumerate the entries of a playlist without resolving them
+        
+        Entries are extracted flat and page by page, so the first ones are
+        available long before a large playlist has been fully listed. Nested
+        playlists (e.g. channel tabs) are expanded in place.
+        
+        Args:
+            url: Playlist (or single item) URL
+            max_depth: How many levels of nested playlists to expand
+        
+        Yields:
+            dict: Flat entry info with at least a 'url' key, in playlist order
+        """
+        with closing(self._iter_listing(url, max_depth)) as listing:
+            for _, entry in listing:
+                yield entry
+    
+    def _iter_listing(self, url: str, max_depth: int = 3, skip: set = None):
+        """
+        iter_playlist() that also tells which (nested) playlist lists each entry
+        
+        Args:
+            skip: Optional set of playlist URLs; a playlist whose URL is added
+                  while it is being read stops there, and the listing goes on
+                  with the next nested playlist (e.g. the next channel tab)
+        
+        Yields:
+            tuple: (URL of the innermost playlist listing the entry, flat entry info)
+        """
+        ydl_opts = {'quiet': True, 'extract_flat': 'in_playlist', 'lazy_playlist': True}
+        with self.sessions.session(('flat',), ydl_opts) as ydl:
+            info = self._retrying(url, ydl.extract_info, url, download=False, process=False)
+            yield from self._iter_entries(ydl, info, url, max_depth, skip)
+    
+    def _iter_entries(self, ydl, info: dict, url: str, depth: int, skip: set = None):
+        """
+        Walk a raw extractor result, yielding (playlist URL, leaf entry) pairs
+        
+        Entries are not kept once yielded: a plain generator is consumed
+        directly (PlaylistEntries would cache it in a LazyList) and paged
+        listings drop each page after it is read.
+        """
+        from yt_dlp.utils import LazyList, PagedList, PlaylistEntries
+        
+        if info.get('_type') in ('url', 'url_transparent'):
+            ie_key = info.get('ie_key')
+            single = ie_key and ydl.get_info_extractor(ie_key).is_single_video(info['url'])
+            if single is False and depth > 0:
+                nested = ydl.extract_info(info['url'], download=False, process=False, ie_key=ie_key)
+                yield from self._iter_entries(ydl, nested, info['url'], depth - 1, skip)
+            else:
+                yield url, info
+        elif info.get('_type') in ('playlist', 'multi_video') and depth > 0:
+            entries = info.get('entries')
+            if isinstance(entries, PagedList):
+                # Walk the pages directly: indexing needs the page cache and fetches a page per entry
+                entries._use_cache = False
+                entries = ((None, entry) for entry in entries._getslice(0, None))
+            elif entries is not None and not isinstance(entries, (list, LazyList)):
+                entries = ((None, entry) for entry in entries)
+            else:
+                entries = PlaylistEntries(ydl, info)[:]
+            for _, entry in entries:
+                if entry:
+                    nested = entry.get('webpage_url') if entry.get('_type') in ('playlist', 'multi_video') else None
+                    yield from self._iter_entries(ydl, entry, nested or url, depth - 1, skip)
+                # Checked before the next entry is pulled, so a skipped listing fetches no further page
+                if skip and url in skip:
+                    return
+        else:
+            info.setdefault('url', info.get('webpage_url') or url)
+            yield url, info
+    
+    def download_playlist(self, url: str, mode: str = "audio", format="mp3", quality: str = "best",
+                          max_workers: int = 4, lookahead: int = 16, ordered: bool = False, priority=None):
+        """
+        Download a playlist while it is still being listed
+        
+        Entries from iter_playlist() are handed to a pool of download workers
+        as soon as they are discovered. At most `lookahead` entries are held
+        between discovery and being reported, which bounds both memory and how
+        far the listing runs ahead of the downloads.
+        
+        Args:
+            url: Playlist URL
+            mode: "audio" or "video"
+            format: Audio format(s) used when mode is "audio"
+            quality: Video quality used when mode is "video"
+            max_workers: Maximum number of downloads running at once
+            lookahead: Maximum number of entries discovered but not yet reported
+            ordered: If True, report results in playlist order instead of completion order
+            priority: Bandwidth priority of the whole playlist (default: the downloader's)
+        
+        Yields:
+            dict: Result per entry (index, url, id, title, success, skipped, error, elapsed, outputs)
+        
+        Raises:
+            yt_dlp.utils.DownloadError: If listing fails; the entries listed before it
+                                        are downloaded and yielded first
+        """
+        yield from self._download_listing(self.iter_playlist(url), mode, format, quality, max_workers,
+                                          lookahead, ordered, priority)
+    
+    def _download_listing(self, listing, mode: str, format, quality: str, max_workers: int, lookahead: int,
+                          ordered: bool, priority):
+        """Download the entries of a (lazy) listing as they are discovered; see download_playlist()"""
+        if mode not in ("audio", "video"):
+            raise ValueError(f"Unknown download mode: {mode}")
+        if mode == "audio":
+            parse_formats(format)
+        
+        max_workers = max(1, max_workers)
+        lookahead = max(lookahead, max_workers)
+        self.sessions.max_idle = max(self.sessions.max_idle, max_workers)
+        archive_formats = parse_formats(format) if mode == "audio" else (f"video:{quality}",)
+        
+        skip_known = self._archive_filter(archive_formats) if self.archive is not None else None
+        share = self._share(priority)
+        
+        entries = enumerate(listing, 1)
+        exhausted = False
+        listing_error = None
+        active = {}  # future -> result
+        transcoding = {}  # future -> (result, started)
+        done_results = {}  # index -> result not yet reported
+        next_index = 1
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            try:
+                while not exhausted or active or transcoding or done_results:
+                    # Keep discovering entries until the lookahead window is full
+                    while not exhausted and len(active) + len(transcoding) + len(done_results) < lookahead:
+                        try:
+                            index, entry = next(entries)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        except Exception as e:
+                            # Finish and report what was already listed, then raise
+                            listing_error = e
+                            exhausted = True
+                            break
+                        result = {'index': index, 'url': entry['url'], 'id': entry.get('id'),
+                                  'title': entry.get('title'), 'success': False, 'skipped': False,
+                                  'error': None, 'elapsed': 0.0}
+                        if skip_known and skip_known(entry, incomplete=True):
+                            result.update(success=True, skipped=True)
+                            done_results[index] = result
+                        else:
+                            future = pool.submit(self._run_job, result, mode, format, quality,
+                                                 info=entry, pipelined=mode == "audio", share=share)
+                            active[future] = result
+                    
+                    ready = next_index in done_results if ordered else bool(done_results)
+                    if (active or transcoding) and not ready:
+                        finished, _ = wait(list(active) + list(transcoding), return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            if future in transcoding:
+                                result, started = transcoding.pop(future)
+                                self._finish_transcode(result, started, future)
+                                done_results[result['index']] = result
+                                continue
+                            result = active.pop(future)
+                            follow_up = result.pop('transcoding', None)
+                            if follow_up is not None:
+                                transcoding[follow_up] = (result, time.monotonic() - result['elapsed'])
+                            else:
+                                done_results[result['index']] = result
+                    
+                    if ordered:
+                        while next_index in done_results:
+                            yield done_results.pop(next_index)
+                            next_index += 1
+                    else:
+                        for index in sorted(done_results):
+                            yield done_results.pop(index)
+                if listing_error is not None:
+                    raise listing_error
+            finally:
+                for future in active:
+                    future.cancel()
+                listing.close()
+                wait(list(transcoding))
+    
+    def sync(self, url: str, mode: str = "audio", format="mp3", quality: str = "best", full: bool = False,
+             stop_after: int = 5, max_workers: int = 4, lookahead: int = 16, priority=None):
+        """
+        Download what is new in a channel, artist or playlist since its last sync
+        
+        The listing is read newest first and, once `stop_after` entries in a
+        row are known from the source's cursor (or are older than its newest
+        upload date), reading stops, so only the first page is fetched when
+        few items are new. Nested playlists (the tabs of a channel) are each
+        read until their own run of known entries. Entries in the download archive are skipped. The
+        cursor moves on only when a sync reaches its end or stops, and not
+        past the newest entry that failed, so that one is retried next time.
+        The first sync of a source reads the whole listing.
+        
+        Args:
+            url: Channel, artist or playlist URL whose listing is newest first
+            full: If True, read the whole listing anyway (items are still skipped)
+            stop_after: Known entries in a row that end the listing
+            (others: see download_playlist)
+        
+        Yields:
+            dict: Result per new entry, as download_playlist() yields them
+        """
+        cursor = self.sync_state.get(url)
+        known = set(cursor['ids']) if cursor else set()
+        newest = cursor['upload_date'] if cursor else None
+        listed = []  # (key, date, known) per entry, in listing order
+        outcome = {}  # key -> success of the entries handed out
+        stopped = []
+        
+        def new_entries():
+            streaks = {}  # per nested playlist: a channel's tabs are each newest first
+            skip = set()
+            with closing(self._iter_listing(url, skip=skip)) as listing:
+                for source, entry in listing:
+                    key, date = entry_key(entry), entry_date(entry)
+                    is_known = key in known
+                    listed.append((key, date, is_known))
+                    # The cursor keeps one date for all tabs, so it only applies to a single listing
+                    older = source == url and newest and date and date < newest
+                    if is_known or older:
+                        streaks[source] = streaks.get(source, 0) + 1
+                        if streaks[source] >= stop_after and not full:
+                            # Ends this tab; the listing goes on with the next one, if any
+                            stopped.append(True)
+                            skip.add(source)
+                            continue
+                    else:
+                        streaks[source] = 0
+                    if not is_known:
+                        # An entry only older by date is still downloaded; it just counts toward the stop
+                        yield entry
+        
+        results = self._download_listing(new_entries(), mode, format, quality, max_workers, lookahead,
+                                         False, priority)
+        for result in results:
+            outcome[entry_key(result)] = result['success']
+            yield result
+        
+        failed = [i for i, (key, _, _) in enumerate(listed) if outcome.get(key) is False]
+        # Entries newer than a failure stay out of the cursor, so the next sync reaches the failure again
+        kept = listed[failed[0] + 1:] if failed else listed
+        ids = [key for key, _, is_known in kept if is_known or outcome.get(key)]
+        dates = [date for key, date, is_known in kept if date and (is_known or outcome.get(key))]
+        downloaded = sum(1 for key, _, _ in listed if outcome.get(key))
+        self.sync_state.advance(url, mode, format if isinstance(format, str) else ",".join(format), quality,
+                                ids, max(dates, default=None), items=downloaded)
+        print(f"🔖 Synced {url}: {len(listed)} listed, {len(outcome)} new"
+              + (", stopped at known items" if stopped else ""))
+    
+    def resume(self) -> list:
+        """
+        Finish the jobs a previous (crashed or interrupted) run left in the journal
+        
+        Returns:
+            list: One result dict (url, mode, success) per resumed job
+        """
+        results = []
+        for record in self.journal.pending() if self.journal is not None else ():
+            if record.get('mode') == 'audio':
+                success = self.download_audio(record['url'], format=record['format'])
+            elif record.get('mode') == 'video':
+                success = self.download_video(record['url'], quality=record['quality'])
+            else:
+                continue
+            results.append({'url': record['url'], 'mode': record['mode'], 'success': success})
+        return results
+    
+    def iter_info(self, url: str, max_depth: int = 3):
+        """
+        Stream compact records for every entry of a playlist (or the one item of a URL)
+        
+        Built on iter_playlist(), so records come out as the listing is
+        extracted and memory does not grow with the playlist length.
+        
+        Yields:
+            MediaInfo: One record per entry, with its position as playlist_index
+        """
+        for index, entry in enumerate(self.iter_playlist(url, max_depth), 1):
+            yield MediaInfo.from_info(entry, playlist_index=index)
+    
+    def get_media_info(self, url: str, refresh: bool = False):
+        """
+        Get a compact record of a URL's information (see get_info)
+        
+        Returns:
+            MediaInfo: The record, or None if the information could not be fetched
+        """
+        info = self.get_info(url, refresh=refresh)
+        return MediaInfo.from_info(info) if info else None
+    
+    def get_info(self, url: str, refresh: bool = False, noplaylist: bool = False) -> dict:
         """
         Get information about a URL without downloading
         
         Args:
             url: The URL to get info from
+            refresh: If True, bypass the metadata cache and fetch again
+            noplaylist: If True, a URL of an item in a playlist gives the item
         
         Returns:
             dict: Video/audio information
         """
-        ydl_opts = {'quiet': True}
-        
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                return ydl.extract_info(url, download=False)
+            return self._fetch_info(url, refresh, noplaylist)
         except Exception as e:
             print(f"❌ Error getting info: {e}", file=sys.stderr)
             return {}
+    
+    def _fetch_info(self, url: str, refresh: bool = False, noplaylist: bool = False) -> dict:
+        """get_info() that raises on failure"""
+        if self.cache and not refresh:
+            info = self.cache.get(self._resolve_key(url))
+            if info is not None:
+                return info
+        
+        ydl_opts = {'quiet': True, 'noplaylist': noplaylist}
+        
+        with self.sessions.session(('info', noplaylist), ydl_opts) as ydl:
+            info = ydl.sanitize_info(self._retrying(url, ydl.extract_info, url, download=False))
+        
+        key = MetadataCache.key_for(info) if self.cache else None
+        if key:
+            self.cache.put(key, info, urls=(url, info.get('webpage_url')))
+        return info
+    
+    def get_info_many(self, urls, max_workers: int = 8, refresh: bool = False):
+        """
+        Resolve many URLs concurrently, extracting each item only once
+        
+        URLs are grouped by their extractor:id key before any network access
+        (the cache's URL aliases, or the id the extractor reads from the URL),
+        so differently shaped URLs of one item share a single extraction.
+        Items only recognised after extraction (e.g. behind short links) are
+        reported as duplicates of the first URL that resolved to them. URLs of
+        items inside playlists resolve to the item. Only compact records of
+        finished items are kept, and `urls` is read as workers free up, so a
+        long (or endless) iterable is fine.
+        
+        Args:
+            urls: Iterable of URLs
+            max_workers: Extractions running at once
+            refresh: If True, bypass the metadata cache
+        
+        Yields:
+            dict: Per URL, in completion order: 'url', 'key' (extractor:id),
+                  'info' (MediaInfo or None), 'duplicate_of' (the URL first
+                  resolved to the same item, or None), 'error' and 'elapsed'
+        """
+        max_workers = max(1, max_workers)
+        self.sessions.max_idle = max(self.sessions.max_idle, max_workers)
+        urls = iter(urls)
+        waiting = {}  # pre-extraction key -> URLs waiting for its extraction
+        active = {}  # future -> pre-extraction key
+        finished = {}  # pre-extraction key -> (item key, MediaInfo, error)
+        first_url = {}  # item key -> first URL resolved to it
+        
+        def extract(url):
+            started = time.monotonic()
+            info = self._fetch_info(url, refresh, noplaylist=True)
+            return info, time.monotonic() - started
+        
+        def report(url, found, elapsed):
+            key, record, error = found
+            duplicate_of = first_url.get(key)
+            if key and duplicate_of is None:
+                first_url[key] = url
+            return {'url': url, 'key': key, 'info': record, 'duplicate_of': duplicate_of,
+                    'error': error, 'elapsed': elapsed}
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="info") as pool:
+            exhausted = False
+            while not exhausted or active:
+                # Read URLs until every worker is busy; known items are answered at once
+                while not exhausted and len(active) < max_workers:
+                    url = next(urls, None)
+                    if url is None:
+                        exhausted = True
+                        break
+                    url = url.strip()
+                    if not url:
+                        continue
+                    key = self._resolve_key(url) or url
+                    if key in finished:
+                        yield report(url, finished[key], 0.0)
+                    elif key in waiting:
+                        waiting[key].append(url)
+                    else:
+                        waiting[key] = [url]
+                        active[pool.submit(extract, url)] = key
+                if not active:
+                    continue
+                
+                done, _ = wait(list(active), return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = active.pop(future)
+                    elapsed = 0.0
+                    try:
+                        info, elapsed = future.result()
+                        record = MediaInfo.from_info(info)
+                        found = (MetadataCache.key_for(info) or record.url, record, None)
+                    except Exception as e:
+                        found = (None, None, str(e))
+                    finished[key] = found
+                    for index, url in enumerate(waiting.pop(key)):
+                        yield report(url, found, elapsed if index == 0 else 0.0)
 
 
 def main():
@@ -143,26 +1459,198 @@ Examples:
   
   # Get info without downloading
   python downloader.py -i "https://..."
+  
+  # List a playlist as JSON lines, one per entry, while it is being extracted
+  python downloader.py -i --json "https://..." | jq .title
+  
+  # Download every URL listed in a file (one per line, "-" reads stdin)
+  python downloader.py -a --batch-file urls.txt -j 8
+  
+  # Audit a URL list: resolve 16 at a time, each item once, as JSON lines
+  python downloader.py -i --json --batch-file urls.txt -j 16
+  
+  # Finish downloads a crashed or interrupted run left behind
+  python downloader.py --resume -o ./my_music
+  
+  # Fetch one large video over 8 connections in 16 MiB segments
+  python downloader.py -v "https://..." -c 8 --chunk-size 16M
+  
+  # Stream audio as MP3 to another program without saving it
+  python downloader.py -a "https://..." -o - | ffplay -nodisp -
+  
+  # Cap a large playlist at 2 MB/s, leaving more for other runs in the same folder
+  python downloader.py -a -p "https://..." -r 2M --priority low --share-bandwidth
+  
+  # Keep a warm downloader running and take jobs over a local JSON API
+  python downloader.py serve --port 8765 -j 8
+  curl -d '{"url": "https://...", "format": "mp3"}' http://127.0.0.1:8765/jobs
+  
+  # Queue URLs in a shared file and run them on any number of worker processes
+  python downloader.py enqueue -a "https://..." "https://..." -o /shared/music
+  python downloader.py worker -j 4 -o /shared/music
+  
+  # Mirror channels: the first sync downloads everything, later ones only what is new
+  python downloader.py sync -a "https://soundcloud.com/artist" "https://youtube.com/@channel" -o ./mirror
+  python downloader.py sync -o ./mirror
         """
     )
     
-    parser.add_argument("url", nargs="?", help="URL to download from")
+    parser.add_argument("url", nargs="?",
+                       help="URL to download from, 'serve' to run the job API, 'enqueue URL...' to add "
+                            "jobs to the worker queue, 'worker' to run queued jobs or 'sync [URL...]' to "
+                            "download what is new in channels and playlists")
+    parser.add_argument("urls", nargs="*", help=argparse.SUPPRESS)
     parser.add_argument("-a", "--audio", action="store_true", 
                        help="Download audio only (default: MP3)")
     parser.add_argument("-v", "--video", action="store_true",
                        help="Download video")
     parser.add_argument("-f", "--format", default="mp3",
-                       help="Audio format (mp3, m4a, wav, etc.) - default: mp3")
+                       help="Audio format (mp3, m4a, wav, etc.), or several separated by commas "
+                            "(mp3,flac) made from one download - default: mp3")
     parser.add_argument("-q", "--quality", default="best",
                        help="Video quality (best, worst) - default: best")
     parser.add_argument("-o", "--output", default="downloads",
-                       help="Output directory - default: downloads")
+                       help="Output directory, or '-' to stream the converted audio of one URL "
+                            "to stdout (with -a) - default: downloads")
     parser.add_argument("-i", "--info", action="store_true",
                        help="Get info about URL without downloading")
+    parser.add_argument("--json", action="store_true",
+                       help="With -i, print one JSON line per entry (NDJSON) as the listing is extracted")
+    parser.add_argument("-p", "--playlist", action="store_true",
+                       help="Download the entire playlist/album, starting while it is still being listed")
+    parser.add_argument("--lookahead", type=int, default=16,
+                       help="Playlist entries listed ahead of the downloads - default: 16")
+    parser.add_argument("--ordered", action="store_true",
+                       help="Report playlist results in playlist order")
+    parser.add_argument("--batch-file", metavar="FILE",
+                       help="Read URLs from FILE, one per line ('-' for stdin); with -i, resolve them "
+                            "concurrently, each item once")
+    parser.add_argument("-j", "--jobs", type=int, default=4,
+                       help="Concurrent downloads (or info lookups) in batch and serve mode - default: 4")
+    parser.add_argument("--per-host", type=int, default=2,
+                       help="Concurrent downloads per host in batch mode - default: 2")
+    parser.add_argument("--transcode-workers", type=int, metavar="N",
+                       help="Parallel FFmpeg conversions for batch/playlist audio - default: CPU cores")
+    parser.add_argument("-c", "--connections", type=int, default=1, metavar="N",
+                       help="Connections per download: parallel byte ranges for direct files, "
+                            "concurrent fragments for DASH/HLS - default: 1")
+    parser.add_argument("--chunk-size", type=parse_size, metavar="SIZE",
+                       help="Bytes per range request, e.g. 10M - default: 10M with -c above 1")
+    parser.add_argument("-r", "--limit-rate", type=parse_size, metavar="RATE",
+                       help="Total download rate in bytes per second for all running downloads, "
+                            "e.g. 5M, shared between jobs by priority")
+    parser.add_argument("--priority", type=priority_arg, default="normal", metavar="PRIORITY",
+                       help="Share of --limit-rate for this run's jobs: low, normal, high or a "
+                            "weight - default: normal")
+    parser.add_argument("--share-bandwidth", action="store_true",
+                       help="Split --limit-rate with other processes using the same output directory")
+    parser.add_argument("--retries", type=int, default=3, metavar="N",
+                       help="Retries after network errors, 5xx and 429 responses, with backoff; a "
+                            "host that keeps failing is paused - default: 3")
+    parser.add_argument("--cache-path", metavar="FILE",
+                       help="Metadata cache file - default: OUTPUT/.media-cache.sqlite3")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Do not read or write the metadata cache")
+    parser.add_argument("--refresh", action="store_true",
+                       help="Ignore cached metadata and fetch it again")
+    parser.add_argument("--store", metavar="DIR",
+                       help="Content store shared between output directories: finished files are kept "
+                            "there once and linked into OUTPUT, and stored items are linked without "
+                            "downloading")
+    parser.add_argument("--no-archive", action="store_true",
+                       help="Download again even if the item is in the download archive")
+    parser.add_argument("--events", metavar="FILE",
+                       help="Append JSON-lines progress/timing events to FILE ('-' for stdout, "
+                            "other output then goes to stderr)")
+    parser.add_argument("--metrics", metavar="FILE",
+                       help="Write a Prometheus text snapshot of the metrics to FILE after every job")
+    parser.add_argument("--resume", action="store_true",
+                       help="Finish downloads and conversions interrupted in the output directory")
+    parser.add_argument("--no-journal", action="store_true",
+                       help="Do not checkpoint downloads for resuming after a crash")
+    
+    server = parser.add_argument_group("serve options")
+    server.add_argument("--host", default="127.0.0.1",
+                        help="Interface the job API listens on - default: 127.0.0.1")
+    server.add_argument("--port", type=int, default=8765,
+                        help="Port of the job API - default: 8765")
+    server.add_argument("--socket", metavar="PATH",
+                        help="Listen on a Unix socket instead of a TCP port")
+    server.add_argument("--max-queue", type=int, default=1000, metavar="N",
+                        help="Queued jobs before submissions are refused with 429 - default: 1000")
     
-    args = parser.parse_args()
+    workers = parser.add_argument_group("enqueue/worker options")
+    workers.add_argument("--queue", metavar="FILE",
+                         help="Job queue shared by the workers - default: OUTPUT/.queue.sqlite3")
+    workers.add_argument("--lease", type=float, default=60.0, metavar="SECONDS",
+                         help="Time a worker holds a job without a heartbeat before another worker "
+                              "takes it over - default: 60")
+    workers.add_argument("--until-empty", action="store_true",
+                         help="Stop the worker once no job is queued")
+    
+    syncing = parser.add_argument_group("sync options")
+    syncing.add_argument("--full", action="store_true",
+                         help="Read whole listings instead of stopping at the first known items")
+    
+    # Intermixed, so that 'enqueue' takes several URLs between the options
+    args = parser.parse_intermixed_args()
+    
+    # Keep stdout clean for the event stream or the audio stream
+    if args.events == "-" and args.output == "-":
+        print("❌ Error: --events - and -o - both need stdout", file=sys.stderr)
+        sys.exit(1)
+    args.events_stream = args.output_stream = None
+    if args.events == "-":
+        args.events_stream, sys.stdout = sys.stdout, sys.stderr
+    if args.output == "-":
+        args.output_stream, sys.stdout = sys.stdout.buffer, sys.stderr
     
     # Validate arguments
+    if args.audio:
+        try:
+            parse_formats(args.format)
+        except TranscodeError as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+    
+    if args.json and not args.info:
+        print("❌ Error: --json is used with -i (info)", file=sys.stderr)
+        sys.exit(1)
+    if args.json and args.events == "-":
+        print("❌ Error: --events - and --json both need stdout", file=sys.stderr)
+        sys.exit(1)
+    
+    if args.urls and args.url not in ("enqueue", "sync"):
+        print("❌ Error: Only one URL can be given, use --batch-file for more", file=sys.stderr)
+        sys.exit(1)
+    
+    if args.output_stream is not None:
+        sys.exit(run_stream(args))
+    
+    if args.url == "enqueue":
+        sys.exit(run_enqueue(args))
+    
+    if args.url == "worker":
+        sys.exit(run_worker(args))
+    
+    if args.url == "sync":
+        sys.exit(run_sync(args))
+    
+    if args.batch_file and args.info:
+        sys.exit(run_info_batch(args))
+    
+    if args.batch_file and not args.info:
+        if not (args.audio or args.video):
+            print("❌ Error: Please specify -a (audio) or -v (video) with --batch-file")
+            sys.exit(1)
+        sys.exit(run_batch(args))
+    
+    if args.resume:
+        sys.exit(run_resume(args))
+    
+    if args.url == "serve":
+        sys.exit(run_serve(args))
+    
     if not args.url:
         parser.print_help()
         sys.exit(1)
@@ -173,23 +1661,374 @@ Examples:
         sys.exit(1)
     
     # Create downloader instance
-    downloader = MediaDownloader(output_dir=args.output)
-    
-    # Execute requested action
-    if args.info:
-        print(f"📋 Getting info for: {args.url}")
-        info = downloader.get_info(args.url)
-        if info:
-            print(f"\nTitle: {info.get('title', 'N/A')}")
-            print(f"Uploader: {info.get('uploader', 'N/A')}")
-            print(f"Duration: {info.get('duration', 'N/A')} seconds")
-            print(f"Description: {info.get('description', 'N/A')[:200]}...")
-    elif args.audio:
-        success = downloader.download_audio(args.url, format=args.format)
-        sys.exit(0 if success else 1)
-    elif args.video:
-        success = downloader.download_video(args.url, quality=args.quality)
-        sys.exit(0 if success else 1)
+    with downloader_from_args(args) as downloader:
+        # Execute requested action
+        if args.info and args.json:
+            sys.exit(run_info_json(downloader, args))
+        elif args.info:
+            print(f"📋 Getting info for: {args.url}")
+            info = downloader.get_media_info(args.url, refresh=args.refresh)
+            if info:
+                print(f"\nTitle: {info.title or 'N/A'}")
+                print(f"Uploader: {info.uploader or 'N/A'}")
+                print(f"Duration: {info.duration or 'N/A'} seconds")
+                print(f"Description: {(info.description or 'N/A')[:200]}...")
+            if downloader.cache:
+                stats = downloader.cache.stats()
+                print(f"\nCache: {stats['hits']} hit(s), {stats['misses']} miss(es)")
+            return
+        elif args.playlist:
+            success = run_playlist(downloader, args)
+        elif args.audio:
+            success = downloader.download_audio(args.url, format=args.format)
+        else:
+            success = downloader.download_video(args.url, quality=args.quality)
+    sys.exit(0 if success else 1)
+
+
+def read_chunks(response, chunk_size: int, progress=None, info: dict = None):
+    """
+    Yield a response body in chunks of at most chunk_size, closing it at the end
+    
+    `progress` gets yt-dlp style progress dicts, so streamed bytes show up
+    in the metrics like downloaded ones.
+    """
+    started = time.monotonic()
+    total = int(response.headers.get('Content-Length') or 0) or None
+    status = {'status': 'downloading', 'filename': (info or {}).get('url'), 'info_dict': info or {},
+              'downloaded_bytes': 0, 'total_bytes': total}
+    try:
+        while True:
+            chunk = response.read(chunk_size)
+            if not chunk:
+                break
+            status['downloaded_bytes'] += len(chunk)
+            if progress:
+                elapsed = time.monotonic() - started
+                progress(dict(status, speed=status['downloaded_bytes'] / elapsed if elapsed else None))
+            yield chunk
+        status['status'] = 'finished'
+        if progress:
+            progress(dict(status, elapsed=time.monotonic() - started))
+    finally:
+        response.close()
+        if progress and status['status'] != 'finished':
+            # Stopped early: drop it from the active downloads
+            progress(dict(status, status='error'))
+
+
+def downloader_from_args(args, **overrides) -> MediaDownloader:
+    """Create a MediaDownloader configured from the command-line options (and any overrides)"""
+    events = None
+    if args.events:
+        events = JsonLinesWriter(args.events_stream or open(args.events, "a", encoding="utf-8"))
+    options = dict(output_dir=args.output, cache_path=args.cache_path,
+                   use_cache=not args.no_cache,
+                   use_archive=not args.no_archive,
+                   transcode_workers=args.transcode_workers,
+                   connections=args.connections,
+                   chunk_size=args.chunk_size,
+                   use_journal=not args.no_journal,
+                   events=events,
+                   metrics_path=args.metrics,
+                   rate_limit=args.limit_rate,
+                   priority=args.priority,
+                   share_bandwidth=args.share_bandwidth,
+                   retries=args.retries,
+                   store_path=args.store)
+    options.update(overrides)
+    return MediaDownloader(**options)
+
+
+def parse_size(value: str) -> int:
+    """argparse type for byte sizes such as 512K or 10M"""
+    from yt_dlp.utils import parse_bytes
+    
+    size = parse_bytes(value)
+    if not size:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+    return size
+
+
+def priority_arg(value: str) -> int:
+    """argparse type for job priorities (low, normal, high or a weight)"""
+    try:
+        return parse_priority(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def read_batch_file(path: str) -> list:
+    """Read URLs from a batch file, skipping blank lines and # comments"""
+    return list(iter_batch_file(path))
+
+
+def iter_batch_file(path: str):
+    """Yield the URLs of a batch file as they are read (see read_batch_file)"""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in stream:
+            if line.strip() and not line.lstrip().startswith("#"):
+                yield line.strip()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def run_batch(args) -> int:
+    """Run a --batch-file download and print a per-URL summary"""
+    try:
+        urls = read_batch_file(args.batch_file)
+    except OSError as e:
+        print(f"❌ Error: Cannot read the batch file: {e}", file=sys.stderr)
+        return 1
+    if args.url:
+        urls.insert(0, args.url)
+    if not urls:
+        print("❌ Error: No URLs to download", file=sys.stderr)
+        return 1
+    
+    with downloader_from_args(args) as downloader:
+        results = downloader.download_many(
+            urls,
+            mode="audio" if args.audio else "video",
+            format=args.format,
+            quality=args.quality,
+            allow_playlist=args.playlist,
+            max_workers=args.jobs,
+            per_host=args.per_host,
+        )
+    
+    failed = [r for r in results if not r['success']]
+    skipped = sum(1 for r in results if r['skipped'])
+    print(f"\n📊 Batch finished: {len(results) - len(failed)}/{len(results)} succeeded"
+          + (f" ({skipped} already downloaded)" if skipped else ""))
+    for result in failed:
+        print(f"  ❌ {result['url']}: {result['error']}")
+    return 0 if not failed else 1
+
+
+def run_serve(args) -> int:
+    """Run the job API with -j workers sharing one downloader"""
+    from server import serve
+    
+    with downloader_from_args(args) as downloader:
+        return serve(downloader, host=args.host, port=args.port, socket_path=args.socket,
+                     workers=max(1, args.jobs), max_queued=max(1, args.max_queue))
+
+
+def queue_from_args(args) -> JobQueue:
+    """Open the job queue selected by the command line (--queue, default OUTPUT/.queue.sqlite3)"""
+    return JobQueue(args.queue or Path(args.output) / ".queue.sqlite3")
+
+
+def run_enqueue(args) -> int:
+    """Add the URLs (and --batch-file) to the job queue, or print its counts if there are none"""
+    urls = list(args.urls)
+    if args.batch_file:
+        try:
+            urls.extend(read_batch_file(args.batch_file))
+        except OSError as e:
+            print(f"❌ Error: Cannot read the batch file: {e}", file=sys.stderr)
+            return 1
+    
+    queue = queue_from_args(args)
+    try:
+        if urls:
+            if not (args.audio or args.video):
+                print("❌ Error: Please specify -a (audio) or -v (video) for the queued jobs", file=sys.stderr)
+                return 1
+            ids = queue.enqueue(urls, mode="audio" if args.audio else "video", format=args.format,
+                                quality=args.quality, playlist=args.playlist, priority=args.priority)
+            print(f"📥 Queued {len(ids)} job(s) in {queue.path} (#{ids[0]}-#{ids[-1]})")
+        stats = queue.stats()
+        expired = stats.pop('expired')
+        summary = ", ".join(f"{count} {state}" for state, count in stats.items()) or "empty"
+        if expired:
+            summary += f" ({expired} running with an expired lease)"
+        print(f"📊 Queue: {summary}")
+    finally:
+        queue.close()
+    return 0
+
+
+def run_worker(args) -> int:
+    """Run jobs from the shared queue until interrupted (or, with --until-empty, until it is empty)"""
+    queue = queue_from_args(args)
+    with downloader_from_args(args) as downloader:
+        worker = QueueWorker(downloader, queue, threads=args.jobs, lease=args.lease)
+        print(f"👷 Worker {worker.name} taking jobs from {queue.path} ({worker.threads} at a time)")
+        try:
+            counts = worker.run(until_empty=args.until_empty)
+        except KeyboardInterrupt:
+            print("\n⏹️  Finishing the running jobs, press Ctrl+C again to hand them back to the queue")
+            worker.stop()
+            try:
+                counts = worker.wait()
+            except KeyboardInterrupt:
+                worker.release()
+                counts = worker.counts
+    queue.close()
+    print(f"\n📊 Worker finished: {counts['done']} done, {counts['failed']} failed, "
+          f"{counts['cancelled']} cancelled, {counts['lost']} taken over by other workers")
+    return 0 if not counts['failed'] else 1
+
+
+def run_sync(args) -> int:
+    """Sync the given sources (or every source synced before into OUTPUT) and print a summary"""
+    with downloader_from_args(args) as downloader:
+        if args.urls:
+            if not (args.audio or args.video):
+                print("❌ Error: Please specify -a (audio) or -v (video) for the synced sources", file=sys.stderr)
+                return 1
+            mode = "audio" if args.audio else "video"
+            sources = [{'url': url, 'mode': mode, 'format': args.format, 'quality': args.quality}
+                       for url in args.urls]
+        else:
+            sources = downloader.sync_state.sources()
+            if not sources:
+                print(f"❌ Error: Nothing was synced into {args.output} yet, give the URLs to sync", file=sys.stderr)
+                return 1
+        
+        new = 0
+        failed = []
+        for source in sources:
+            print(f"\n🔄 Syncing {source['url']}")
+            try:
+                for result in downloader.sync(source['url'], mode=source['mode'], format=source['format'],
+                                              quality=source['quality'], full=args.full, max_workers=args.jobs,
+                                              lookahead=args.lookahead, priority=args.priority):
+                    if not result['success']:
+                        failed.append(result)
+                    elif not result['skipped']:
+                        new += 1
+            except Exception as e:
+                print(f"❌ Error syncing {source['url']}: {e}", file=sys.stderr)
+                failed.append({'url': source['url'], 'title': None, 'error': str(e)})
+    
+    print(f"\n📊 Sync finished: {len(sources)} source(s), {new} new item(s), {len(failed)} failed")
+    for result in failed:
+        print(f"  ❌ {result['title'] or result['url']}: {result['error']}")
+    return 0 if not failed else 1
+
+
+def run_info_batch(args) -> int:
+    """Resolve the URLs of a batch file concurrently and print a line per URL as it completes (-i --batch-file)"""
+    urls = iter_batch_file(args.batch_file)
+    if args.url:
+        urls = itertools.chain([args.url], urls)
+    
+    counts = {'urls': 0, 'duplicates': 0, 'failed': 0}
+    with downloader_from_args(args) as downloader:
+        try:
+            for result in downloader.get_info_many(urls, max_workers=args.jobs, refresh=args.refresh):
+                counts['urls'] += 1
+                if result['error']:
+                    counts['failed'] += 1
+                elif result['duplicate_of']:
+                    counts['duplicates'] += 1
+                if args.json:
+                    record = dict(result, info=result['info'].to_dict() if result['info'] else None)
+                    sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    sys.stdout.flush()
+                elif result['error']:
+                    print(f"❌ {result['url']}: {result['error']}")
+                elif result['duplicate_of']:
+                    print(f"♻️  {result['url']} (same as {result['duplicate_of']})")
+                else:
+                    print(f"✅ {result['info'].title or 'N/A'} [{result['key']}] {result['url']}")
+        except BrokenPipeError:
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+    
+    unique = counts['urls'] - counts['duplicates'] - counts['failed']
+    print(f"\n📊 Info finished: {counts['urls']} URL(s), {unique} unique item(s), "
+          f"{counts['duplicates']} duplicate(s), {counts['failed']} failed", file=sys.stderr if args.json else sys.stdout)
+    return 0 if not counts['failed'] else 1
+
+
+def run_stream(args) -> int:
+    """Stream the converted audio of one URL to stdout (-o -)"""
+    if not (args.audio and args.url) or args.playlist or args.batch_file or args.info:
+        print("❌ Error: -o - streams the audio of a single URL, use it with -a and without -p", file=sys.stderr)
+        return 1
+    
+    # Nothing is saved, so there is no output directory for the archive and journal
+    with downloader_from_args(args, output_dir=tempfile.gettempdir(), use_cache=False, use_archive=False,
+                              use_journal=False) as downloader:
+        try:
+            for chunk in downloader.stream_audio(args.url, format=args.format):
+                args.output_stream.write(chunk)
+                args.output_stream.flush()
+        except BrokenPipeError:
+            # The reader went away (e.g. `| head`); keep Python from failing again at exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), args.output_stream.fileno())
+            return 1
+        except Exception as e:
+            print(f"❌ Error streaming audio: {e}", file=sys.stderr)
+            return 1
+    return 0
+
+
+def run_info_json(downloader: MediaDownloader, args) -> int:
+    """Print a MediaInfo record per entry as NDJSON while the listing is extracted (-i --json)"""
+    out = sys.stdout
+    try:
+        for record in downloader.iter_info(args.url):
+            out.write(json.dumps(record.to_dict(), ensure_ascii=False) + "\n")
+            out.flush()
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+        return 1
+    except Exception as e:
+        print(f"❌ Error getting info: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_resume(args) -> int:
+    """Resume every interrupted job in the output directory and print a summary"""
+    with downloader_from_args(args) as downloader:
+        results = downloader.resume()
+    
+    if not results:
+        print("✅ Nothing to resume")
+        return 0
+    failed = [r for r in results if not r['success']]
+    print(f"\n📊 Resume finished: {len(results) - len(failed)}/{len(results)} succeeded")
+    for result in failed:
+        print(f"  ❌ {result['url']}")
+    return 0 if not failed else 1
+
+
+def run_playlist(downloader: MediaDownloader, args) -> bool:
+    """Run a pipelined playlist download and print a summary"""
+    results = downloader.download_playlist(
+        args.url,
+        mode="audio" if args.audio else "video",
+        format=args.format,
+        quality=args.quality,
+        max_workers=args.jobs,
+        lookahead=args.lookahead,
+        ordered=args.ordered,
+    )
+    total = 0
+    failed = []
+    error = None
+    try:
+        for result in results:
+            total += 1
+            if not result['success']:
+                failed.append(result)
+    except Exception as e:
+        error = e
+        print(f"❌ Error listing playlist: {e}", file=sys.stderr)
+    
+    print(f"\n📊 Playlist finished: {total - len(failed)}/{total} succeeded"
+          + (", listing failed" if error is not None else ""))
+    for result in failed:
+        print(f"  ❌ {result['index']}. {result['title'] or result['url']}: {result['error']}")
+    return not failed and error is None
 
 
 if __name__ == "__main__":
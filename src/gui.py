@@ -5,17 +5,64 @@ Media Downloader GUI - Graphical interface for downloading audio and video
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
+import itertools
+import queue
+import tempfile
 import threading
+import time
 from pathlib import Path
+import os
 import sys
-from downloader import MediaDownloader
+from downloader import MediaDownloader, warm_up
+from journal import stream_expired
+from media_info import estimate_size
+
+
+# Job states and how the queue panel shows them
+QUEUED, RUNNING, CONVERTING, DONE, SKIPPED, FAILED, CANCELLED = \
+    "queued", "running", "converting", "done", "skipped", "failed", "cancelled"
+STATE_LABELS = {
+    QUEUED: "⏳ Ootel",
+    RUNNING: "⬇️ Laadib",
+    CONVERTING: "🔄 Töötleb",
+    DONE: "✅ Valmis",
+    SKIPPED: "⏭️ Juba olemas",
+    FAILED: "❌ Viga",
+    CANCELLED: "🚫 Tühistatud",
+}
+FINISHED = (DONE, SKIPPED, FAILED, CANCELLED)
+
+
+def describe_info(info: dict) -> str:
+    """One-line summary of prefetched info: title, duration and size (or playlist length)"""
+    if not info:
+        return "⚠️ Infot ei õnnestunud hankida"
+    title = info.get('title') or info.get('id') or "?"
+    if info.get('_type') in ('playlist', 'multi_video'):
+        count = info.get('playlist_count') or len(info.get('entries') or [])
+        return f"📋 {title}  |  {count} kirjet"
+    parts = [f"🎵 {title}"]
+    if info.get('duration'):
+        minutes, seconds = divmod(int(info['duration']), 60)
+        hours, minutes = divmod(minutes, 60)
+        parts.append(f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}")
+    size = estimate_size(info)
+    if size:
+        parts.append(f"~{size / 1024 / 1024:.1f} MB")
+    return "  |  ".join(parts)
 
 
 class MediaDownloaderGUI:
+    PRIORITIES = {"Madal": "low", "Tavaline": "normal", "Kõrge": "high"}
+    UPDATE_INTERVAL = 200  # ms between batched queue panel updates
+    PROGRESS_INTERVAL = 0.25  # seconds between progress updates sent per job
+    PREFETCH_DELAY = 600  # ms the URL must stay unchanged before its info is fetched
+    PREFETCH_KEEP = 100  # prefetched infos kept for reuse
+    
     def __init__(self, root):
         self.root = root
         self.root.title("Meedia tööriist 🎵🎬")
-        self.root.geometry("600x550")
+        self.root.geometry("700x885")
         self.root.resizable(False, False)
         
         # Set a neutral background color
@@ -30,13 +77,44 @@ class MediaDownloaderGUI:
         # Variables
         self.url_var = tk.StringVar()
         self.output_var = tk.StringVar(value="")
-        self.format_var = tk.StringVar(value="mp3")
+        self.format_vars = {
+            name: tk.BooleanVar(value=(name == "mp3"))
+            for name in ("mp3", "m4a", "wav", "flac", "aac")
+        }
         self.download_type = tk.StringVar(value="audio")
         self.playlist_var = tk.BooleanVar(value=False)
+        self.rate_limit_var = tk.StringVar(value="")
+        self.priority_var = tk.StringVar(value="Tavaline")
+        self.workers_var = tk.IntVar(value=3)
         self.status_var = tk.StringVar(value="Valmis")
+        self.info_var = tk.StringVar(value="")
+        
+        # Download queue: only the Tk thread touches the widgets and the Tk
+        # variables; workers take job dicts from job_queue and report through
+        # the thread-safe updates queue, drained every UPDATE_INTERVAL
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+        self.job_queue = queue.Queue()
+        self.updates = queue.Queue()
+        self.workers = {}
+        self.worker_limit = self.workers_var.get()
+        self.downloaders = {}
+        self.downloaders_lock = threading.Lock()
+        
+        # Info prefetch: a URL that stays unchanged for PREFETCH_DELAY is
+        # looked up in the background through the downloader of the chosen
+        # folder, and the info is handed to a download into that folder
+        self.prefetched = {}  # url -> (output folder or None, info)
+        self.prefetching = set()
+        self.prefetch_results = queue.Queue()
+        self.prefetch_after = None
+        self.info_downloader = None
+        self.url_var.trace_add("write", self.on_url_change)
         
         self.setup_ui()
-        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(self.UPDATE_INTERVAL, self.flush_updates)
+    
     def create_context_menu(self, widget):
         """Create a right-click context menu for an Entry widget"""
         context_menu = tk.Menu(widget, tearoff=0)
@@ -111,7 +189,7 @@ class MediaDownloaderGUI:
             widget.icursor(tk.END)
         except tk.TclError:
             pass
-        
+    
     def setup_ui(self):
         """Setup the user interface"""
         
@@ -162,12 +240,23 @@ class MediaDownloaderGUI:
             relief=tk.SOLID,
             borderwidth=1
         )
-        url_entry.pack(fill=tk.X, pady=(0, 15))
+        url_entry.pack(fill=tk.X, pady=(0, 5))
         url_entry.focus()
         
         # Add context menu to URL entry
         self.create_context_menu(url_entry)
         
+        # Prefetched info about the URL
+        info_label = tk.Label(
+            main_frame,
+            textvariable=self.info_var,
+            font=("Segoe UI", 9),
+            fg="#6c6c6c",
+            bg="#f5f5f5",
+            anchor=tk.W
+        )
+        info_label.pack(fill=tk.X, pady=(0, 10))
+        
         # Download Type Selection
         type_label = tk.Label(
             main_frame, 
@@ -235,15 +324,22 @@ class MediaDownloaderGUI:
         )
         format_label.pack(anchor=tk.W, pady=(0, 5))
         
-        format_combo = ttk.Combobox(
-            self.format_frame,
-            textvariable=self.format_var,
-            values=["mp3", "m4a", "wav", "flac", "aac"],
-            state="readonly",
-            width=15,
-            font=("Segoe UI", 9)
-        )
-        format_combo.pack(anchor=tk.W)
+        # Several formats can be ticked; they are all made from one download
+        format_checks = tk.Frame(self.format_frame, bg="#f5f5f5")
+        format_checks.pack(anchor=tk.W)
+        
+        for name, var in self.format_vars.items():
+            format_check = tk.Checkbutton(
+                format_checks,
+                text=name,
+                variable=var,
+                font=("Segoe UI", 9),
+                bg="#f5f5f5",
+                fg="#2c2c2c",
+                selectcolor="#e0e0e0",
+                activebackground="#f5f5f5"
+            )
+            format_check.pack(side=tk.LEFT, padx=(0, 10))
         
         # Output Directory
         output_label = tk.Label(
@@ -289,10 +385,75 @@ class MediaDownloaderGUI:
         )
         browse_btn.pack(side=tk.LEFT)
         
+        # Bandwidth: a limit shared with other downloads into the same folder
+        bandwidth_frame = tk.Frame(main_frame, bg="#f5f5f5")
+        bandwidth_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        rate_label = tk.Label(
+            bandwidth_frame,
+            text="Kiiruspiirang (MB/s):",
+            font=("Segoe UI", 10, "bold"),
+            bg="#f5f5f5",
+            fg="#2c2c2c"
+        )
+        rate_label.pack(side=tk.LEFT)
+        
+        rate_entry = tk.Entry(
+            bandwidth_frame,
+            textvariable=self.rate_limit_var,
+            font=("Segoe UI", 9),
+            width=8,
+            bg="#ffffff",
+            fg="#2c2c2c",
+            relief=tk.SOLID,
+            borderwidth=1
+        )
+        rate_entry.pack(side=tk.LEFT, padx=(5, 20))
+        self.create_context_menu(rate_entry)
+        
+        priority_label = tk.Label(
+            bandwidth_frame,
+            text="Prioriteet:",
+            font=("Segoe UI", 10, "bold"),
+            bg="#f5f5f5",
+            fg="#2c2c2c"
+        )
+        priority_label.pack(side=tk.LEFT)
+        
+        priority_combo = ttk.Combobox(
+            bandwidth_frame,
+            textvariable=self.priority_var,
+            values=list(self.PRIORITIES),
+            state="readonly",
+            width=10
+        )
+        priority_combo.pack(side=tk.LEFT, padx=(5, 20))
+        
+        workers_label = tk.Label(
+            bandwidth_frame,
+            text="Korraga:",
+            font=("Segoe UI", 10, "bold"),
+            bg="#f5f5f5",
+            fg="#2c2c2c"
+        )
+        workers_label.pack(side=tk.LEFT)
+        
+        workers_spin = tk.Spinbox(
+            bandwidth_frame,
+            from_=1,
+            to=8,
+            textvariable=self.workers_var,
+            font=("Segoe UI", 9),
+            width=3,
+            state="readonly",
+            command=self.on_workers_change
+        )
+        workers_spin.pack(side=tk.LEFT, padx=(5, 0))
+        
         # Download Button
         self.download_btn = tk.Button(
             main_frame,
-            text="Lae alla",
+            text="Lisa järjekorda",
             command=self.start_download,
             font=("Segoe UI", 11, "bold"),
             bg="#5a5a5a",
@@ -317,7 +478,8 @@ class MediaDownloaderGUI:
         
         self.progress = ttk.Progressbar(
             main_frame, 
-            mode='indeterminate',
+            mode='determinate',
+            maximum=100,
             style="Custom.Horizontal.TProgressbar"
         )
         self.progress.pack(fill=tk.X, pady=(0, 10))
@@ -330,8 +492,60 @@ class MediaDownloaderGUI:
             fg="#6c6c6c",
             bg="#f5f5f5"
         )
-        status_label.pack()
+        status_label.pack(pady=(0, 10))
+        
+        # Queue panel
+        queue_label = tk.Label(
+            main_frame,
+            text="Järjekord:",
+            font=("Segoe UI", 10, "bold"),
+            bg="#f5f5f5",
+            fg="#2c2c2c"
+        )
+        queue_label.pack(anchor=tk.W, pady=(0, 5))
+        
+        tree_frame = tk.Frame(main_frame, bg="#f5f5f5")
+        tree_frame.pack(fill=tk.BOTH, expand=True)
         
+        self.queue_tree = ttk.Treeview(
+            tree_frame,
+            columns=("url", "type", "state", "progress", "speed"),
+            show="headings",
+            height=8,
+            selectmode="extended"
+        )
+        for column, heading, width in (("url", "URL", 250), ("type", "Tüüp", 60), ("state", "Olek", 110),
+                                       ("progress", "Edenemine", 110), ("speed", "Kiirus", 80)):
+            self.queue_tree.heading(column, text=heading)
+            self.queue_tree.column(column, width=width, stretch=(column == "url"))
+        self.queue_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.queue_tree.bind("<<TreeviewSelect>>", self.on_job_select)
+        
+        tree_scroll = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.queue_tree.yview)
+        tree_scroll.pack(side=tk.LEFT, fill=tk.Y)
+        self.queue_tree.configure(yscrollcommand=tree_scroll.set)
+        
+        queue_buttons = tk.Frame(main_frame, bg="#f5f5f5")
+        queue_buttons.pack(fill=tk.X, pady=(10, 0))
+        
+        for text, command in (("Tühista valitud", self.cancel_selected),
+                              ("Eemalda lõpetatud", self.clear_finished)):
+            button = tk.Button(
+                queue_buttons,
+                text=text,
+                command=command,
+                font=("Segoe UI", 9),
+                bg="#6c6c6c",
+                fg="#ffffff",
+                activebackground="#5a5a5a",
+                activeforeground="#ffffff",
+                relief=tk.FLAT,
+                cursor="hand2",
+                padx=15,
+                pady=5
+            )
+            button.pack(side=tk.LEFT, padx=(0, 10))
+    
     def on_type_change(self):
         """Handle download type change"""
         if self.download_type.get() == "audio":
@@ -345,7 +559,7 @@ class MediaDownloaderGUI:
                     if text == "Salvesta kausta:":
                         pack_position = widget
                         break
-        
+            
             if pack_position:
                 self.format_frame.pack(anchor=tk.W, pady=(0, 15), before=pack_position)
             else:
@@ -380,75 +594,324 @@ class MediaDownloaderGUI:
             messagebox.showerror("Viga", "Palun sisesta korrektne URL (peab algama http:// või https://)")
             return False
         
+        if self.download_type.get() == "audio" and not self.selected_formats():
+            messagebox.showerror("Viga", "Palun vali vähemalt üks audio formaat")
+            return False
+        
+        try:
+            self.rate_limit()
+        except ValueError:
+            messagebox.showerror("Viga", "Kiiruspiirang peab olema positiivne arv (MB/s) või tühi")
+            return False
+        
         return True
     
+    def rate_limit(self):
+        """Return the bandwidth limit in bytes per second, or None if unlimited"""
+        value = self.rate_limit_var.get().strip().replace(",", ".")
+        if not value:
+            return None
+        limit = float(value)
+        if limit <= 0:
+            raise ValueError(value)
+        return int(limit * 1000 * 1000)
+    
+    def selected_formats(self):
+        """Return the ticked audio formats"""
+        return [name for name, var in self.format_vars.items() if var.get()]
+    
+    def on_url_change(self, *args):
+        """Schedule an info prefetch once the URL has stopped changing"""
+        if self.prefetch_after is not None:
+            self.root.after_cancel(self.prefetch_after)
+            self.prefetch_after = None
+        url = self.url_var.get().strip()
+        if not url.startswith(('http://', 'https://')):
+            self.info_var.set("")
+        elif url in self.prefetched:
+            self.info_var.set(describe_info(self.prefetched[url][1]))
+        else:
+            self.info_var.set("🔎 Otsin infot...")
+            self.prefetch_after = self.root.after(self.PREFETCH_DELAY, self.prefetch_info, url)
+    
+    def prefetch_info(self, url):
+        """Look up a URL's info on a background thread"""
+        self.prefetch_after = None
+        if url in self.prefetching or url in self.prefetched:
+            return
+        output = self.output_var.get() if self.output_var.get().strip() else None
+        self.prefetching.add(url)
+        threading.Thread(target=self.prefetch_worker, args=(url, output), daemon=True).start()
+    
+    def prefetch_worker(self, url, output):
+        """Prefetch thread: resolve a URL's info; never touches Tk"""
+        # The job's own downloader resolves the info the same way its download would. It is only
+        # opened for an existing folder: the field may hold a half-typed path, which must not be created
+        downloader = None
+        if output and os.path.isdir(output):
+            try:
+                downloader = self.downloader_for({'output_dir': output})
+            except OSError:
+                downloader = None
+        if downloader is None:
+            output = None
+            with self.downloaders_lock:
+                if self.info_downloader is None:
+                    # Preview only, without a folder to write to; its info is not reused for a download
+                    self.info_downloader = MediaDownloader(output_dir=tempfile.gettempdir(), use_cache=False,
+                                                           use_archive=False, use_journal=False, retries=0)
+                downloader = self.info_downloader
+        self.prefetch_results.put((url, output, downloader.get_info(url)))
+    
+    def take_prefetched(self, url, playlist, output_dir):
+        """Return info prefetched by the downloader a job for the URL and folder runs on, or None"""
+        folder, info = self.prefetched.get(url, (None, None))
+        if (not info or folder != output_dir or playlist or info.get('_type', 'video') != 'video'
+                or stream_expired(info)):
+            return None
+        return info
+    
     def start_download(self):
-        """Start the download process"""
+        """Add a job for the entered URL to the download queue"""
         if not self.validate_inputs():
             return
         
-        # Disable button and start progress
-        self.download_btn.config(state=tk.DISABLED, bg="#808080")
-        self.progress.start(10)
-        self.status_var.set("Allalaadimine käib... Palun oota")
-        
-        # Run download in separate thread
-        thread = threading.Thread(target=self.download_worker, daemon=True)
-        thread.start()
+        # Everything the worker needs is read here, on the Tk thread
+        job = {
+            'id': next(self.job_ids),
+            'url': self.url_var.get().strip(),
+            'mode': self.download_type.get(),
+            'formats': self.selected_formats(),
+            'playlist': self.playlist_var.get(),
+            'output_dir': self.output_var.get(),
+            'rate_limit': self.rate_limit(),
+            'priority': self.PRIORITIES[self.priority_var.get()],
+            'info': self.take_prefetched(self.url_var.get().strip(), self.playlist_var.get(),
+                                         self.output_var.get()),
+            'state': QUEUED,
+            'cancel': threading.Event(),
+        }
+        self.jobs[job['id']] = job
+        self.queue_tree.insert("", tk.END, iid=str(job['id']), values=(
+            job['url'], "Heli" if job['mode'] == "audio" else "Video", STATE_LABELS[QUEUED], "", ""))
+        self.job_queue.put(job)
+        self.ensure_workers()
+        self.url_var.set("")
+        self.update_summary()
     
-    def download_worker(self):
-        """Worker thread for downloading"""
-        try:
-            url = self.url_var.get().strip()
-            output_dir = self.output_var.get()
-            download_type = self.download_type.get()
-            allow_playlist = self.playlist_var.get()
-            
-            downloader = MediaDownloader(output_dir=output_dir)
+    def on_workers_change(self):
+        """Apply a new number of concurrent downloads"""
+        self.worker_limit = self.workers_var.get()
+        self.ensure_workers()
+    
+    def ensure_workers(self):
+        """Start worker threads up to the chosen number of concurrent downloads"""
+        for index in range(self.worker_limit):
+            worker = self.workers.get(index)
+            if worker is None or not worker.is_alive():
+                worker = threading.Thread(target=self.download_worker, args=(index,), daemon=True)
+                self.workers[index] = worker
+                worker.start()
+    
+    def downloader_for(self, job):
+        """
+        Return the shared downloader of a job's output folder
+        
+        One per folder, so the folder has one bandwidth scheduler; each
+        job's rate limit is applied to that job's bandwidth group.
+        """
+        with self.downloaders_lock:
+            if job['output_dir'] not in self.downloaders:
+                self.downloaders[job['output_dir']] = MediaDownloader(output_dir=job['output_dir'],
+                                                                      share_bandwidth=True)
+            return self.downloaders[job['output_dir']]
+    
+    def download_worker(self, index):
+        """Worker thread: run queued jobs; never touches Tk"""
+        while index < self.worker_limit:
+            try:
+                job = self.job_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if job['cancel'].is_set():
+                continue
+            self.updates.put((job['id'], {'state': RUNNING}))
+            try:
+                downloader = self.downloader_for(job)
+                result = {'url': job['url'], 'success': False}
+                downloader._run_job(result, job['mode'], job['formats'], "best",
+                                    allow_playlist=job['playlist'], info=job['info'],
+                                    progress=self.job_progress(job),
+                                    share=downloader._share(job['priority'], job['rate_limit']))
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
             
-            if download_type == "audio":
-                format_type = self.format_var.get()
-                success = downloader.download_audio(url, format=format_type, allow_playlist=allow_playlist)
+            if result['success']:
+                update = {'state': SKIPPED if result.get('skipped') else DONE}
+            elif job['cancel'].is_set():
+                update = {'state': CANCELLED}
             else:
-                success = downloader.download_video(url, allow_playlist=allow_playlist)
-            
-            # Update UI on main thread
-            self.root.after(0, self.download_complete, success)
-            
-        except Exception as e:
-            self.root.after(0, self.download_error, str(e))
-    
-    def download_complete(self, success):
-        """Handle download completion"""
-        self.progress.stop()
-        self.download_btn.config(state=tk.NORMAL, bg="#5a5a5a")
-        
-        if success:
-            self.status_var.set("✅ Allalaadimine õnnestus!")
-            messagebox.showinfo(
-                "Õnnestus",
-                f"Allalaadimine õnnestus!\n\nSalvestatud asukohta: {self.output_var.get()}"
-            )
-            self.url_var.set("")  # Clear URL
-        else:
-            self.status_var.set("❌ Allalaadimine ebaõnnestus")
-            messagebox.showerror(
-                "Viga",
-                "Allalaadimine ebaõnnestus. Palun kontrolli URL-i ja proovi uuesti."
-            )
+                update = {'state': FAILED, 'error': result.get('error')}
+            self.updates.put((job['id'], update))
+    
+    def job_progress(self, job):
+        """Progress hook of one job: stops it when cancelled and reports at most every PROGRESS_INTERVAL"""
+        from yt_dlp.utils import DownloadCancelled
+        
+        last = [0.0]
+        
+        def hook(d):
+            if job['cancel'].is_set():
+                raise DownloadCancelled("Tühistatud")
+            now = time.monotonic()
+            if d['status'] == 'finished':
+                self.updates.put((job['id'], {'state': CONVERTING}))
+            elif d['status'] == 'downloading' and now - last[0] >= self.PROGRESS_INTERVAL:
+                last[0] = now
+                self.updates.put((job['id'], {
+                    'state': RUNNING,
+                    'downloaded': d.get('downloaded_bytes') or 0,
+                    'total': d.get('total_bytes') or d.get('total_bytes_estimate'),
+                    'speed': d.get('speed'),
+                }))
+        return hook
+    
+    def flush_updates(self):
+        """Apply the updates workers queued since the last call, one row change per job"""
+        while True:
+            try:
+                url, output, info = self.prefetch_results.get_nowait()
+            except queue.Empty:
+                break
+            self.prefetching.discard(url)
+            if info:
+                # Failed lookups are not kept, so editing the URL back retries them
+                self.prefetched[url] = (output, info)
+                if len(self.prefetched) > self.PREFETCH_KEEP:
+                    del self.prefetched[next(iter(self.prefetched))]
+            if url == self.url_var.get().strip():
+                self.info_var.set(describe_info(info))
+        
+        changes = {}
+        while True:
+            try:
+                job_id, update = self.updates.get_nowait()
+            except queue.Empty:
+                break
+            changes.setdefault(job_id, {}).update(update)
+        
+        for job_id, update in changes.items():
+            job = self.jobs.get(job_id)
+            if job is None:
+                continue
+            if job['state'] == CANCELLED and update.get('state') != CANCELLED:
+                update.pop('state', None)
+            job.update(update)
+            self.show_job(job)
+        if changes:
+            self.update_summary()
+        self.root.after(self.UPDATE_INTERVAL, self.flush_updates)
     
-    def download_error(self, error_msg):
-        """Handle download error"""
-        self.progress.stop()
-        self.download_btn.config(state=tk.NORMAL, bg="#5a5a5a")
-        self.status_var.set("❌ Viga")
-        messagebox.showerror("Viga", f"Tekkis viga:\n\n{error_msg}")
+    def show_job(self, job):
+        """Refresh a job's row in the queue panel"""
+        iid = str(job['id'])
+        if not self.queue_tree.exists(iid):
+            return
+        progress = speed = ""
+        if job['state'] == RUNNING and job.get('total'):
+            percent = min(100, job['downloaded'] * 100 / job['total'])
+            filled = int(percent / 10)
+            progress = f"{'█' * filled}{'░' * (10 - filled)} {percent:.0f}%"
+            if job.get('speed'):
+                speed = f"{job['speed'] / 1024 / 1024:.1f} MiB/s"
+        elif job['state'] in (DONE, SKIPPED):
+            progress = f"{'█' * 10} 100%"
+        self.queue_tree.set(iid, "state", STATE_LABELS[job['state']])
+        self.queue_tree.set(iid, "progress", progress)
+        self.queue_tree.set(iid, "speed", speed)
+    
+    def update_summary(self):
+        """Show overall progress of the queue in the progress bar and status line"""
+        counts = {}
+        for job in self.jobs.values():
+            counts[job['state']] = counts.get(job['state'], 0) + 1
+        finished = sum(counts.get(state, 0) for state in FINISHED)
+        self.progress['value'] = finished * 100 / len(self.jobs) if self.jobs else 0
+        if not self.jobs:
+            self.status_var.set("Valmis")
+            return
+        active = counts.get(RUNNING, 0) + counts.get(CONVERTING, 0)
+        self.status_var.set(
+            f"Käib: {active}  |  Ootel: {counts.get(QUEUED, 0)}  |  "
+            f"Valmis: {counts.get(DONE, 0) + counts.get(SKIPPED, 0)}  |  Vigu: {counts.get(FAILED, 0)}")
+    
+    def on_job_select(self, event=None):
+        """Show the error of a failed job when it is selected"""
+        for iid in self.queue_tree.selection():
+            job = self.jobs.get(int(iid))
+            if job and job['state'] == FAILED and job.get('error'):
+                self.status_var.set(f"❌ {job['error']}")
+                return
+    
+    def cancel_selected(self):
+        """Cancel the selected jobs: queued ones are dropped, running ones stop at their next progress update"""
+        for iid in self.queue_tree.selection():
+            job = self.jobs.get(int(iid))
+            if job is None or job['state'] in FINISHED:
+                continue
+            job['cancel'].set()
+            if job['state'] == QUEUED:
+                job['state'] = CANCELLED
+                self.show_job(job)
+        self.update_summary()
+    
+    def clear_finished(self):
+        """Remove finished jobs from the queue panel"""
+        for job_id, job in list(self.jobs.items()):
+            if job['state'] in FINISHED:
+                self.queue_tree.delete(str(job_id))
+                del self.jobs[job_id]
+        self.update_summary()
+    
+    def on_close(self):
+        """Ask before closing while jobs are unfinished, then stop them"""
+        unfinished = [job for job in self.jobs.values() if job['state'] not in FINISHED]
+        if unfinished and not messagebox.askokcancel(
+                "Välju", f"{len(unfinished)} allalaadimist on veel pooleli. Kas katkestada ja väljuda?"):
+            return
+        for job in unfinished:
+            job['cancel'].set()
+        self.root.destroy()
+        for downloader in self.downloaders.values():
+            downloader.close()
+        if self.info_downloader is not None:
+            self.info_downloader.close()
+
+
+def warm_up_engine():
+    """Import the download engine in the background so the first download starts quickly"""
+    try:
+        warm_up()
+    except Exception:
+        pass  # the download itself reports a broken installation
 
 
 def main():
     """Main entry point for GUI"""
     root = tk.Tk()
     app = MediaDownloaderGUI(root)
+    
+    # The window is shown first; yt-dlp is loaded while the user types a URL
+    root.after(100, lambda: threading.Thread(target=warm_up_engine, daemon=True).start())
+    
+    if os.environ.get("MEDIA_DOWNLOADER_EXIT_WHEN_DRAWN"):
+        # Used by benchmarks/startup.py to time how long the first window takes
+        def exit_when_drawn():
+            root.wait_visibility()
+            root.update_idletasks()
+            root.destroy()
+        root.after(0, exit_when_drawn)
+    
     root.mainloop()
 
 
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Job queue - Download jobs shared by worker processes through one SQLite file
+Workers on one machine, or on several sharing a filesystem, claim jobs under
+a lease they renew while the job runs; the job of a worker that crashed or
+lost its connection goes back to the queue once its lease expires, so
+throughput scales by starting more workers
+"""
+
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from bandwidth import parse_priority
+
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+LOST = 'lost'
+
+
+class LeaseLost(Exception):
+    """
+    Raised by a worker's progress hook to stop a job it no longer holds
+    
+    Unlike a cancellation, the partial files and the journal entry are left
+    alone: they belong to the worker that holds the job now.
+    """
+
+
+class JobQueue:
+    """
+    SQLite table of download jobs with leases
+    
+    A job goes queued -> running -> done/failed/cancelled. Claiming takes
+    the queue's write lock, so two workers never get the same job; a running
+    job whose lease is not renewed in time is queued again, until it has
+    been tried `max_attempts` times.
+    
+    The file uses SQLite's rollback journal rather than WAL, which needs
+    shared memory and so cannot work across machines; the filesystem must
+    support file locks (local disks do, NFS and SMB usually do).
+    """
+    
+    def __init__(self, path, max_attempts: int = 3):
+        """
+        Open (or create) a job queue
+        
+        Args:
+            path: SQLite database file shared by every worker
+            max_attempts: Times a job is started before an expired lease fails it
+        """
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False,
+                                     isolation_level=None, timeout=60)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                format TEXT NOT NULL,
+                quality TEXT NOT NULL,
+                playlist INTEGER NOT NULL,
+                priority INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_expires REAL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                elapsed REAL,
+                skipped INTEGER,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (priority DESC, id) WHERE state = 'queued';
+            CREATE INDEX IF NOT EXISTS jobs_leases ON jobs (lease_expires) WHERE state = 'running';
+        """)
+    
+    def _transaction(self):
+        """Begin a write transaction (BEGIN IMMEDIATE takes the file's write lock at once)"""
+        self._conn.execute("BEGIN IMMEDIATE")
+    
+    def enqueue(self, urls, mode: str = "audio", format: str = "mp3", quality: str = "best",
+                playlist: bool = False, priority="normal") -> list:
+        """
+        Add a job per URL, in one transaction
+        
+        Args:
+            priority: low, normal, high or a weight; higher priority jobs are claimed first
+        
+        Returns:
+            list: The new job ids
+        
+        Raises:
+            ValueError: If the mode or priority is invalid
+        """
+        if mode not in ("audio", "video"):
+            raise ValueError("'mode' must be 'audio' or 'video'")
+        weight = parse_priority(priority)
+        now = time.time()
+        ids = []
+        with self._lock:
+            self._transaction()
+            try:
+                for url in urls:
+                    cursor = self._conn.execute(
+                        "INSERT INTO jobs (url, mode, format, quality, playlist, priority, state, created) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (url, mode, format, quality, int(bool(playlist)), weight, QUEUED, now))
+                    ids.append(cursor.lastrowid)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+    
+    def claim(self, worker: str, lease: float):
+        """
+        Take the next queued job, highest priority first
+        
+        Jobs whose lease expired are queued again first (or failed, once
+        they used up their attempts, or cancelled, if that was requested).
+        
+        Returns:
+            dict: The job, now running under this worker's lease, or None if none is queued
+        """
+        now = time.time()
+        with self._lock:
+            self._transaction()
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET state = CASE WHEN cancel_requested THEN ? WHEN attempts >= ? THEN ? "
+                    "ELSE ? END, "
+                    "error = CASE WHEN cancel_requested THEN NULL "
+                    "WHEN attempts >= ? THEN 'Lease expired ' || attempts || ' time(s)' END, "
+                    "finished = CASE WHEN cancel_requested OR attempts >= ? THEN ? END, "
+                    "worker = NULL, lease_expires = NULL "
+                    "WHERE state = ? AND lease_expires < ?",
+                    (CANCELLED, self.max_attempts, FAILED, QUEUED, self.max_attempts, self.max_attempts, now,
+                     RUNNING, now))
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE state = ? ORDER BY priority DESC, id LIMIT 1",
+                    (QUEUED,)).fetchone()
+                job = None
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                        "started = ? WHERE id = ?",
+                        (RUNNING, worker, now + lease, now, row['id']))
+                    job = dict(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone())
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job
+    
+    def heartbeat(self, job_id: int, worker: str, lease: float) -> bool:
+        """
+        Renew a job's lease
+        
+        Returns:
+            bool: False if the worker no longer holds the job (its lease expired and
+                  it was claimed again) or the job was cancelled; the worker should stop it
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND state = ? "
+                "AND cancel_requested = 0",
+                (time.time() + lease, job_id, worker, RUNNING))
+        return cursor.rowcount == 1
+    
+    def finish(self, job_id: int, worker: str, result: dict) -> bool:
+        """
+        Record the outcome of a job (a MediaDownloader result dict)
+        
+        Returns:
+            bool: False if the worker no longer held the job, so nothing was recorded
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = CASE WHEN ? THEN ? WHEN cancel_requested THEN ? ELSE ? END, "
+                "finished = ?, elapsed = ?, skipped = ?, error = ?, lease_expires = NULL "
+                "WHERE id = ? AND worker = ? AND state = ?",
+                (bool(result.get('success')), DONE, CANCELLED, FAILED, time.time(), result.get('elapsed'),
+                 int(bool(result.get('skipped'))), result.get('error'), job_id, worker, RUNNING))
+        return cursor.rowcount == 1
+    
+    def release(self, job_id: int, worker: str):
+        """Hand a running job back to the queue without waiting for its lease to expire"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, lease_expires = NULL "
+                "WHERE id = ? AND worker = ? AND state = ?",
+                (QUEUED, job_id, worker, RUNNING))
+    
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancel a job: a queued one at once, a running one at its worker's next heartbeat
+        
+        Returns:
+            bool: False if the job is unknown or already finished
+        """
+        with self._lock:
+            self._transaction()
+            try:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET state = ?, finished = ? WHERE id = ? AND state = ?",
+                    (CANCELLED, time.time(), job_id, QUEUED))
+                if cursor.rowcount == 0:
+                    cursor = self._conn.execute(
+                        "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state = ?", (job_id, RUNNING))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cursor.rowcount == 1
+    
+    def get(self, job_id: int):
+        """Return a job as a dict, or None if it is unknown"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def stats(self) -> dict:
+        """Return the number of jobs per state, and how many running jobs have an expired lease"""
+        with self._lock:
+            counts = {state: count for state, count in
+                      self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")}
+            expired = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = ? AND lease_expires < ?",
+                (RUNNING, time.time())).fetchone()[0]
+        return dict(counts, expired=expired)
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+class QueueWorker:
+    """
+    Run jobs from a JobQueue on one MediaDownloader
+    
+    `threads` jobs run at a time. A heartbeat thread renews the lease of
+    every running job every third of the lease time. A cancelled job is
+    stopped at its next progress update and its partial files are removed;
+    a job whose lease was lost (or that was handed back) is stopped with
+    LeaseLost, keeping its files for the worker that takes it over, so it
+    is not downloaded twice.
+    """
+    
+    def __init__(self, downloader, queue: JobQueue, threads: int = 4, lease: float = 60.0,
+                 poll: float = 2.0, name: str = None):
+        """
+        Args:
+            downloader: MediaDownloader the jobs run on
+            queue: Shared job queue
+            threads: Jobs run at the same time
+            lease: Seconds a job stays claimed without a heartbeat
+            poll: Seconds between looks at an empty queue
+            name: Worker id recorded on claimed jobs (default: hostname-pid)
+        """
+        self.downloader = downloader
+        self.queue = queue
+        self.threads = max(1, threads)
+        self.lease = lease
+        self.poll = poll
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.counts = {DONE: 0, FAILED: 0, CANCELLED: 0, LOST: 0}
+        self._held = {}  # job id -> None while the job runs, or why it must stop (CANCELLED or LOST)
+        self._held_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads = []
+    
+    def run(self, until_empty: bool = False):
+        """
+        Work until stop() is called (or, with until_empty, until no job is queued)
+        
+        Returns:
+            dict: Jobs done, failed, cancelled and lost (taken over after a lease expired)
+        """
+        self._threads = [threading.Thread(target=self._work, args=(until_empty,), name=f"queue-worker-{i}",
+                                          daemon=True) for i in range(self.threads)]
+        for thread in self._threads:
+            thread.start()
+        threading.Thread(target=self._heartbeat, name="queue-heartbeat", daemon=True).start()
+        return self.wait()
+    
+    def wait(self):
+        """Wait for the worker threads to finish (e.g. after stop()) and return the counts"""
+        try:
+            for thread in self._threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        finally:
+            self._stopping.set()
+        return dict(self.counts)
+    
+    def stop(self):
+        """Take no new jobs; the running ones finish"""
+        self._stopping.set()
+    
+    def release(self):
+        """Give the running jobs back to the queue at once, e.g. before exiting without finishing them"""
+        self._stopping.set()
+        with self._held_lock:
+            held = list(self._held)
+        for job_id in held:
+            self._stop(job_id, LOST)
+            self.queue.release(job_id, self.name)
+    
+    def _stop(self, job_id: int, reason: str):
+        """Mark a running job to be stopped at its next progress update"""
+        with self._held_lock:
+            if job_id in self._held and self._held[job_id] is None:
+                self._held[job_id] = reason
+    
+    def _work(self, until_empty: bool):
+        while not self._stopping.is_set():
+            job = self.queue.claim(self.name, self.lease)
+            if job is None:
+                if until_empty:
+                    return
+                self._stopping.wait(self.poll)
+                continue
+            
+            with self._held_lock:
+                self._held[job['id']] = None
+            print(f"👷 {self.name} took job #{job['id']} (attempt {job['attempts']}): {job['url']}")
+            result = {'url': job['url'], 'success': False}
+            try:
+                self.downloader._run_job(result, job['mode'], job['format'], job['quality'],
+                                         allow_playlist=bool(job['playlist']), progress=self._progress(job['id']),
+                                         share=self.downloader._share(job['priority']))
+            finally:
+                with self._held_lock:
+                    del self._held[job['id']]
+            
+            if self.queue.finish(job['id'], self.name, result):
+                state = self.queue.get(job['id'])['state']
+                self.counts[state] += 1
+            else:
+                # Another worker holds it now (or it was handed back); its outcome counts there
+                self.counts[LOST] += 1
+    
+    def _progress(self, job_id: int):
+        from yt_dlp.utils import DownloadCancelled
+        
+        def hook(d):
+            reason = self._held.get(job_id)
+            if reason == CANCELLED:
+                raise DownloadCancelled('Job cancelled')
+            if reason == LOST:
+                raise LeaseLost(f'Job #{job_id} is held by another worker now')
+        return hook
+    
+    def _heartbeat(self):
+        """Renew the leases of running jobs until the worker stops and has none left"""
+        while True:
+            with self._held_lock:
+                held = [job_id for job_id, reason in self._held.items() if reason is None]
+                running = bool(self._held)
+            if not running and self._stopping.is_set():
+                return
+            for job_id in held:
+                try:
+                    if not self.queue.heartbeat(job_id, self.name, self.lease):
+                        job = self.queue.get(job_id)
+                        cancelled = (job and job['cancel_requested'] and job['worker'] == self.name
+                                     and job['state'] == RUNNING)
+                        self._stop(job_id, CANCELLED if cancelled else LOST)
+                except sqlite3.Error as e:
+                    # A busy or unreachable queue: try again; the lease has slack for that
+                    print(f"⚠️  Heartbeat failed for job #{job_id}: {e}", file=sys.stderr)
+            time.sleep(self.lease / 3)
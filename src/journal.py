@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Download journal - Per-job checkpoints for resuming interrupted downloads
+Each job records the resolved media info and how far it got, so a restarted
+downloader continues the partial file or the pending conversion instead of
+starting over
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+
+DOWNLOAD, TRANSCODE = 'download', 'transcode'
+
+# Query parameters that carry a unix expiry time in signed media URLs
+EXPIRY_PARAMS = ('expire', 'expires', 'Expires')
+
+
+def stream_expired(info: dict, margin: float = 300) -> bool:
+    """
+    Check whether the resolved media URLs of an info dict have expired
+
+    Signed URLs (e.g. YouTube's googlevideo links) carry their expiry time
+    in the query string; URLs without one are assumed to stay valid.
+
+    Args:
+        info: Resolved (processed) info dict
+        margin: Seconds before the expiry time from which a URL counts as expired
+    """
+    deadline = time.time() + margin
+    for fmt in info.get('requested_formats') or [info]:
+        query = parse_qs(urlparse(fmt.get('url') or '').query)
+        for name in EXPIRY_PARAMS:
+            try:
+                if query.get(name) and int(query[name][0]) < deadline:
+                    return True
+            except ValueError:
+                continue
+    return False
+
+
+class DownloadJournal:
+    """Directory of per-job checkpoint files"""
+
+    def __init__(self, directory):
+        """
+        Open (or create) a journal directory
+
+        Args:
+            directory: Directory holding one JSON file per unfinished job
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def job_id(mode: str, profile: str, url: str) -> str:
+        """Return the id of the job downloading `url` with a given output profile"""
+        return hashlib.sha1(f"{mode}\n{profile}\n{url}".encode("utf-8")).hexdigest()[:20]
+
+    def _path(self, job: str) -> Path:
+        return self.directory / f"{job}.json"
+
+    def get(self, job: str):
+        """
+        Read a job's checkpoint
+
+        Returns:
+            dict: The stored record, or None if the job is unknown or unreadable
+        """
+        try:
+            with open(self._path(job), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, job: str, record: dict):
+        """Write a job's checkpoint atomically, so a crash never leaves it half written"""
+        record = dict(record, updated=time.time())
+        path = self._path(job)
+        temp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+
+    def update(self, job: str, **fields):
+        """Merge fields into an existing checkpoint"""
+        with self._lock:
+            record = self.get(job)
+            if record is not None:
+                record.update(fields)
+                self.save(job, record)
+
+    def finish(self, job: str):
+        """Drop the checkpoint of a completed job"""
+        try:
+            self._path(job).unlink()
+        except FileNotFoundError:
+            pass
+
+    def pending(self) -> list:
+        """Return the records of all unfinished jobs, oldest first"""
+        records = []
+        for path in self.directory.glob("*.json"):
+            record = self.get(path.stem)
+            if record is not None:
+                records.append(dict(record, job=path.stem))
+        return sorted(records, key=lambda record: record.get('started', 0))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Media info - Compact records projected from yt-dlp info dicts
+A full info dict carries every format, thumbnail and subtitle; a MediaInfo
+keeps the dozen fields callers actually show, in a slotted object, so long
+listings can be held or streamed without the per-entry overhead
+"""
+
+
+def estimate_size(info: dict):
+    """Return the expected download size in bytes from an info dict, or None"""
+    formats = info.get('requested_formats') or [info]
+    sizes = [fmt.get('filesize') or fmt.get('filesize_approx') for fmt in formats]
+    if all(sizes):
+        return sum(sizes)
+    if info.get('duration') and info.get('tbr'):
+        return info['duration'] * info['tbr'] * 1000 / 8
+    return None
+
+
+def unsmuggled(url):
+    """Drop the data yt-dlp smuggles into URL fragments for its own extractors"""
+    return url.split('#__youtubedl_smuggle=')[0] if url else url
+
+
+class MediaInfo:
+    """One media item (or playlist) as a small, fixed set of fields"""
+    
+    __slots__ = ('id', 'title', 'uploader', 'duration', 'url', 'extractor', 'upload_date',
+                 'view_count', 'filesize', 'description', 'playlist_index', 'playlist_count')
+    
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+    
+    @classmethod
+    def from_info(cls, info: dict, playlist_index: int = None) -> "MediaInfo":
+        """
+        Project a (full or flat) yt-dlp info dict
+        
+        Args:
+            info: Info dict from extract_info or a flat playlist entry
+            playlist_index: Position in the playlist being listed, if any
+        """
+        count = None
+        if info.get('_type') in ('playlist', 'multi_video'):
+            entries = info.get('entries')
+            count = info.get('playlist_count') or (len(entries) if isinstance(entries, list) else None)
+        return cls(
+            id=info.get('id'),
+            title=info.get('title'),
+            uploader=info.get('uploader') or info.get('channel'),
+            duration=info.get('duration'),
+            url=unsmuggled(info.get('webpage_url') or info.get('url')),
+            extractor=info.get('extractor_key') or info.get('ie_key'),
+            upload_date=info.get('upload_date'),
+            view_count=info.get('view_count'),
+            filesize=estimate_size(info),
+            description=info.get('description'),
+            playlist_index=playlist_index or info.get('playlist_index'),
+            playlist_count=count,
+        )
+    
+    def to_dict(self) -> dict:
+        """Return the fields as a dict (JSON-serialisable)"""
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    def __repr__(self):
+        return f"MediaInfo(id={self.id!r}, title={self.title!r})"
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Metrics - Progress, throughput and stage timings for downloads
+Fed by yt-dlp progress/postprocessor hooks and by the downloader's own
+stages; readable as a JSON-lines event stream or a Prometheus text snapshot
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+STAGES = ('extract', 'download', 'postprocess', 'transcode')
+
+
+class JsonLinesWriter:
+    """Event listener that writes each event as one JSON line to a stream"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+    
+    def __call__(self, event: dict):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class Metrics:
+    """
+    Thread-safe metrics for a MediaDownloader
+    
+    Tracks finished jobs, downloaded bytes, the current throughput of active
+    downloads, per-stage timings (extract, download, postprocess, transcode)
+    and failures. Every change is also reported to the listener as an event
+    dict with an 'event' name and a 'time' stamp.
+    """
+    
+    def __init__(self, listener=None, path=None, progress_interval: float = 0.5):
+        """
+        Args:
+            listener: Optional callable receiving every event dict
+            path: Optional file the Prometheus snapshot is written to after
+                  every job and on close (e.g. for a textfile collector)
+            progress_interval: Minimum seconds between progress events per file
+        """
+        self.listener = listener
+        self.path = path
+        self.progress_interval = progress_interval
+        self.started = time.time()
+        self.bytes_downloaded = 0
+        self.jobs = {}  # (mode, result) -> count
+        self.failures = {}  # stage -> count
+        self.stages = {stage: [0, 0.0, 0.0] for stage in STAGES}  # stage -> [count, sum, max]
+        self._active = {}  # file -> {'downloaded', 'total', 'speed', 'eta', 'reported'}
+        self._postprocessing = {}  # (postprocessor, id, thread) -> start time
+        self._lock = threading.Lock()
+    
+    def emit(self, event: str, **fields):
+        """Send an event to the listener"""
+        if self.listener is not None:
+            self.listener(dict(fields, event=event, time=time.time()))
+    
+    def record_stage(self, stage: str, seconds: float, **fields):
+        """Add one timing to a stage"""
+        with self._lock:
+            timing = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+        self.emit('stage', stage=stage, seconds=round(seconds, 6), **fields)
+    
+    def record_failure(self, stage: str, error, **fields):
+        """Count a failure in a stage"""
+        with self._lock:
+            self.failures[stage] = self.failures.get(stage, 0) + 1
+        self.emit('failure', stage=stage, error=str(error), **fields)
+    
+    @contextmanager
+    def stage(self, stage: str, timed: bool = True, **fields):
+        """
+        Time a block as one run of a stage, counting exceptions as failures
+        
+        With timed=False only failures are recorded, for blocks whose timing
+        comes from hooks instead.
+        """
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.record_failure(stage, e, **fields)
+            raise
+        if timed:
+            self.record_stage(stage, time.monotonic() - started, **fields)
+    
+    @contextmanager
+    def job(self, url: str, mode: str):
+        """
+        Track one download job from start to finish
+        
+        Yields:
+            dict: Set 'skipped' to True in it when the job did not download anything
+        """
+        job = {'skipped': False}
+        started = time.monotonic()
+        self.emit('job_start', url=url, mode=mode)
+        try:
+            yield job
+        except Exception as e:
+            self._finish_job(url, mode, 'failed', started, error=str(e))
+            raise
+        self._finish_job(url, mode, 'skipped' if job['skipped'] else 'success', started)
+    
+    def _finish_job(self, url: str, mode: str, result: str, started: float, **fields):
+        with self._lock:
+            self.jobs[(mode, result)] = self.jobs.get((mode, result), 0) + 1
+        self.emit('job_end', url=url, mode=mode, result=result,
+                  elapsed=round(time.monotonic() - started, 6), **fields)
+        if self.path:
+            self.write_prometheus(self.path)
+    
+    def progress_hook(self, d: dict):
+        """yt-dlp progress hook"""
+        file = d.get('filename')
+        info = d.get('info_dict') or {}
+        now = time.time()
+        with self._lock:
+            state = self._active.setdefault(file, {'downloaded': 0, 'reported': 0.0})
+            downloaded = d.get('downloaded_bytes') or 0
+            if downloaded > state['downloaded']:
+                self.bytes_downloaded += downloaded - state['downloaded']
+            state.update(downloaded=downloaded,
+                         total=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                         speed=d.get('speed'), eta=d.get('eta'))
+            report = d['status'] != 'downloading' or now - state['reported'] >= self.progress_interval
+            if report:
+                state['reported'] = now
+            if d['status'] != 'downloading':
+                del self._active[file]
+        
+        if d['status'] == 'finished':
+            if d.get('elapsed') is not None:
+                self.record_stage('download', d['elapsed'], file=d.get('filename'), id=info.get('id'))
+        elif report:
+            self.emit('progress', file=d.get('filename'), id=info.get('id'),
+                      downloaded_bytes=downloaded, total_bytes=state['total'],
+                      speed=state['speed'], eta=state['eta'])
+    
+    def postprocessor_hook(self, d: dict):
+        """yt-dlp postprocessor hook"""
+        info = d.get('info_dict') or {}
+        key = (d.get('postprocessor'), info.get('id'), threading.get_ident())
+        if d['status'] == 'started':
+            with self._lock:
+                self._postprocessing[key] = time.monotonic()
+        elif d['status'] == 'finished':
+            with self._lock:
+                started = self._postprocessing.pop(key, None)
+            if started is not None:
+                self.record_stage('postprocess', time.monotonic() - started,
+                                  postprocessor=d.get('postprocessor'), id=info.get('id'))
+    
+    def snapshot(self) -> dict:
+        """Return the current metrics as a plain dict"""
+        with self._lock:
+            return {
+                'uptime': time.time() - self.started,
+                'bytes_downloaded': self.bytes_downloaded,
+                'active_downloads': len(self._active),
+                'speed': sum(state.get('speed') or 0 for state in self._active.values()),
+                'jobs': {f"{mode}:{result}": count for (mode, result), count in self.jobs.items()},
+                'failures': dict(self.failures),
+                'stages': {stage: {'count': count, 'seconds': total, 'max': longest}
+                           for stage, (count, total, longest) in self.stages.items()},
+            }
+    
+    def prometheus(self, prefix: str = "media_downloader") -> str:
+        """Render the current metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        with self._lock:
+            jobs = dict(self.jobs)
+        lines = []
+        
+        def metric(name, kind, help, samples):
+            lines.append(f"# HELP {prefix}_{name} {help}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                label = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{prefix}_{name}{{{label}}} {value}" if label else f"{prefix}_{name} {value}")
+        
+        metric("jobs_total", "counter", "Finished download jobs by mode and result",
+               [({'mode': mode, 'result': result}, count) for (mode, result), count in sorted(jobs.items())])
+        metric("failures_total", "counter", "Failures by stage",
+               [({'stage': stage}, count) for stage, count in sorted(snapshot['failures'].items())])
+        metric("downloaded_bytes_total", "counter", "Bytes downloaded",
+               [({}, snapshot['bytes_downloaded'])])
+        metric("active_downloads", "gauge", "Files currently downloading",
+               [({}, snapshot['active_downloads'])])
+        metric("download_speed_bytes", "gauge", "Combined speed of active downloads in bytes per second",
+               [({}, round(snapshot['speed'], 3))])
+        stages = snapshot['stages']
+        lines.append(f"# HELP {prefix}_stage_seconds Time spent per stage")
+        lines.append(f"# TYPE {prefix}_stage_seconds summary")
+        for stage, timing in stages.items():
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {round(timing["seconds"], 6)}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {timing["count"]}')
+        metric("stage_seconds_max", "gauge", "Longest single run per stage",
+               [({'stage': stage}, round(stages[stage]['max'], 6)) for stage in stages])
+        metric("uptime_seconds", "gauge", "Seconds since the downloader started",
+               [({}, round(snapshot['uptime'], 3))])
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path):
+        """Write the Prometheus snapshot to a file atomically"""
+        path = Path(path)
+        temp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temp.write_text(self.prometheus(), encoding="utf-8")
+        os.replace(temp, path)
+    
+    def close(self):
+        """Write the final snapshot, if a snapshot file is configured"""
+        if self.path:
+            self.write_prometheus(self.path)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Retries - Error classification, jittered backoff and per-host circuit breakers
+Transient failures (dropped connections, 5xx) and throttling (429) are retried
+with exponential backoff that honours Retry-After; permanent ones (404, removed
+media, bad formats) fail at once. A host that keeps failing is cut off for a
+cool-down, so its jobs stop hammering it and stop holding worker slots.
+"""
+
+import email.utils
+import random
+import re
+import threading
+import time
+
+
+TRANSIENT, THROTTLED, PERMANENT = 'transient', 'throttled', 'permanent'
+
+# Phrases of errors that carry no usable exception type (e.g. only a message from yt-dlp)
+TRANSIENT_PATTERNS = re.compile(
+    r'timed? ?out|connection (?:reset|refused|aborted)|remote end closed|temporary failure|'
+    r'incomplete ?read|broken pipe|network is unreachable|name resolution|EOF occurred',
+    re.IGNORECASE)
+HTTP_STATUS = re.compile(r'HTTP Error (\d{3})')
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a host whose circuit breaker is open"""
+    
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"{host} is failing, paused for {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def causes(error: BaseException):
+    """Yield an error and everything it wraps (yt-dlp exc_info and cause, __cause__, __context__)"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        wrapped = exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None
+        error = wrapped or getattr(error, 'cause', None) or error.__cause__ or error.__context__
+
+
+def http_status(error: BaseException):
+    """Return the HTTP status behind an error, or None"""
+    for cause in causes(error):
+        status = getattr(cause, 'status', None)
+        if isinstance(status, int):
+            return status
+        match = HTTP_STATUS.search(str(cause))
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def classify(error: BaseException) -> str:
+    """
+    Decide whether an error is worth retrying
+    
+    Returns:
+        str: THROTTLED (HTTP 429), TRANSIENT (connection problems, timeouts,
+             HTTP 408/5xx) or PERMANENT (everything else, including
+             cancellations, conversion failures and extractor errors the
+             site reported as expected, e.g. removed or private media)
+    """
+    from yt_dlp.utils import DownloadCancelled
+    
+    status = http_status(error)
+    if status == 429:
+        return THROTTLED
+    if status is not None:
+        return TRANSIENT if status == 408 or status >= 500 else PERMANENT
+    
+    from yt_dlp.networking.exceptions import TransportError
+    
+    for cause in causes(error):
+        if isinstance(cause, DownloadCancelled) or getattr(cause, 'expected', False):
+            return PERMANENT
+        if isinstance(cause, (TransportError, ConnectionError, TimeoutError)):
+            return TRANSIENT
+    return TRANSIENT if TRANSIENT_PATTERNS.search(str(error)) else PERMANENT
+
+
+def retry_after(error: BaseException):
+    """Return the seconds a server asked to wait (Retry-After), or None"""
+    for cause in causes(error):
+        response = getattr(cause, 'response', None)
+        headers = getattr(response, 'headers', None) or getattr(cause, 'headers', None)
+        value = headers.get('Retry-After') if headers else None
+        if not value:
+            continue
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+class CircuitBreaker:
+    """
+    Per-host failure counter that pauses a host after repeated failures
+    
+    After `threshold` retryable failures in a row a host is open (calls are
+    refused with CircuitOpen) for `cooldown` seconds; then one call is let
+    through, and its success closes the circuit while its failure opens it
+    again for twice as long (up to `max_cooldown`).
+    """
+    
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0, max_cooldown: float = 600.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._hosts = {}  # host -> {'failures', 'opened', 'cooldown', 'probing'}
+        self._lock = threading.Lock()
+    
+    def before(self, host: str):
+        """
+        Check that a call to the host may go ahead
+        
+        Raises:
+            CircuitOpen: While the host is paused, or while another call probes it
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state['opened'] is None:
+                return
+            remaining = state['opened'] + state['cooldown'] - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpen(host, remaining)
+            if state['probing']:
+                raise CircuitOpen(host, min(state['cooldown'], 1.0))
+            state['probing'] = True
+    
+    def abandon(self, host: str):
+        """Give up a call that neither succeeded nor failed (e.g. interrupted), so another may probe the host"""
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is not None:
+                state['probing'] = False
+    
+    def success(self, host: str):
+        """Record a successful call, closing the host's circuit"""
+        with self._lock:
+            self._hosts.pop(host, None)
+    
+    def failure(self, host: str):
+        """Record a retryable failure; returns True if the circuit is (now) open"""
+        with self._lock:
+            state = self._hosts.setdefault(host, {'failures': 0, 'opened': None, 'cooldown': self.cooldown,
+                                                  'probing': False})
+            state['failures'] += 1
+            if state['probing']:
+                # The trial call failed: pause again, for longer
+                state['cooldown'] = min(state['cooldown'] * 2, self.max_cooldown)
+                state['opened'] = time.monotonic()
+                state['probing'] = False
+            elif state['opened'] is None and state['failures'] >= self.threshold:
+                state['opened'] = time.monotonic()
+            return state['opened'] is not None
+    
+    def snapshot(self) -> dict:
+        """Return the hosts that are currently failing, with their failure counts and whether they are open"""
+        with self._lock:
+            return {host: {'failures': state['failures'], 'open': state['opened'] is not None}
+                    for host, state in self._hosts.items()}
+
+
+class Retrier:
+    """Run operations with retries, backoff and a circuit breaker per host"""
+    
+    def __init__(self, retries: int = 3, base_delay: float = 1.0, max_delay: float = 60.0,
+                 breaker: CircuitBreaker = None, on_retry=None):
+        """
+        Args:
+            retries: Extra attempts after the first one (0 disables retrying)
+            base_delay: Backoff before the first retry; doubles with every attempt
+            max_delay: Longest wait between attempts, also when Retry-After asks for more
+            breaker: Circuit breaker shared by the operations (default: a new one)
+            on_retry: Optional callable(host, attempt, delay, error, kind) before each wait
+        """
+        self.retries = max(0, retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.on_retry = on_retry
+    
+    def delay(self, attempt: int, error: BaseException = None) -> float:
+        """Seconds to wait before retry number `attempt` (1-based): full jitter, or the server's Retry-After"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        asked = retry_after(error) if error is not None else None
+        if asked is not None:
+            return min(self.max_delay, max(asked, backoff))
+        return backoff
+    
+    def call(self, host: str, func, *args, **kwargs):
+        """
+        Call func(*args, **kwargs), retrying transient and throttled failures
+        
+        Raises:
+            CircuitOpen: If the host is paused; the call fails at once instead of
+                         holding its worker while other hosts could use it
+            The last error once it is permanent or the attempts are used up
+        """
+        attempt = 0
+        while True:
+            self.breaker.before(host)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                error, kind = e, classify(e)
+                if kind == PERMANENT:
+                    # The host answered (or the failure was not about it)
+                    self.breaker.success(host)
+                    raise
+                self.breaker.failure(host)
+            except BaseException:
+                # Interrupted (Ctrl+C, worker exit): a probe must not keep the host blocked
+                self.breaker.abandon(host)
+                raise
+            else:
+                self.breaker.success(host)
+                return result
+            
+            attempt += 1
+            if attempt > self.retries:
+                raise error
+            wait = self.delay(attempt, error)
+            if self.on_retry is not None:
+                self.on_retry(host, attempt, wait, error, kind)
+            time.sleep(wait)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Segmented downloads - Fetch one large HTTP file over several connections
+Range-capable direct files are split into fixed-size byte ranges that are
+downloaded in parallel; everything else is left to yt-dlp's own downloaders
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import yt_dlp
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.utils import DownloadError
+
+
+DEFAULT_CHUNK_SIZE = 10 * 1024 * 1024
+BLOCK_SIZE = 256 * 1024
+
+
+def plan_segments(total: int, chunk_size: int) -> list:
+    """
+    Split a file into byte ranges
+    
+    Returns:
+        list: Inclusive (start, end) offsets covering `total` bytes
+    """
+    return [(start, min(start + chunk_size, total) - 1) for start in range(0, total, chunk_size)]
+
+
+class SegmentedHttpFD(FileDownloader):
+    """
+    Download a direct HTTP file as parallel byte ranges
+    
+    Uses `concurrent_fragment_downloads` connections and `http_chunk_size`
+    byte segments. Finished segments are listed in a map next to the .part
+    file, so an interrupted download resumes with the missing ones only.
+    Servers that do not answer a range request with 206, and files too
+    small to split, go through the regular HttpFD instead.
+    """
+    
+    def real_download(self, filename, info_dict):
+        connections = self.params.get('concurrent_fragment_downloads') or 1
+        chunk_size = self.params.get('http_chunk_size') or DEFAULT_CHUNK_SIZE
+        tmpfilename = self.temp_name(filename)
+        mapfile = tmpfilename + '.segments'
+        total = self._probe(info_dict) if connections > 1 else None
+        if not total or total < 2 * chunk_size:
+            if os.path.exists(mapfile):
+                # A preallocated segmented .part would look complete to HttpFD
+                self.try_remove(tmpfilename)
+                self.try_remove(mapfile)
+            return self._fallback(filename, info_dict)
+        
+        segments = plan_segments(total, chunk_size)
+        done = self._load_map(mapfile, tmpfilename, total, chunk_size)
+        todo = [segment for segment in segments if segment[0] not in done]
+        self.report_destination(filename)
+        if done:
+            self.to_screen(f'[download] Resuming with {len(segments) - len(todo)} of '
+                           f'{len(segments)} segments already on disk')
+        else:
+            with open(tmpfilename, 'wb') as f:
+                f.truncate(total)
+        self.to_screen(f'[download] Fetching {len(todo)} segments over '
+                       f'{min(connections, len(todo))} connections')
+        
+        state = {'downloaded': sum(end - start + 1 for start, end in segments if start in done),
+                 'reported': 0.0, 'start': time.time()}
+        lock = threading.Lock()
+        failed = threading.Event()
+        
+        def progress(count):
+            with lock:
+                state['downloaded'] += count
+                downloaded = state['downloaded']
+                now = time.time()
+                if now - state['reported'] < 0.5 and downloaded < total:
+                    return
+                state['reported'] = now
+            speed = self.calc_speed(state['start'], now, downloaded)
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'tmpfilename': tmpfilename,
+                'filename': filename,
+                'eta': self.calc_eta(speed, total - downloaded),
+                'speed': speed,
+                'elapsed': now - state['start'],
+            }, info_dict)
+            self.slow_down(state['start'], now, downloaded)
+        
+        def fetch(segment):
+            retries = self.params.get('retries', 10)
+            for count in range(retries + 1):
+                if failed.is_set():
+                    return
+                written = [0]
+                
+                def on_block(size):
+                    written[0] += size
+                    progress(size)
+                
+                try:
+                    self._fetch_segment(info_dict, tmpfilename, segment, on_block, failed)
+                    if not failed.is_set():
+                        with lock:
+                            done.add(segment[0])
+                            self._save_map(mapfile, total, chunk_size, done)
+                    return
+                except (TransportError, OSError, DownloadError) as err:
+                    # The retry fetches the whole range again
+                    progress(-written[0])
+                    if count == retries:
+                        failed.set()
+                        raise
+                    self.report_retry(err, count + 1, retries, frag_index=segment[0] // chunk_size + 1)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(connections, len(todo))),
+                                    thread_name_prefix='segment') as pool:
+                for future in [pool.submit(fetch, segment) for segment in todo]:
+                    future.result()
+        except (TransportError, OSError, DownloadError) as err:
+            # The .part file and its segment map are kept for the next attempt
+            self.report_error(f'Unable to download segment: {err}')
+            return False
+        except BaseException:
+            failed.set()
+            raise
+        
+        self.try_rename(tmpfilename, filename)
+        self.try_remove(mapfile)
+        self._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': total,
+            'total_bytes': total,
+            'filename': filename,
+            'elapsed': time.time() - state['start'],
+        }, info_dict)
+        return True
+    
+    def _load_map(self, mapfile, tmpfilename, total: int, chunk_size: int) -> set:
+        """Return the start offsets of segments an earlier attempt finished"""
+        if not self.params.get('continuedl', True):
+            return set()
+        try:
+            with open(mapfile, encoding='utf-8') as f:
+                state = json.load(f)
+            if (state['total'], state['chunk_size']) != (total, chunk_size) \
+                    or os.path.getsize(tmpfilename) != total:
+                return set()
+            return set(state['done'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return set()
+    
+    @staticmethod
+    def _save_map(mapfile, total: int, chunk_size: int, done: set):
+        """Record finished segments so an interrupted download can resume"""
+        temp = mapfile + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({'total': total, 'chunk_size': chunk_size, 'done': sorted(done)}, f)
+        os.replace(temp, mapfile)
+    
+    def _request(self, info_dict, start: int, end: int):
+        """Open a range request for the media URL"""
+        headers = dict(info_dict.get('http_headers') or {})
+        headers['Range'] = f'bytes={start}-{end}'
+        return self.ydl.urlopen(Request(info_dict['url'], headers=headers))
+    
+    def _probe(self, info_dict):
+        """Return the file size if the server honours range requests, else None"""
+        try:
+            response = self._request(info_dict, 0, 0)
+        except (HTTPError, TransportError):
+            return None
+        try:
+            match = re.match(r'bytes 0-0/(\d+)', response.headers.get('Content-Range') or '')
+            return int(match.group(1)) if response.status == 206 and match else None
+        finally:
+            response.close()
+    
+    def _fetch_segment(self, info_dict, tmpfilename, segment, on_block, failed):
+        """Download one byte range into its place in the temporary file"""
+        start, end = segment
+        length = end - start + 1
+        written = 0
+        response = self._request(info_dict, start, end)
+        try:
+            if response.status != 206:
+                raise DownloadError(f'Server ignored the range request for bytes {start}-{end}')
+            with open(tmpfilename, 'r+b') as f:
+                f.seek(start)
+                while written < length and not failed.is_set():
+                    block = response.read(min(BLOCK_SIZE, length - written))
+                    if not block:
+                        break
+                    f.write(block)
+                    written += len(block)
+                    on_block(len(block))
+        finally:
+            response.close()
+        if written != length and not failed.is_set():
+            raise TransportError(f'Segment {start}-{end} ended after {written} bytes')
+    
+    def _fallback(self, filename, info_dict):
+        """Download with the regular single-connection HTTP downloader"""
+        fd = HttpFD(self.ydl, self.params)
+        for ph in self._progress_hooks:
+            if ph != self.report_progress:
+                fd.add_progress_hook(ph)
+        return fd.real_download(filename, info_dict)
+
+
+class SegmentedYoutubeDL(yt_dlp.YoutubeDL):
+    """
+    YoutubeDL that sends direct HTTP downloads through SegmentedHttpFD
+    
+    Only used when more than one connection is allowed; fragmented formats
+    (DASH/HLS), external downloaders, streaming to stdout and subtitles keep
+    yt-dlp's default handling.
+    """
+    
+    def dl(self, name, info, subtitle=False, test=False):
+        if (test or subtitle or name == '-' or not info.get('url')
+                or (self.params.get('concurrent_fragment_downloads') or 1) < 2
+                or info.get('is_live') or info.get('impersonate') is not None
+                or get_suitable_downloader(dict(info), self.params) is not HttpFD):
+            return super().dl(name, info, subtitle=subtitle, test=test)
+        
+        fd = SegmentedHttpFD(self, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Download server - A resident MediaDownloader behind a local JSON API
+Jobs are submitted over HTTP on a local TCP port or a Unix socket, queued in
+a bounded queue and run by a fixed pool of worker threads that share one warm
+downloader, so callers pay for Python, yt-dlp and extractor setup only once
+"""
+
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from yt_dlp.utils import DownloadCancelled
+
+from bandwidth import parse_priority
+from downloader import MediaDownloader, warm_up
+from transcode import MIME_TYPES, TranscodeError, parse_formats
+
+
+QUEUED, RUNNING, CONVERTING, DONE, FAILED, CANCELLED = \
+    'queued', 'running', 'converting', 'done', 'failed', 'cancelled'
+
+MAX_BODY = 4 * 1024 * 1024
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class JobCancelled(DownloadCancelled):
+    """Raised from the progress hook of a job that was cancelled while downloading"""
+    msg = 'Cancelled by request'
+
+
+class DownloadService:
+    """
+    Bounded job queue and worker pool around one MediaDownloader
+    
+    Job records are plain dicts; the state goes queued -> running ->
+    (converting ->) done/failed/cancelled. Audio conversions run on the
+    downloader's Transcoder, so a worker takes the next job as soon as its
+    download is on disk. Finished jobs are kept for status and result
+    queries until `keep_finished` newer ones have finished.
+    """
+    
+    def __init__(self, downloader: MediaDownloader, workers: int = 4, max_queued: int = 1000,
+                 keep_finished: int = 10000):
+        """
+        Args:
+            downloader: The downloader jobs are run on
+            workers: Concurrent downloads
+            max_queued: Jobs waiting for a worker before submissions are refused
+            keep_finished: Finished jobs remembered for status and results
+        """
+        self.downloader = downloader
+        self.keep_finished = keep_finished
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self._workers = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+    
+    def submit(self, url: str, mode: str = "audio", format: str = "mp3", quality: str = "best",
+               playlist: bool = False, priority=None) -> dict:
+        """
+        Queue a download
+        
+        Returns:
+            dict: The new job record
+        
+        Raises:
+            ValueError: If the job description is invalid
+            QueueFull: If the queue is at capacity
+        """
+        if not isinstance(url, str) or not url:
+            raise ValueError("'url' is required")
+        if mode not in ("audio", "video"):
+            raise ValueError("'mode' must be 'audio' or 'video'")
+        if mode == "audio":
+            if not isinstance(format, str) and not (
+                    isinstance(format, list) and all(isinstance(name, str) for name in format)):
+                raise ValueError("'format' must be a string or a list of formats")
+            try:
+                parse_formats(format)
+            except TranscodeError as e:
+                raise ValueError(str(e))
+        if priority is not None:
+            parse_priority(priority)
+        job = {
+            'id': uuid.uuid4().hex,
+            'url': url,
+            'mode': mode,
+            'format': format,
+            'quality': quality,
+            'playlist': bool(playlist),
+            'priority': priority,
+            'state': QUEUED,
+            'created': time.time(),
+            'progress': None,
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+        try:
+            self._queue.put_nowait(job['id'])
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job['id']]
+            raise QueueFull(f"Queue is full ({self._queue.maxsize} jobs waiting)")
+        return dict(job)
+    
+    def status(self, job_id: str):
+        """Return a copy of a job record, or None if the job is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+    
+    def list(self, state: str = None) -> list:
+        """Return copies of all known jobs, optionally only those in one state"""
+        with self._lock:
+            return [dict(job) for job in self._jobs.values() if state is None or job['state'] == state]
+    
+    def results(self, drain: bool = False) -> list:
+        """
+        Return the finished jobs, oldest first
+        
+        Args:
+            drain: If True, forget the returned jobs (for a poller collecting results)
+        """
+        with self._lock:
+            finished = [dict(self._jobs[job_id]) for job_id in self._finished]
+            if drain:
+                for job_id in self._finished:
+                    del self._jobs[job_id]
+                self._finished.clear()
+        return finished
+    
+    def cancel(self, job_id: str):
+        """
+        Cancel a job
+        
+        A queued job is dropped immediately; a running download stops at its
+        next progress update and its partial files are removed. Conversions
+        that already started are left to finish.
+        
+        Returns:
+            dict: The job record, or None if the job is unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job['state'] == QUEUED:
+                self._finish(job, CANCELLED)
+            elif job['state'] == RUNNING:
+                self._cancelled.add(job_id)
+                job['cancel_requested'] = True
+            return dict(job)
+    
+    def stats(self) -> dict:
+        """Return the number of jobs per state and the hosts that are failing"""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['state']] = counts.get(job['state'], 0) + 1
+        return {'queued': self._queue.qsize(), 'workers': len(self._workers), 'jobs': counts,
+                'hosts': self.downloader.retry.breaker.snapshot()}
+    
+    def close(self) -> int:
+        """
+        Stop the workers after their current download
+        
+        Returns:
+            int: Number of queued jobs that were dropped
+        """
+        dropped = 0
+        while True:
+            try:
+                job_id = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job and job['state'] == QUEUED:
+                    self._finish(job, CANCELLED)
+                    dropped += 1
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        return dropped
+    
+    def _finish(self, job: dict, state: str, **fields):
+        """Move a job to a final state (called with the lock held)"""
+        job.update(fields, state=state, finished=time.time())
+        self._cancelled.discard(job['id'])
+        self._finished[job['id']] = None
+        while len(self._finished) > self.keep_finished:
+            old, _ = self._finished.popitem(last=False)
+            del self._jobs[old]
+    
+    def _progress(self, job: dict):
+        """Progress hook of one job: keeps its progress current and stops it when cancelled"""
+        def hook(d):
+            if job['id'] in self._cancelled:
+                raise JobCancelled()
+            job['progress'] = {
+                'downloaded_bytes': d.get('downloaded_bytes'),
+                'total_bytes': d.get('total_bytes') or d.get('total_bytes_estimate'),
+                'speed': d.get('speed'),
+                'eta': d.get('eta'),
+            }
+        return hook
+    
+    def _work(self):
+        """Worker loop: run queued jobs until a None sentinel arrives"""
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job['state'] != QUEUED:
+                    continue
+                job.update(state=RUNNING, started=time.time())
+            
+            result = {'url': job['url'], 'success': False}
+            self.downloader._run_job(result, job['mode'], job['format'], job['quality'],
+                                     allow_playlist=job['playlist'], pipelined=True,
+                                     progress=self._progress(job),
+                                     share=self.downloader._share(job['priority']))
+            transcoding = result.pop('transcoding', None)
+            if transcoding is None:
+                self._complete(job, result)
+                continue
+            with self._lock:
+                job['state'] = CONVERTING
+            
+            def converted(future, job=job, result=result, started=time.monotonic() - result['elapsed']):
+                MediaDownloader._finish_transcode(result, started, future)
+                self._complete(job, result)
+            
+            transcoding.add_done_callback(converted)
+    
+    def _complete(self, job: dict, result: dict):
+        """Record the outcome of a job's download (and conversion)"""
+        with self._lock:
+            fields = {'elapsed': result.get('elapsed'), 'skipped': result.get('skipped', False)}
+            if result.get('outputs') is not None:
+                fields['outputs'] = [{'path': output['path'], 'format': output['format'],
+                                      'action': output['action']} for output in result['outputs']]
+            if result['success']:
+                self._finish(job, DONE, **fields)
+            elif job['id'] in self._cancelled:
+                self._finish(job, CANCELLED, **fields)
+            else:
+                self._finish(job, FAILED, error=result.get('error'), **fields)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of a DownloadService
+        
+        POST   /jobs             submit {"url", "mode", "format", "quality", "playlist", "priority"}
+                                 or {"jobs": [...]} for several at once
+        GET    /jobs[?state=S]   list jobs
+        GET    /jobs/<id>        job status
+        DELETE /jobs/<id>        cancel a job (also POST /jobs/<id>/cancel)
+        GET    /results[?drain=1] finished jobs
+        GET    /stats            queue and job counts
+        GET    /metrics          Prometheus snapshot of the downloader
+        GET    /stream?url=U[&format=F]  the converted audio of U, streamed as it is
+                                 produced (chunked, not saved, not queued)
+    """
+    
+    protocol_version = "HTTP/1.1"
+    service = None  # set by make_server
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _send(self, status: int, body, content_type: str = "application/json"):
+        data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _error(self, status: int, message: str):
+        self._send(status, {'error': message})
+    
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            raise ValueError("Request body too large")
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ValueError("Request body is not valid JSON")
+    
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return parts, query
+    
+    def do_GET(self):
+        parts, query = self._route()
+        if parts == ["jobs"]:
+            self._send(200, {'jobs': self.service.list(query.get('state'))})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.service.status(parts[1])
+            if job:
+                self._send(200, job)
+            else:
+                self._error(404, "Unknown job")
+        elif parts == ["results"]:
+            self._send(200, {'jobs': self.service.results(drain=query.get('drain') in ("1", "true"))})
+        elif parts == ["stats"]:
+            self._send(200, self.service.stats())
+        elif parts == ["metrics"]:
+            self._send(200, self.service.downloader.metrics.prometheus(), "text/plain; version=0.0.4")
+        elif parts == ["stream"]:
+            self._stream(query.get('url'), query.get('format', 'mp3'))
+        else:
+            self._error(404, "Not found")
+    
+    def do_POST(self):
+        parts, _ = self._route()
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            return self._cancel(parts[1])
+        if parts != ["jobs"]:
+            return self._error(404, "Not found")
+        try:
+            body = self._read_json()
+            batch = isinstance(body, dict) and 'jobs' in body
+            specs = body['jobs'] if batch else [body]
+            if not isinstance(specs, list) or not all(isinstance(spec, dict) for spec in specs):
+                raise ValueError("Expected a job object or {\"jobs\": [...]}")
+            jobs = []
+            for spec in specs:
+                try:
+                    jobs.append(self.service.submit(
+                        spec.get('url'), mode=spec.get('mode', 'audio'), format=spec.get('format', 'mp3'),
+                        quality=spec.get('quality', 'best'), playlist=spec.get('playlist', False),
+                        priority=spec.get('priority')))
+                except QueueFull as e:
+                    # Accepted jobs stay queued; the caller retries the rest later
+                    return self._send(429, {'error': str(e), 'jobs': jobs})
+        except ValueError as e:
+            return self._error(400, str(e))
+        self._send(202, {'jobs': jobs} if batch else jobs[0])
+    
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) == 2 and parts[0] == "jobs":
+            return self._cancel(parts[1])
+        self._error(404, "Not found")
+    
+    def _stream(self, url: str, format: str):
+        """Send the stream_audio() output for a URL as a chunked response"""
+        if not url or not url.startswith(("http://", "https://")):
+            return self._error(400, "Missing or invalid url")
+        try:
+            formats = parse_formats(format)
+            if len(formats) > 1:
+                raise ValueError("Streaming produces a single audio format")
+            chunks = self.service.downloader.stream_audio(url, formats[0])
+            # Pull the first chunk before answering, so failures still get an error status
+            chunk = next(chunks, b"")
+        except (TranscodeError, ValueError) as e:
+            return self._error(400, str(e))
+        except Exception as e:
+            return self._error(502, str(e))
+        
+        self.send_response(200)
+        self.send_header("Content-Type", MIME_TYPES[formats[0]])
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            while chunk:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                chunk = next(chunks, b"")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the client went away
+        except Exception as e:
+            # The status is already sent; closing without the last chunk marks the body as incomplete
+            print(f"❌ Error streaming {url}: {e}", file=sys.stderr)
+            self.close_connection = True
+        finally:
+            chunks.close()
+    
+    def _cancel(self, job_id: str):
+        job = self.service.cancel(job_id)
+        if job:
+            self._send(200, job)
+        else:
+            self._error(404, "Unknown job")
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded HTTP server on a Unix domain socket"""
+    
+    daemon_threads = True
+    
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ("local", 0)
+
+
+def make_server(service: DownloadService, host: str = "127.0.0.1", port: int = 8765, socket_path: str = None):
+    """
+    Create the API server for a service (not yet serving)
+    
+    Args:
+        service: The DownloadService behind the API
+        host: Interface to bind; keep it local, the API has no authentication
+        port: TCP port
+        socket_path: Listen on this Unix socket instead of TCP
+    """
+    handler = type("Handler", (ApiHandler,), {'service': service})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return UnixHTTPServer(socket_path, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(downloader: MediaDownloader, host: str = "127.0.0.1", port: int = 8765, socket_path: str = None,
+          workers: int = 4, max_queued: int = 1000) -> int:
+    """
+    Run the API until interrupted (Ctrl+C or SIGTERM)
+    
+    Returns:
+        int: Exit code
+    """
+    import signal
+    
+    warm_up()
+    service = DownloadService(downloader, workers=workers, max_queued=max_queued)
+    try:
+        httpd = make_server(service, host, port, socket_path)
+    except OSError as e:
+        print(f"❌ Error: Cannot listen on {socket_path or f'{host}:{port}'}: {e}", file=sys.stderr)
+        service.close()
+        return 1
+    
+    def stop(*args):
+        raise KeyboardInterrupt
+    
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, stop)
+    where = socket_path or f"http://{host}:{httpd.server_address[1]}"
+    print(f"🚀 Serving download API on {where} ({workers} workers, queue of {max_queued})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down...")
+    finally:
+        httpd.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+        dropped = service.close()
+        if dropped:
+            print(f"⚠️  Dropped {dropped} queued job(s)")
+    return 0
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Content store - Content-addressed copies of finished files, linked into outputs
+Every finished file is hashed once (in blocks, never loaded whole) and kept
+under its SHA-256 in a shared store; output directories get a reflink or
+hardlink to it, so the same track saved through several albums or playlists
+takes its space once, and an item the index knows is linked without being
+downloaded or converted again
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+BLOCK_SIZE = 1024 * 1024
+FICLONE = 0x40049409  # Linux ioctl: share the extents of another file (btrfs, XFS, ...)
+
+
+def file_digest(path) -> str:
+    """Return the SHA-256 of a file as hex, reading it in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while True:
+            block = file.read(BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _reflink(source, dest):
+    if fcntl is None or not sys.platform.startswith("linux"):
+        raise OSError("Reflinks are not supported on this platform")
+    with open(source, "rb") as src, open(dest, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def link_file(source, dest) -> str:
+    """
+    Make dest (which must not exist) share source's content
+    
+    Tries a reflink (copy-on-write, so editing one file leaves the other
+    alone), then a hardlink, then falls back to a plain copy, e.g. across
+    filesystems.
+    
+    Returns:
+        str: 'reflink', 'hardlink' or 'copy'
+    """
+    try:
+        _reflink(source, dest)
+        return 'reflink'
+    except OSError:
+        try:
+            os.unlink(dest)
+        except FileNotFoundError:
+            pass
+    try:
+        os.link(source, dest)
+        return 'hardlink'
+    except OSError:
+        pass
+    shutil.copyfile(source, dest)
+    return 'copy'
+
+
+def _same_content(path, digest: str, size: int) -> bool:
+    try:
+        return os.stat(path).st_size == size and file_digest(path) == digest
+    except OSError:
+        return False
+
+
+class ContentStore:
+    """Directory of files named by their SHA-256, with an index of the items they hold"""
+    
+    def __init__(self, root):
+        """
+        Open (or create) a content store
+        
+        Args:
+            root: Store directory; objects live in root/objects, the index in root/index.sqlite3.
+                  Keep it on the same filesystem as the output directories, or files are copied
+        """
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False,
+                                     isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                extractor TEXT NOT NULL,
+                id TEXT NOT NULL,
+                format TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                recorded REAL NOT NULL,
+                PRIMARY KEY (extractor, id, format)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS aliases (
+                url TEXT PRIMARY KEY,
+                extractor TEXT NOT NULL,
+                id TEXT NOT NULL
+            ) WITHOUT ROWID;
+        """)
+    
+    def object_path(self, digest: str) -> Path:
+        """Return where the object with a digest is kept"""
+        return self.root / "objects" / digest[:2] / digest[2:]
+    
+    def lookup_url(self, url: str):
+        """Return the (extractor, id) recorded for a URL, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT extractor, id FROM aliases WHERE url = ?", (url,)).fetchone()
+        return tuple(row) if row else None
+    
+    def get(self, extractor: str, id: str, format: str):
+        """
+        Look up a stored item
+        
+        Returns:
+            dict: The record (extractor, id, format, digest, name, size), or None if
+                  the item is unknown or its object is gone or changed size
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest, name, size FROM items WHERE extractor = ? AND id = ? AND format = ?",
+                (extractor.lower(), str(id), format)).fetchone()
+        if row is None:
+            return None
+        try:
+            if os.stat(self.object_path(row[0])).st_size != row[2]:
+                return None
+        except OSError:
+            return None
+        return {'extractor': extractor.lower(), 'id': str(id), 'format': format,
+                'digest': row[0], 'name': row[1], 'size': row[2]}
+    
+    def add(self, path, extractor: str, id: str, format: str, urls=()) -> str:
+        """
+        Store a finished file and index it as one output of an item
+        
+        A file whose content is already stored is replaced by a link to the
+        stored object, so the duplicate's space is freed.
+        
+        Args:
+            path: Finished output file
+            extractor: Extractor key (e.g. Youtube, Soundcloud)
+            id: Media id within the extractor
+            format: Output profile (e.g. mp3, video:best)
+            urls: URLs that resolve to this item
+        
+        Returns:
+            str: The file's SHA-256
+        """
+        path = Path(path)
+        digest = file_digest(path)
+        size = path.stat().st_size
+        obj = self.object_path(digest)
+        temp = None
+        try:
+            if not obj.exists():
+                obj.parent.mkdir(exist_ok=True)
+                temp = obj.with_name(f"{obj.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+                link_file(path, temp)
+                os.replace(temp, obj)
+            elif not os.path.samefile(obj, path):
+                temp = path.with_name(f".{path.name}.{os.getpid()}-{threading.get_ident()}.link")
+                if link_file(obj, temp) != 'copy':
+                    os.replace(temp, path)
+        finally:
+            if temp is not None and temp.exists():
+                temp.unlink()
+        
+        extractor = extractor.lower()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO items (extractor, id, format, digest, name, size, recorded) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (extractor, str(id), format, digest, path.name, size, time.time()))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO aliases (url, extractor, id) VALUES (?, ?, ?)",
+                    [(url, extractor, str(id)) for url in urls if url])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return digest
+    
+    def link(self, record: dict, directory):
+        """
+        Put a stored item into a directory under its original file name
+        
+        A different file already using the name is left alone and the item
+        gets its id appended instead (items with equal titles).
+        
+        Returns:
+            tuple: (path, how) where how is 'existing', 'reflink', 'hardlink' or 'copy'
+        """
+        obj = self.object_path(record['digest'])
+        dest = Path(directory) / record['name']
+        if dest.exists():
+            if os.path.samefile(dest, obj) or _same_content(dest, record['digest'], record['size']):
+                return dest, 'existing'
+            dest = dest.with_name(f"{dest.stem} [{record['id']}]{dest.suffix}")
+            if dest.exists() and _same_content(dest, record['digest'], record['size']):
+                return dest, 'existing'
+        
+        temp = dest.with_name(f".{dest.name}.{os.getpid()}-{threading.get_ident()}.link")
+        try:
+            how = link_file(obj, temp)
+            os.replace(temp, dest)
+        finally:
+            if temp.exists():
+                temp.unlink()
+        return dest, how
+    
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+    
+    def close(self):
+        """Close the index"""
+        with self._lock:
+            self._conn.close()
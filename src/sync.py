@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Sync cursors - Per-source record of the newest items already mirrored
+A channel or artist listing comes newest first, so a sync can stop reading
+it as soon as it reaches items its cursor knows: a daily run of a long
+channel lists one page instead of its whole history
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+KEEP_IDS = 200  # newest item ids remembered per source
+
+
+def entry_key(entry: dict) -> str:
+    """Return the identity of a flat playlist entry: its id, or its URL when the listing has no ids"""
+    return str(entry.get('id') or entry['url'])
+
+
+def entry_date(entry: dict):
+    """Return a flat entry's upload date as YYYYMMDD, or None if the listing does not carry it"""
+    if entry.get('upload_date'):
+        return entry['upload_date']
+    if entry.get('timestamp'):
+        return time.strftime('%Y%m%d', time.gmtime(entry['timestamp']))
+    return None
+
+
+class SyncState:
+    """SQLite-backed cursors of synced sources"""
+    
+    def __init__(self, path):
+        """
+        Open (or create) the sync state
+        
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False,
+                                     isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sources (
+                url TEXT PRIMARY KEY,
+                mode TEXT NOT NULL,
+                format TEXT NOT NULL,
+                quality TEXT NOT NULL,
+                ids TEXT NOT NULL,
+                upload_date TEXT,
+                synced REAL NOT NULL,
+                items INTEGER NOT NULL
+            ) WITHOUT ROWID;
+        """)
+    
+    def get(self, url: str):
+        """
+        Return a source's cursor
+        
+        Returns:
+            dict: url, mode, format, quality, ids (newest first), upload_date (newest
+                  seen), synced and items (downloaded over all syncs), or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, mode, format, quality, ids, upload_date, synced, items FROM sources WHERE url = ?",
+                (url,)).fetchone()
+        return self._record(row) if row else None
+    
+    def sources(self) -> list:
+        """Return the cursors of every synced source, oldest sync first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, mode, format, quality, ids, upload_date, synced, items FROM sources "
+                "ORDER BY synced").fetchall()
+        return [self._record(row) for row in rows]
+    
+    @staticmethod
+    def _record(row) -> dict:
+        url, mode, format, quality, ids, upload_date, synced, items = row
+        return {'url': url, 'mode': mode, 'format': format, 'quality': quality, 'ids': json.loads(ids),
+                'upload_date': upload_date, 'synced': synced, 'items': items}
+    
+    def advance(self, url: str, mode: str, format: str, quality: str, new_ids, upload_date=None,
+                items: int = 0):
+        """
+        Move a source's cursor past the items of a sync
+        
+        Args:
+            new_ids: Ids of the items this sync mirrored, newest first
+            upload_date: Newest upload date this sync saw (YYYYMMDD), if any
+            items: Number of items this sync downloaded
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute(
+                    "SELECT ids, upload_date, items FROM sources WHERE url = ?", (url,)).fetchone()
+                old_ids, old_date, total = (json.loads(row[0]), row[1], row[2]) if row else ([], None, 0)
+                ids = list(dict.fromkeys([*new_ids, *old_ids]))[:KEEP_IDS]
+                newest = max(filter(None, (upload_date, old_date)), default=None)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sources (url, mode, format, quality, ids, upload_date, synced, items) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (url, mode, format, quality, json.dumps(ids), newest, time.time(), total + items))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
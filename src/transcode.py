@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Transcoding - FFmpeg audio conversion as a separate pipeline stage
+Downloads hand finished source files to a Transcoder so the network can
+move on to the next item while the CPU encodes the previous ones
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+
+# Target format -> (codec family, ffmpeg encoder, file extension, ffmpeg muxer, lossy)
+AUDIO_CODECS = {
+    'mp3': ('mp3', 'libmp3lame', 'mp3', 'mp3', True),
+    'm4a': ('aac', 'aac', 'm4a', 'ipod', True),
+    'aac': ('aac', 'aac', 'aac', 'adts', True),
+    'opus': ('opus', 'libopus', 'opus', 'opus', True),
+    'vorbis': ('vorbis', 'libvorbis', 'ogg', 'ogg', True),
+    'flac': ('flac', 'flac', 'flac', 'flac', False),
+    'wav': ('pcm', 'pcm_s16le', 'wav', 'wav', False),
+}
+
+# yt-dlp format selectors that prefer a source already in the target codec,
+# which lets the planner remux instead of re-encoding
+SOURCE_PREFERENCE = {
+    'mp3': 'bestaudio[acodec=mp3]/bestaudio/best',
+    'm4a': 'bestaudio[acodec^=mp4a]/bestaudio/best',
+    'aac': 'bestaudio[acodec^=mp4a]/bestaudio/best',
+    'opus': 'bestaudio[acodec=opus]/bestaudio/best',
+    'vorbis': 'bestaudio[acodec=vorbis]/bestaudio/best',
+    'flac': 'bestaudio[acodec=flac]/bestaudio/best',
+}
+
+# Content types of streamed formats
+MIME_TYPES = {
+    'mp3': 'audio/mpeg',
+    'm4a': 'audio/mp4',
+    'aac': 'audio/aac',
+    'opus': 'audio/ogg',
+    'vorbis': 'audio/ogg',
+    'flac': 'audio/flac',
+    'wav': 'audio/wav',
+}
+
+# Extra muxer options so a format can be written to a pipe, which cannot seek
+STREAM_OPTIONS = {
+    'm4a': ['-movflags', 'frag_keyframe+empty_moov'],
+}
+
+KEEP, REMUX, ENCODE = 'keep', 'remux', 'encode'
+
+
+class TranscodeError(RuntimeError):
+    """Raised when FFmpeg fails to convert a file"""
+
+
+def output_path(source, format: str) -> Path:
+    """Return the path a source file is converted to for a target format"""
+    if format not in AUDIO_CODECS:
+        raise TranscodeError(f"Unsupported audio format: {format}")
+    return Path(source).with_suffix('.' + AUDIO_CODECS[format][2])
+
+
+def normalize_codec(codec: str):
+    """Map a yt-dlp acodec or FFmpeg codec name to a codec family (aac, opus, pcm, ...)"""
+    if not codec or codec == 'none':
+        return None
+    codec = codec.lower().split('.')[0]
+    if codec.startswith('pcm'):
+        return 'pcm'
+    return {'mp4a': 'aac', 'mp3float': 'mp3', 'libopus': 'opus', 'libvorbis': 'vorbis'}.get(codec, codec)
+
+
+def probe_codec(path, ffmpeg: str = 'ffmpeg'):
+    """Read the audio codec of a file from FFmpeg's stream listing"""
+    try:
+        process = subprocess.run([ffmpeg, '-hide_banner', '-nostdin', '-i', str(path)],
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise TranscodeError("FFmpeg not found")
+    match = re.search(r'Stream #\d+:\d+.*?: Audio: (\w+)', process.stderr.decode('utf-8', 'replace'))
+    return normalize_codec(match.group(1)) if match else None
+
+
+def plan_audio(source, format: str, source_codec: str = None) -> str:
+    """
+    Decide how to turn a downloaded file into the target format
+    
+    Args:
+        source: Path of the downloaded file
+        format: Target audio format
+        source_codec: Audio codec of the source, if already known
+    
+    Returns:
+        str: KEEP (already in the target format), REMUX (copy the audio
+             stream into the target container) or ENCODE
+    """
+    if format not in AUDIO_CODECS:
+        raise TranscodeError(f"Unsupported audio format: {format}")
+    family, _, ext, _, _ = AUDIO_CODECS[format]
+    if normalize_codec(source_codec) != family:
+        return ENCODE
+    return KEEP if Path(source).suffix.lower() == '.' + ext else REMUX
+
+
+def parse_formats(format) -> list:
+    """
+    Normalise a format argument to a list of target formats
+    
+    Accepts a single format ("mp3"), a comma separated string ("mp3,flac")
+    or a sequence of formats. Duplicates are dropped, order is kept.
+    """
+    if isinstance(format, str):
+        format = format.split(',')
+    formats = []
+    for name in format:
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in AUDIO_CODECS:
+            raise TranscodeError(f"Unsupported audio format: {name}")
+        if name not in formats:
+            formats.append(name)
+    if not formats:
+        raise TranscodeError("No audio format given")
+    return formats
+
+
+def transcode_audio(source, format, quality: str = '192', keep_source: bool = False,
+                    ffmpeg: str = 'ffmpeg', source_codec: str = None) -> list:
+    """
+    Convert an audio (or video) file to one or more audio formats with FFmpeg
+    
+    All requested formats are produced by a single FFmpeg run, so the source
+    is read and decoded once however many outputs there are. The audio
+    stream is copied instead of re-encoded for every output whose codec
+    already matches the source. Outputs are written under temporary names
+    and renamed when complete, so an interrupted conversion never leaves a
+    truncated file behind.
+    
+    Args:
+        source: Path of the downloaded file
+        format: Target format(s), e.g. "mp3", "mp3,flac" or ["mp3", "flac"]
+        quality: Bitrate in kbit/s for lossy formats
+        keep_source: If True, do not delete the source file afterwards
+        ffmpeg: FFmpeg executable
+        source_codec: Audio codec of the source; probed with FFmpeg if not given
+    
+    Returns:
+        list: One dict per format with the output path, the action taken
+              (keep, remux, encode), the source codec and the seconds FFmpeg ran
+    """
+    formats = parse_formats(format)
+    source = Path(source)
+    source_codec = normalize_codec(source_codec) or probe_codec(source, ffmpeg)
+    
+    results = []
+    pending = []  # (temp, target) for outputs FFmpeg has to write
+    command = [ffmpeg, '-y', '-nostdin', '-loglevel', 'error', '-i', str(source)]
+    for name in formats:
+        _, encoder, _, muxer, lossy = AUDIO_CODECS[name]
+        action = plan_audio(source, name, source_codec)
+        target = source if action == KEEP else output_path(source, name)
+        results.append({'format': name, 'path': str(target), 'action': action,
+                        'source_codec': source_codec, 'elapsed': 0.0})
+        if action == KEEP:
+            continue
+        
+        temp = target.with_name(target.name + '.part')
+        command += ['-map', '0:a:0', '-map_metadata', '0']
+        if action == REMUX:
+            command += ['-c:a', 'copy']
+        else:
+            command += ['-c:a', encoder]
+            if lossy and quality:
+                command += ['-b:a', f'{quality}k']
+        command += ['-f', muxer, str(temp)]
+        pending.append((temp, target))
+    
+    if not pending:
+        return results
+    
+    started = time.monotonic()
+    try:
+        process = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise TranscodeError("FFmpeg not found")
+    elapsed = time.monotonic() - started
+    if process.returncode != 0:
+        for temp, _ in pending:
+            if temp.exists():
+                temp.unlink()
+        message = process.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise TranscodeError(f"FFmpeg failed for {source.name}: {message[-1] if message else process.returncode}")
+    
+    for temp, target in pending:
+        os.replace(temp, target)
+    for result in results:
+        result['elapsed'] = elapsed
+    outputs = {Path(result['path']) for result in results}
+    if not keep_source and source not in outputs and source.exists():
+        source.unlink()
+    return results
+
+
+def stream_command(source: str, format: str, action: str = ENCODE, quality: str = '192',
+                   ffmpeg: str = 'ffmpeg', headers: dict = None) -> list:
+    """
+    Build an FFmpeg command that converts one input to one format on stdout
+    
+    Args:
+        source: Input for FFmpeg: 'pipe:0', a file path or a URL
+        format: Target audio format
+        action: KEEP or REMUX to copy the audio stream, ENCODE to re-encode it
+        quality: Bitrate in kbit/s for lossy formats
+        ffmpeg: FFmpeg executable
+        headers: HTTP headers for a URL input
+    """
+    if format not in AUDIO_CODECS:
+        raise TranscodeError(f"Unsupported audio format: {format}")
+    _, encoder, _, muxer, lossy = AUDIO_CODECS[format]
+    command = [ffmpeg, '-nostdin', '-loglevel', 'error']
+    if headers:
+        command += ['-headers', ''.join(f'{name}: {value}\r\n' for name, value in headers.items())]
+    command += ['-i', source, '-map', '0:a:0', '-map_metadata', '0']
+    if action in (KEEP, REMUX):
+        command += ['-c:a', 'copy']
+    else:
+        command += ['-c:a', encoder]
+        if lossy and quality:
+            command += ['-b:a', f'{quality}k']
+    return command + STREAM_OPTIONS.get(format, []) + ['-f', muxer, 'pipe:1']
+
+
+def pipe_through(command: list, chunks=None, chunk_size: int = 64 * 1024):
+    """
+    Run an FFmpeg command and yield its stdout as it is produced
+    
+    `chunks` (an iterable of bytes) is written to FFmpeg's stdin from a
+    thread. Both sides go through OS pipes, so memory stays bounded and a
+    slow consumer slows the source down. Closing the generator early stops
+    FFmpeg and the source.
+    
+    Yields:
+        bytes: Output chunks of at most chunk_size bytes
+    """
+    try:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL if chunks is None else subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise TranscodeError("FFmpeg not found")
+    errors = []
+    
+    def feed():
+        try:
+            for chunk in chunks:
+                process.stdin.write(chunk)
+        except (BrokenPipeError, ValueError):
+            pass  # FFmpeg exited or was stopped
+        except Exception as e:
+            errors.append(e)
+            process.kill()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            try:
+                process.stdin.close()
+            except (BrokenPipeError, ValueError):
+                pass
+    
+    # Drained concurrently so a chatty FFmpeg never blocks on a full stderr pipe
+    stderr = []
+    threads = [threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)]
+    if chunks is not None:
+        threads.append(threading.Thread(target=feed, daemon=True))
+    for thread in threads:
+        thread.start()
+    
+    finished = False
+    try:
+        while True:
+            data = process.stdout.read1(chunk_size)
+            if not data:
+                break
+            yield data
+        finished = True
+    finally:
+        if not finished:
+            process.kill()
+        process.wait()
+        for thread in threads:
+            thread.join()
+        process.stdout.close()
+        process.stderr.close()
+    
+    if errors:
+        raise errors[0]
+    if process.returncode != 0:
+        message = b''.join(stderr).decode('utf-8', 'replace').strip().splitlines()
+        raise TranscodeError(f"FFmpeg failed: {message[-1] if message else process.returncode}")
+
+
+def gather(futures) -> Future:
+    """
+    Combine several futures into one
+    
+    Returns:
+        Future: Resolves to the list of results, or to the first exception
+    """
+    combined = Future()
+    futures = list(futures)
+    results = [None] * len(futures)
+    remaining = [len(futures)]
+    lock = threading.Lock()
+    
+    if not futures:
+        combined.set_result([])
+        return combined
+    
+    def on_done(index, future):
+        with lock:
+            if combined.done():
+                return
+            if future.exception() is not None:
+                combined.set_exception(future.exception())
+                return
+            results[index] = future.result()
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                combined.set_result(results)
+    
+    for index, future in enumerate(futures):
+        future.add_done_callback(lambda f, i=index: on_done(i, f))
+    return combined
+
+
+class Transcoder:
+    """
+    Bounded pool of FFmpeg conversions
+    
+    Each worker drives one FFmpeg process, so the pool runs up to `workers`
+    encoders in parallel (one per core by default). submit() blocks once
+    `max_pending` conversions are queued or running, which applies
+    backpressure to the download stage instead of piling up source files.
+    """
+    
+    def __init__(self, workers: int = None, max_pending: int = None, ffmpeg: str = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.ffmpeg = ffmpeg or shutil.which('ffmpeg') or 'ffmpeg'
+        self._slots = threading.BoundedSemaphore(max_pending or self.workers * 2)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='transcode')
+    
+    def submit(self, source, format, quality: str = '192', keep_source: bool = False,
+               source_codec: str = None) -> Future:
+        """
+        Queue a conversion, waiting while the queue is full
+        
+        Returns:
+            Future: Resolves to the transcode_audio() result list
+        """
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(transcode_audio, source, format, quality, keep_source,
+                                       self.ffmpeg, source_codec)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+    
+    def close(self, wait: bool = True):
+        """Stop accepting work and optionally wait for queued conversions"""
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,74 @@
+import pytest
+
+from archive import DownloadArchive
+from downloader import MediaDownloader, canonical_key
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = DownloadArchive(tmp_path / "archive.sqlite3")
+    yield archive
+    archive.close()
+
+
+def test_record_and_lookup(tmp_path, archive):
+    path = tmp_path / "Song [abc].mp3"
+    path.write_bytes(b"audio")
+    archive.record("Youtube", "abc", "mp3", path, urls=["https://youtu.be/abc", None])
+    
+    assert archive.lookup_url("https://youtu.be/abc") == ("youtube", "abc")
+    assert archive.lookup_url("https://youtu.be/other") is None
+    record = archive.get("YouTube", "abc", "mp3")
+    assert record['path'] == str(path.resolve()) and record['size'] == 5
+    assert archive.contains("youtube", "abc", "mp3")
+    assert not archive.contains("youtube", "abc", "flac")
+    assert not archive.contains("youtube", "other", "mp3")
+    assert len(archive) == 1
+
+
+def test_changed_or_deleted_files_no_longer_count(tmp_path, archive):
+    path = tmp_path / "Song [abc].mp3"
+    path.write_bytes(b"audio")
+    archive.record("Youtube", "abc", "mp3", path)
+    
+    path.write_bytes(b"truncated audio")
+    assert not archive.contains("youtube", "abc", "mp3")
+    path.unlink()
+    assert not archive.contains("youtube", "abc", "mp3")
+
+
+def test_record_replaces_an_earlier_file(tmp_path, archive):
+    first, second = tmp_path / "a.mp3", tmp_path / "b.mp3"
+    first.write_bytes(b"1")
+    second.write_bytes(b"22")
+    archive.record("Generic", "a", "mp3", first)
+    archive.record("Generic", "a", "mp3", second)
+    assert archive.get("generic", "a", "mp3")['path'] == str(second.resolve())
+    assert len(archive) == 1
+
+
+def test_canonical_key_matches_url_shapes():
+    assert canonical_key("https://www.youtube.com/watch?v=dQw4w9WgXcQ") == "Youtube:dQw4w9WgXcQ"
+    assert canonical_key("https://youtu.be/dQw4w9WgXcQ") == "Youtube:dQw4w9WgXcQ"
+    assert canonical_key("http://example.com/file.mp3") is None
+
+
+def test_downloader_checks_the_archive_before_the_network(tmp_path):
+    downloader = MediaDownloader(output_dir=tmp_path, use_cache=False, use_journal=False)
+    try:
+        path = tmp_path / "Song [dQw4w9WgXcQ].mp3"
+        path.write_bytes(b"audio")
+        downloader.archive.record("Youtube", "dQw4w9WgXcQ", "mp3", path, urls=["http://example.com/song"])
+        
+        # By a recorded URL, by another URL shape of the same id, and by the info of a listing
+        assert downloader._in_archive("http://example.com/song", ["mp3"])
+        assert downloader._in_archive("https://youtu.be/dQw4w9WgXcQ", ["mp3"])
+        assert downloader._in_archive("http://other", ["mp3"], {'ie_key': 'Youtube', 'id': 'dQw4w9WgXcQ'})
+        assert not downloader._in_archive("https://youtu.be/dQw4w9WgXcQ", ["mp3", "flac"])
+        assert not downloader._in_archive("http://example.com/unknown.mp3", ["mp3"])
+        
+        match_filter = downloader._archive_filter(["mp3"])
+        assert match_filter({'ie_key': 'Youtube', 'id': 'dQw4w9WgXcQ', 'title': 'Song'}) is not None
+        assert match_filter({'ie_key': 'Youtube', 'id': 'other'}) is None
+    finally:
+        downloader.close()
@@ -0,0 +1,84 @@
+import pytest
+
+from bandwidth import PRIORITIES, BandwidthScheduler, fair_shares, parse_priority
+
+
+@pytest.mark.parametrize("value, weight", [("low", 1), ("Normal", 4), ("HIGH", 16), (3, 3), ("7", 7)])
+def test_parse_priority(value, weight):
+    assert parse_priority(value) == weight
+
+
+@pytest.mark.parametrize("value", [0, -1, "urgent", None, "1.5x"])
+def test_parse_priority_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        parse_priority(value)
+
+
+def test_fair_shares_by_weight():
+    assert fair_shares(900, [(1, None), (2, None)]) == [300, 600]
+
+
+def test_fair_shares_gives_leftovers_to_the_others():
+    # The slow stream keeps what it uses; the rest is split 1:1
+    assert fair_shares(1000, [(1, 100), (1, None), (1, None)]) == [100, 450, 450]
+    # Demands above the share are capped at it
+    assert fair_shares(1000, [(1, 800), (1, None)]) == [500, 500]
+    # Everyone satisfied: the rest is left unused
+    assert fair_shares(1000, [(1, 100), (1, 200)]) == [100, 200]
+
+
+def test_fair_shares_skips_zero_weights():
+    assert fair_shares(100, [(0, None), (1, None)]) == [0.0, 100]
+    assert fair_shares(100, []) == []
+
+
+class FakeYoutubeDL:
+    def __init__(self):
+        self._progress_hooks = []
+    
+    def add_progress_hook(self, hook):
+        self._progress_hooks.append(hook)
+
+
+def rates(scheduler):
+    return [state['rate'] for state in scheduler._streams]
+
+
+def test_scheduler_splits_its_limit_by_priority():
+    scheduler = BandwidthScheduler(limit=5000)
+    low, high = scheduler.group("low"), scheduler.group("high")
+    ydl = FakeYoutubeDL()
+    with scheduler.stream(ydl, low), scheduler.stream(ydl, high):
+        assert rates(scheduler) == pytest.approx([5000 / 17, 5000 * 16 / 17])
+        with scheduler.stream(ydl, high):
+            # A group's share is split between its running downloads
+            assert rates(scheduler) == pytest.approx([5000 / 17, 2500 * 16 / 17, 2500 * 16 / 17])
+    assert scheduler._streams == [] and ydl._progress_hooks == []
+
+
+def test_scheduler_applies_group_limits():
+    scheduler = BandwidthScheduler()
+    ydl = FakeYoutubeDL()
+    with scheduler.stream(ydl, scheduler.group(limit=2000)), scheduler.stream(ydl, scheduler.group(limit=3000)):
+        # The largest limit is the cap; the smaller group still stays within its own
+        assert rates(scheduler) == pytest.approx([1500, 1500])
+    with scheduler.stream(ydl, scheduler.group(limit=2000)), scheduler.stream(ydl, scheduler.group()):
+        # An unlimited group leaves the other one only its own limit
+        assert rates(scheduler) == [2000, None]
+
+
+def test_schedulers_in_one_directory_share_the_limit(tmp_path):
+    first = BandwidthScheduler(limit=1000, directory=tmp_path)
+    second = BandwidthScheduler(limit=1000, directory=tmp_path)
+    ydl = FakeYoutubeDL()
+    try:
+        assert first._heartbeat != second._heartbeat
+        with first.stream(ydl, first.group(PRIORITIES['normal'])), \
+                second.stream(ydl, second.group(PRIORITIES['normal'])):
+            first.rebalance()
+            assert rates(first) == pytest.approx([500])
+            assert rates(second) == pytest.approx([500])
+    finally:
+        first.close()
+        second.close()
+    assert list(tmp_path.glob("*.json")) == []
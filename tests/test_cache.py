@@ -0,0 +1,73 @@
+import types
+
+import pytest
+
+import cache
+from cache import MetadataCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_key_for():
+    assert MetadataCache.key_for({'extractor_key': 'Youtube', 'id': 'abc'}) == "Youtube:abc"
+    assert MetadataCache.key_for({'ie_key': 'Generic', 'id': 'x'}) == "Generic:x"
+    assert MetadataCache.key_for({'id': 'abc'}) is None
+    assert MetadataCache.key_for({'extractor_key': 'Youtube'}) is None
+
+
+def test_put_get_and_url_alias(tmp_path, clock):
+    store = MetadataCache(tmp_path / "cache.sqlite3")
+    store.put("Youtube:abc", {'id': 'abc', 'title': 'Song'}, urls=["https://youtu.be/abc", None])
+    assert store.lookup_url("https://youtu.be/abc") == "Youtube:abc"
+    assert store.lookup_url("https://youtu.be/other") is None
+    assert store.get("Youtube:abc") == {'id': 'abc', 'title': 'Song'}
+    assert store.get(None) is None
+    assert store.stats()['hits'] == 1 and store.stats()['misses'] == 1
+    store.close()
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    store = MetadataCache(tmp_path / "cache.sqlite3", ttl=60)
+    store.put("Youtube:old", {'id': 'old'}, urls=["https://youtu.be/old"])
+    clock[0] += 59
+    assert store.get("Youtube:old") == {'id': 'old'}
+    clock[0] += 2
+    assert store.get("Youtube:old") is None
+    
+    # The next write evicts the expired entry and its alias
+    store.put("Youtube:new", {'id': 'new'})
+    assert store.lookup_url("https://youtu.be/old") is None
+    assert store.stats()['entries'] == 1
+    store.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    store = MetadataCache(tmp_path / "cache.sqlite3", max_bytes=10 ** 6)
+    for name in ("a", "b", "c"):
+        store.put(f"Generic:{name}", {'id': name})
+        clock[0] += 1
+    size = store.stats()['bytes'] // 3
+    store.max_bytes = 3 * size
+    
+    assert store.get("Generic:a") is not None  # a is now the most recently used
+    clock[0] += 1
+    store.put("Generic:d", {'id': 'd'})
+    
+    assert store.get("Generic:b") is None
+    assert all(store.get(f"Generic:{name}") for name in ("a", "c", "d"))
+    assert store.stats()['entries'] == 3
+    store.close()
+
+
+def test_clear(tmp_path, clock):
+    store = MetadataCache(tmp_path / "cache.sqlite3")
+    store.put("Generic:a", {'id': 'a'}, urls=["http://example.com/a"])
+    store.clear()
+    assert store.get("Generic:a") is None
+    assert store.lookup_url("http://example.com/a") is None
+    store.close()
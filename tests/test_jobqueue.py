@@ -0,0 +1,186 @@
+import threading
+import time
+import types
+
+import pytest
+
+import jobqueue
+from jobqueue import CANCELLED, DONE, FAILED, LOST, QUEUED, RUNNING, JobQueue, QueueWorker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(jobqueue, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def jobs(tmp_path, clock):
+    queue = JobQueue(tmp_path / "jobs.sqlite3", max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_enqueue_validates(jobs):
+    with pytest.raises(ValueError):
+        jobs.enqueue(["http://a"], mode="podcast")
+    with pytest.raises(ValueError):
+        jobs.enqueue(["http://a"], priority="urgent")
+    assert jobs.stats() == {'expired': 0}
+
+
+def test_claim_takes_highest_priority_first(jobs):
+    low, normal = jobs.enqueue(["http://low"], priority="low") + jobs.enqueue(["http://normal"])
+    high, = jobs.enqueue(["http://high"], priority="high")
+    
+    claimed = [jobs.claim("w1", lease=30)['id'] for _ in range(3)]
+    assert claimed == [high, normal, low]
+    assert jobs.claim("w1", lease=30) is None
+    job = jobs.get(high)
+    assert job['state'] == RUNNING and job['worker'] == "w1" and job['attempts'] == 1
+    assert job['lease_expires'] == 1030
+
+
+def test_heartbeat_and_finish(jobs, clock):
+    job_id, = jobs.enqueue(["http://a"])
+    jobs.claim("w1", lease=30)
+    clock[0] += 20
+    assert jobs.heartbeat(job_id, "w1", lease=30)
+    assert jobs.get(job_id)['lease_expires'] == 1050
+    assert not jobs.heartbeat(job_id, "w2", lease=30)
+    
+    assert not jobs.finish(job_id, "w2", {'success': True})
+    assert jobs.finish(job_id, "w1", {'success': True, 'elapsed': 1.5})
+    job = jobs.get(job_id)
+    assert job['state'] == DONE and job['elapsed'] == 1.5 and job['lease_expires'] is None
+    assert not jobs.heartbeat(job_id, "w1", lease=30)
+
+
+def test_failed_result(jobs):
+    job_id, = jobs.enqueue(["http://a"])
+    jobs.claim("w1", lease=30)
+    jobs.finish(job_id, "w1", {'success': False, 'error': "HTTP Error 404"})
+    assert jobs.get(job_id)['state'] == FAILED and jobs.get(job_id)['error'] == "HTTP Error 404"
+
+
+def test_expired_lease_is_claimed_again_until_attempts_run_out(jobs, clock):
+    job_id, = jobs.enqueue(["http://a"])
+    jobs.claim("w1", lease=30)
+    clock[0] += 31
+    assert jobs.stats() == {RUNNING: 1, 'expired': 1}
+    
+    job = jobs.claim("w2", lease=30)
+    assert job['id'] == job_id and job['worker'] == "w2" and job['attempts'] == 2
+    # The first worker lost the job: it can neither renew nor finish it
+    assert not jobs.heartbeat(job_id, "w1", lease=30)
+    assert not jobs.finish(job_id, "w1", {'success': True})
+    
+    clock[0] += 31
+    assert jobs.claim("w3", lease=30) is None
+    job = jobs.get(job_id)
+    assert job['state'] == FAILED and job['error'] == "Lease expired 2 time(s)"
+
+
+def test_release_requeues(jobs):
+    job_id, = jobs.enqueue(["http://a"])
+    jobs.claim("w1", lease=30)
+    jobs.release(job_id, "w1")
+    assert jobs.get(job_id)['state'] == QUEUED
+    assert jobs.claim("w2", lease=30)['id'] == job_id
+
+
+def test_cancel_queued_job(jobs):
+    job_id, = jobs.enqueue(["http://a"])
+    assert jobs.cancel(job_id)
+    assert jobs.get(job_id)['state'] == CANCELLED
+    assert jobs.claim("w1", lease=30) is None
+    assert not jobs.cancel(job_id)
+    assert not jobs.cancel(12345)
+
+
+def test_cancel_running_job(jobs):
+    job_id, = jobs.enqueue(["http://a"])
+    jobs.claim("w1", lease=30)
+    assert jobs.cancel(job_id)
+    # The worker finds out at its next heartbeat, and its result records the cancel
+    assert not jobs.heartbeat(job_id, "w1", lease=30)
+    assert jobs.finish(job_id, "w1", {'success': False, 'error': "Cancelled"})
+    assert jobs.get(job_id)['state'] == CANCELLED
+
+
+def test_cancelled_job_with_expired_lease_is_not_requeued(jobs, clock):
+    job_id, = jobs.enqueue(["http://a"])
+    jobs.claim("w1", lease=30)
+    jobs.cancel(job_id)
+    clock[0] += 31
+    assert jobs.claim("w2", lease=30) is None
+    job = jobs.get(job_id)
+    assert job['state'] == CANCELLED and job['error'] is None and job['finished'] == 1031
+
+
+def test_queue_is_shared_between_connections(tmp_path, clock):
+    first, second = JobQueue(tmp_path / "jobs.sqlite3"), JobQueue(tmp_path / "jobs.sqlite3")
+    try:
+        first.enqueue(["http://a", "http://b"])
+        a, b = second.claim("w2", lease=30), first.claim("w1", lease=30)
+        assert {a['url'], b['url']} == {"http://a", "http://b"}
+        assert first.claim("w1", lease=30) is None
+    finally:
+        first.close()
+        second.close()
+
+
+class FakeDownloader:
+    """Runs a job as a stream of progress updates until the hook stops it"""
+    
+    def __init__(self):
+        self.started = threading.Event()
+    
+    def _share(self, priority):
+        return None
+    
+    def _run_job(self, result, mode, format, quality, allow_playlist=False, progress=None, share=None):
+        self.started.set()
+        try:
+            for _ in range(500):
+                progress({'status': 'downloading'})
+                time.sleep(0.01)
+            result['success'] = True
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+
+
+def start_worker(queue, downloader):
+    worker = QueueWorker(downloader, queue, threads=1, lease=0.3, name="w1")
+    thread = threading.Thread(target=worker.run, kwargs={'until_empty': True}, daemon=True)
+    thread.start()
+    assert downloader.started.wait(5)
+    return worker, thread
+
+
+def test_worker_stops_a_cancelled_job(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    try:
+        job_id, = queue.enqueue(["http://a"])
+        worker, thread = start_worker(queue, FakeDownloader())
+        queue.cancel(job_id)
+        thread.join(5)
+        assert worker.counts[CANCELLED] == 1
+        job = queue.get(job_id)
+        assert job['state'] == CANCELLED and "DownloadCancelled" in job['error']
+    finally:
+        queue.close()
+
+
+def test_worker_hands_back_its_jobs(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    try:
+        job_id, = queue.enqueue(["http://a"])
+        worker, thread = start_worker(queue, FakeDownloader())
+        worker.release()
+        thread.join(5)
+        assert worker.counts[LOST] == 1
+        assert queue.get(job_id)['state'] == QUEUED
+    finally:
+        queue.close()
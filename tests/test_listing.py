@@ -0,0 +1,44 @@
+import pytest
+from yt_dlp.utils import OnDemandPagedList
+
+from downloader import MediaDownloader
+from media_info import MediaInfo
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    downloader = MediaDownloader(output_dir=tmp_path, use_cache=False, use_journal=False)
+    yield downloader
+    downloader.close()
+
+
+def paged_playlist(pages, size=3, count=8):
+    def page(number):
+        pages.append(number)
+        for i in range(number * size, min(count, (number + 1) * size)):
+            yield {'_type': 'url', 'id': f"v{i}", 'url': f"http://example.com/v{i}"}
+    return {'_type': 'playlist', 'id': 'list', 'entries': OnDemandPagedList(page, size)}
+
+
+def test_paged_listing_streams_without_caching(downloader):
+    pages = []
+    info = paged_playlist(pages)
+    listing = downloader._iter_entries(None, info, "http://example.com/list", 3)
+    
+    source, first = next(listing)
+    assert (source, first['id']) == ("http://example.com/list", "v0")
+    assert pages == [0]
+    
+    assert [entry['id'] for _, entry in listing] == [f"v{i}" for i in range(1, 8)]
+    # Each page is fetched once and not kept
+    assert pages == [0, 1, 2]
+    assert info['entries']._cache == {}
+
+
+def test_iter_info_over_a_paged_listing(downloader, monkeypatch):
+    pages = []
+    monkeypatch.setattr(downloader, "_iter_listing", lambda url, max_depth=3, skip=None: downloader._iter_entries(
+        None, paged_playlist(pages, count=5), url, max_depth, skip))
+    records = list(downloader.iter_info("http://example.com/list"))
+    assert all(isinstance(record, MediaInfo) for record in records)
+    assert [(record.id, record.playlist_index) for record in records] == [(f"v{i}", i + 1) for i in range(5)]
@@ -0,0 +1,27 @@
+from media_info import MediaInfo, estimate_size
+
+
+def test_from_full_info():
+    info = {'id': 'abc', 'title': 'Song', 'channel': 'Artist', 'duration': 200, 'extractor_key': 'Youtube',
+            'webpage_url': 'https://www.youtube.com/watch?v=abc', 'upload_date': '20240101',
+            'requested_formats': [{'filesize': 1000}, {'filesize_approx': 500}], 'formats': [{}] * 50}
+    record = MediaInfo.from_info(info, playlist_index=3)
+    assert record.to_dict() == {
+        'id': 'abc', 'title': 'Song', 'uploader': 'Artist', 'duration': 200,
+        'url': 'https://www.youtube.com/watch?v=abc', 'extractor': 'Youtube', 'upload_date': '20240101',
+        'view_count': None, 'filesize': 1500, 'description': None, 'playlist_index': 3, 'playlist_count': None}
+
+
+def test_from_flat_entry_and_playlist():
+    entry = MediaInfo.from_info({'_type': 'url', 'id': 'x', 'ie_key': 'Youtube',
+                                 'url': 'https://youtu.be/x#__youtubedl_smuggle=%7B%7D'})
+    assert entry.url == 'https://youtu.be/x' and entry.extractor == 'Youtube'
+    playlist = MediaInfo.from_info({'_type': 'playlist', 'id': 'p', 'entries': [{}, {}, {}]})
+    assert playlist.playlist_count == 3
+
+
+def test_estimate_size():
+    assert estimate_size({'filesize': 10}) == 10
+    assert estimate_size({'duration': 8, 'tbr': 128}) == 128000
+    assert estimate_size({'requested_formats': [{'filesize': 1}, {}]}) is None
+    assert estimate_size({}) is None
@@ -0,0 +1,164 @@
+import types
+
+import pytest
+from yt_dlp.networking.exceptions import TransportError
+from yt_dlp.utils import DownloadCancelled, DownloadError, ExtractorError
+
+import retry
+from retry import PERMANENT, THROTTLED, TRANSIENT, CircuitBreaker, CircuitOpen, Retrier, classify, retry_after
+
+
+class StatusError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"status {status}")
+        self.status = status
+        self.headers = headers
+
+
+def wrapped(cause):
+    """A yt-dlp DownloadError carrying the original exception, as YoutubeDL raises it"""
+    return DownloadError(f"ERROR: {cause}", exc_info=(type(cause), cause, None))
+
+
+@pytest.mark.parametrize("error, kind", [
+    (StatusError(429), THROTTLED),
+    (StatusError(503), TRANSIENT),
+    (StatusError(408), TRANSIENT),
+    (StatusError(404), PERMANENT),
+    (DownloadError("ERROR: Unable to download webpage: HTTP Error 500: Internal Server Error"), TRANSIENT),
+    (DownloadError("ERROR: Unable to download webpage: HTTP Error 403: Forbidden"), PERMANENT),
+    (wrapped(TransportError("boom")), TRANSIENT),
+    (wrapped(ConnectionResetError()), TRANSIENT),
+    (DownloadError("ERROR: The read operation timed out"), TRANSIENT),
+    (wrapped(ExtractorError("Video unavailable", expected=True)), PERMANENT),
+    (DownloadCancelled(), PERMANENT),
+    (ValueError("bad format"), PERMANENT),
+])
+def test_classify(error, kind):
+    assert classify(error) == kind
+
+
+def test_classify_follows_exception_chains():
+    try:
+        try:
+            raise StatusError(502)
+        except StatusError as e:
+            raise RuntimeError("download failed") from e
+    except RuntimeError as e:
+        assert classify(e) == TRANSIENT
+
+
+def test_retry_after():
+    assert retry_after(StatusError(429, {'Retry-After': '7'})) == 7.0
+    assert retry_after(StatusError(429, {'Retry-After': 'Thu, 01 Jan 1970 00:00:00 GMT'})) == 0.0
+    assert retry_after(StatusError(429)) is None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(retry, "time", types.SimpleNamespace(monotonic=lambda: now[0], time=lambda: now[0],
+                                                            sleep=lambda seconds: None))
+    return now
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=10)
+    assert not breaker.failure("a.com")
+    assert not breaker.failure("a.com")
+    breaker.before("a.com")
+    assert breaker.failure("a.com")
+    with pytest.raises(CircuitOpen) as error:
+        breaker.before("a.com")
+    assert error.value.host == "a.com" and error.value.retry_in == pytest.approx(10)
+    # Other hosts are not affected
+    breaker.before("b.com")
+    assert breaker.snapshot() == {"a.com": {'failures': 3, 'open': True}}
+
+
+def test_breaker_success_resets_the_count(clock):
+    breaker = CircuitBreaker(threshold=2)
+    breaker.failure("a.com")
+    breaker.success("a.com")
+    assert not breaker.failure("a.com")
+    breaker.before("a.com")
+
+
+def test_breaker_lets_one_probe_through_after_cooldown(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=10, max_cooldown=15)
+    breaker.failure("a.com")
+    clock[0] += 10
+    breaker.before("a.com")  # the probe
+    with pytest.raises(CircuitOpen):
+        breaker.before("a.com")  # others wait while it runs
+    
+    # A failed probe opens the circuit for twice as long, up to max_cooldown
+    assert breaker.failure("a.com")
+    clock[0] += 14
+    with pytest.raises(CircuitOpen):
+        breaker.before("a.com")
+    clock[0] += 1
+    breaker.before("a.com")
+    
+    # A successful probe closes it
+    breaker.success("a.com")
+    breaker.before("a.com")
+    breaker.before("a.com")
+    assert breaker.snapshot() == {}
+
+
+def test_retrier_retries_transient_failures(clock):
+    calls, retries = [], []
+    
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise StatusError(503)
+        return "ok"
+    
+    retrier = Retrier(retries=3, on_retry=lambda host, attempt, *_: retries.append((host, attempt)))
+    assert retrier.call("a.com", flaky) == "ok"
+    assert retries == [("a.com", 1), ("a.com", 2)]
+
+
+def test_retrier_gives_up(clock):
+    retrier = Retrier(retries=2, breaker=CircuitBreaker(threshold=100))
+    calls = []
+    
+    def failing(error):
+        calls.append(1)
+        raise error
+    
+    with pytest.raises(StatusError):
+        retrier.call("a.com", failing, StatusError(500))
+    assert len(calls) == 3
+    
+    calls.clear()
+    with pytest.raises(StatusError):
+        retrier.call("a.com", failing, StatusError(404))
+    assert len(calls) == 1
+
+
+def test_retrier_delay_honours_retry_after():
+    retrier = Retrier(base_delay=1, max_delay=30)
+    assert 0 <= retrier.delay(1) <= 1
+    assert 0 <= retrier.delay(10) <= 30
+    assert retrier.delay(1, StatusError(429, {'Retry-After': '12'})) == 12
+    assert retrier.delay(1, StatusError(429, {'Retry-After': '120'})) == 30
+
+
+def test_interrupted_probe_lets_the_next_call_through(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=10)
+    retrier = Retrier(retries=0, breaker=breaker)
+    breaker.failure("a.com")
+    clock[0] += 10
+    
+    def interrupted():
+        raise KeyboardInterrupt
+    
+    with pytest.raises(KeyboardInterrupt):
+        retrier.call("a.com", interrupted)
+    # Still open, but free to be probed again at once
+    assert breaker.snapshot() == {"a.com": {'failures': 1, 'open': True}}
+    assert retrier.call("a.com", lambda: "ok") == "ok"
+    assert breaker.snapshot() == {}
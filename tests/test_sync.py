@@ -0,0 +1,94 @@
+import pytest
+
+import sync
+from downloader import MediaDownloader
+from sync import SyncState, entry_date, entry_key
+
+
+def test_entry_key_and_date():
+    assert entry_key({'id': 'abc', 'url': 'http://a'}) == "abc"
+    assert entry_key({'url': 'http://a'}) == "http://a"
+    assert entry_date({'upload_date': '20240102', 'timestamp': 0}) == '20240102'
+    assert entry_date({'timestamp': 86400}) == '19700102'
+    assert entry_date({}) is None
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = SyncState(tmp_path / "sync.sqlite3")
+    yield state
+    state.close()
+
+
+def test_advance_moves_the_cursor(state):
+    assert state.get("http://channel") is None
+    state.advance("http://channel", "audio", "mp3", "best", ["c", "b"], "20240102", items=2)
+    state.advance("http://channel", "audio", "mp3,flac", "best", ["e", "d", "c"], "20240101", items=1)
+    cursor = state.get("http://channel")
+    assert cursor['ids'] == ["e", "d", "c", "b"]
+    assert cursor['upload_date'] == "20240102"  # never moves back
+    assert cursor['items'] == 3 and cursor['format'] == "mp3,flac"
+
+
+def test_advance_keeps_only_the_newest_ids(state, monkeypatch):
+    monkeypatch.setattr(sync, "KEEP_IDS", 3)
+    state.advance("http://channel", "audio", "mp3", "best", ["c", "b", "a"])
+    state.advance("http://channel", "audio", "mp3", "best", ["e", "d"])
+    assert state.get("http://channel")['ids'] == ["e", "d", "c"]
+
+
+def test_sources_oldest_sync_first(state):
+    state.advance("http://one", "audio", "mp3", "best", [])
+    state.advance("http://two", "video", "mp3", "720", [])
+    state.advance("http://one", "audio", "mp3", "best", [])
+    assert [cursor['url'] for cursor in state.sources()] == ["http://two", "http://one"]
+
+
+def playlist(url, ids):
+    return {'_type': 'playlist', 'webpage_url': url,
+            'entries': ({'_type': 'url', 'id': id, 'url': f"http://example.com/{id}"} for id in ids)}
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    """A downloader whose listings come from `downloader.listing` and whose downloads all succeed"""
+    downloader = MediaDownloader(output_dir=tmp_path, use_cache=False, use_journal=False)
+    downloader.listed = []
+    
+    def iter_listing(url, max_depth=3, skip=None):
+        for source, entry in downloader._iter_entries(None, downloader.listing(), url, max_depth, skip):
+            downloader.listed.append(entry['id'])
+            yield source, entry
+    
+    def download_listing(entries, *args):
+        for entry in entries:
+            yield {'url': entry['url'], 'id': entry['id'], 'success': True}
+    
+    downloader._iter_listing = iter_listing
+    downloader._download_listing = download_listing
+    yield downloader
+    downloader.close()
+
+
+def test_sync_stops_at_known_items(downloader):
+    downloader.listing = lambda: playlist("http://channel", [f"v{i}" for i in range(50)])
+    assert len(list(downloader.sync("http://channel"))) == 50
+    
+    downloader.listed.clear()
+    downloader.listing = lambda: playlist("http://channel", ["new"] + [f"v{i}" for i in range(50)])
+    assert [result['id'] for result in downloader.sync("http://channel", stop_after=3)] == ["new"]
+    assert downloader.listed == ["new", "v0", "v1", "v2"]
+    assert downloader.sync_state.get("http://channel")['ids'][:4] == ["new", "v0", "v1", "v2"]
+
+
+def test_sync_reads_every_channel_tab(downloader):
+    downloader.sync_state.advance("http://channel", "audio", "mp3", "best",
+                                  [f"v{i}" for i in range(20)] + [f"s{i}" for i in range(20)])
+    downloader.listing = lambda: {'_type': 'playlist', 'entries': iter([
+        playlist("http://channel/videos", ["v-new"] + [f"v{i}" for i in range(20)]),
+        playlist("http://channel/shorts", ["s-new1", "s-new2"] + [f"s{i}" for i in range(20)]),
+    ])}
+    results = list(downloader.sync("http://channel", stop_after=3))
+    assert [result['id'] for result in results] == ["v-new", "s-new1", "s-new2"]
+    # Each tab is read only up to its own run of known items
+    assert downloader.listed == ["v-new", "v0", "v1", "v2", "s-new1", "s-new2", "s0", "s1", "s2"]
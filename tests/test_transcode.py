@@ -0,0 +1,62 @@
+import pytest
+
+from transcode import ENCODE, KEEP, REMUX, TranscodeError, normalize_codec, output_path, parse_formats, plan_audio
+
+
+@pytest.mark.parametrize("codec, family", [
+    ("mp4a.40.2", "aac"),
+    ("aac", "aac"),
+    ("opus", "opus"),
+    ("libopus", "opus"),
+    ("mp3float", "mp3"),
+    ("MP3", "mp3"),
+    ("vorbis", "vorbis"),
+    ("pcm_s16le", "pcm"),
+    ("flac", "flac"),
+    ("none", None),
+    ("", None),
+    (None, None),
+])
+def test_normalize_codec(codec, family):
+    assert normalize_codec(codec) == family
+
+
+@pytest.mark.parametrize("source, format, codec, action", [
+    ("a.mp3", "mp3", "mp3", KEEP),
+    ("a.opus", "opus", "opus", KEEP),
+    ("a.webm", "opus", "opus", REMUX),
+    ("a.m4a", "m4a", "mp4a.40.2", KEEP),
+    ("a.m4a", "aac", "mp4a.40.2", REMUX),
+    ("a.webm", "mp3", "opus", ENCODE),
+    ("a.wav", "flac", "pcm_s16le", ENCODE),
+    ("a.webm", "opus", None, ENCODE),
+])
+def test_plan_audio(source, format, codec, action):
+    assert plan_audio(source, format, codec) == action
+
+
+def test_plan_audio_rejects_unknown_formats():
+    with pytest.raises(TranscodeError):
+        plan_audio("a.mp3", "wma", "mp3")
+
+
+def test_output_path():
+    assert output_path("dir/Song [x].webm", "vorbis").name == "Song [x].ogg"
+    with pytest.raises(TranscodeError):
+        output_path("a.webm", "wma")
+
+
+@pytest.mark.parametrize("format, formats", [
+    ("mp3", ["mp3"]),
+    ("MP3, flac", ["mp3", "flac"]),
+    ("flac,mp3,flac,", ["flac", "mp3"]),
+    (["opus", "m4a"], ["opus", "m4a"]),
+])
+def test_parse_formats(format, formats):
+    assert parse_formats(format) == formats
+
+
+@pytest.mark.parametrize("format", ["bogus", "mp3,bogus", "", " , ", []])
+def test_parse_formats_rejects_invalid(format):
+    with pytest.raises(TranscodeError):
+        parse_formats(format)